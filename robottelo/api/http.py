@@ -0,0 +1,292 @@
+# -*- encoding: utf-8 -*-
+"""Shared HTTP session used by all the NailGun calls made via robottelo.
+
+NailGun sends each request with the module level functions of ``requests``,
+opening a new connection, and a new TLS handshake, for each API call.
+:func:`install` replaces the ``requests`` module seen by ``nailgun.client``
+by a :class:`SessionRequests` which sends the requests through a shared
+``requests.Session``, keeping the connections alive in a pool sized by the
+``[http_client]`` section and retrying the idempotent requests failing with
+a connection error or a gateway error, with an exponential backoff. Like the
+module level functions, the shared session does not keep the cookies, so a
+session cookie set for the requests of one user is never sent with the
+requests of an other one.
+
+The duration of each request is recorded per endpoint, the ids found in the
+paths being replaced by ``:id``, and the latency histograms are logged when
+the process exits. They are available from :func:`get_stats`.
+"""
+import atexit
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from nailgun import client
+from requests.adapters import HTTPAdapter
+from six.moves.http_cookiejar import DefaultCookiePolicy
+from six.moves.urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+#: Upper bounds, in seconds, of the latency histogram buckets, the last
+#: bucket holding the slower requests
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_ID_PATTERN = re.compile(r'^(\d+|[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12})$')
+_RETRY_STATUSES = (502, 503, 504)
+
+
+def get_endpoint(method, url):
+    """Return the name under which a request latency is recorded, its
+    method and its path, the ids being replaced by ``:id``.
+
+    :param str method: The request method, like ``GET``.
+    :param str url: The request url.
+    """
+    path = u'/'.join(
+        u':id' if _ID_PATTERN.match(part) else part
+        for part in urlsplit(url).path.split(u'/')
+    )
+    return u'{0} {1}'.format(method.upper(), path or u'/')
+
+
+class LatencyHistogram(object):
+    """Thread safe latency histograms of the requests, per endpoint.
+
+    :param buckets: The sorted upper bounds of the buckets, in seconds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, duration):
+        """Record a request to ``endpoint`` which took ``duration`` seconds.
+        """
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'histogram': [0] * (len(self.buckets) + 1),
+                }
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            stats['histogram'][index] += 1
+
+    def reset(self):
+        """Forget the recorded requests."""
+        with self._lock:
+            self._endpoints.clear()
+
+    def get_stats(self):
+        """Return a dictionary of the statistics, keyed by endpoint.
+
+        Each value holds the ``count`` of requests, their ``total`` and
+        ``max`` durations and their ``histogram``, the number of requests
+        per bucket of :attr:`buckets`, the last item counting the requests
+        slower than the last bucket.
+        """
+        with self._lock:
+            return {
+                endpoint: dict(stats, histogram=list(stats['histogram']))
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def format_stats(self):
+        """Return the statistics, one line per endpoint, the slowest
+        endpoints in total first.
+        """
+        stats = self.get_stats()
+        labels = [u'<{0}s'.format(bound) for bound in self.buckets]
+        labels.append(u'>{0}s'.format(self.buckets[-1]))
+        lines = []
+        for endpoint in sorted(
+                stats, key=lambda name: stats[name]['total'], reverse=True):
+            item = stats[endpoint]
+            histogram = u' '.join(
+                u'{0}:{1}'.format(label, count)
+                for label, count in zip(labels, item['histogram']) if count
+            )
+            lines.append(
+                u'  {0}: {1} requests, avg {2:.3f}s, max {3:.3f}s [{4}]'
+                .format(endpoint, item['count'], item['total'] / item['count'],
+                        item['max'], histogram)
+            )
+        return u'\n'.join(lines)
+
+    def log_stats(self):
+        """Log the statistics if any request was recorded."""
+        if self._endpoints:
+            logger.info('http request latencies:\n%s', self.format_stats())
+
+
+#: Latencies of the requests sent through the shared session
+LATENCIES = LatencyHistogram()
+atexit.register(LATENCIES.log_stats)
+
+
+def build_session(pool_connections=10, pool_maxsize=10, retries=3,
+                  backoff_factor=0.5):
+    """Return a ``requests.Session`` keeping its connections alive, but not
+    the cookies.
+
+    :param int pool_connections: The number of hosts whose connections are
+        pooled.
+    :param int pool_maxsize: The number of connections kept per host, it
+        should be at least the number of threads sending requests.
+    :param int retries: The number of times a request failing with a
+        connection error, or an idempotent request failing with a gateway
+        error, is retried.
+    :param float backoff_factor: The retries wait ``backoff_factor * 2 **
+        (retry - 1)`` seconds.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=_RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    # the requests of all the users share the session, which must not send
+    # back the cookies set for the requests of an other user
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class SessionRequests(object):
+    """Stand-in for the ``requests`` module sending the requests through a
+    shared session and recording their latency.
+
+    The session is created on first use and again in forked processes, so
+    they do not share the pooled connections. The other attributes, like
+    ``exceptions``, are the ones of the ``requests`` module.
+
+    :param session_factory: Called without argument to create the session.
+    :param latencies: The :class:`LatencyHistogram` recording the requests.
+    """
+
+    def __init__(self, session_factory=build_session, latencies=LATENCIES):
+        self._session_factory = session_factory
+        self._latencies = latencies
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    @property
+    def session(self):
+        """The shared session of the process."""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._session_factory()
+                self._pid = os.getpid()
+            return self._session
+
+    def close(self):
+        """Close the pooled connections."""
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                self._session.close()
+            self._session = None
+
+    def request(self, method, url, **kwargs):
+        """Send a request, as ``requests.request`` does."""
+        start = time.time()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            self._latencies.record(
+                get_endpoint(method, url), time.time() - start)
+
+    def get(self, url, params=None, **kwargs):
+        """Send a GET request, as ``requests.get`` does."""
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, params=params, **kwargs)
+
+    def options(self, url, **kwargs):
+        """Send an OPTIONS request, as ``requests.options`` does."""
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('OPTIONS', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        """Send a HEAD request, as ``requests.head`` does."""
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        """Send a POST request, as ``requests.post`` does."""
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        """Send a PUT request, as ``requests.put`` does."""
+        return self.request('PUT', url, data=data, **kwargs)
+
+    def patch(self, url, data=None, **kwargs):
+        """Send a PATCH request, as ``requests.patch`` does."""
+        return self.request('PATCH', url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """Send a DELETE request, as ``requests.delete`` does."""
+        return self.request('DELETE', url, **kwargs)
+
+
+def install():
+    """Make ``nailgun.client`` send its requests through a shared session
+    configured by the ``[http_client]`` section.
+
+    :return: The :class:`SessionRequests` installed, ``None`` if the shared
+        session is disabled.
+    """
+    uninstall()
+    http_client = settings.http_client
+    if not http_client.enabled:
+        return None
+
+    def session_factory():
+        return build_session(
+            pool_connections=http_client.pool_connections,
+            pool_maxsize=http_client.pool_maxsize,
+            retries=http_client.retries,
+            backoff_factor=http_client.backoff_factor,
+        )
+    client.requests = SessionRequests(session_factory)
+    return client.requests
+
+
+def uninstall():
+    """Make ``nailgun.client`` use the ``requests`` module again, closing
+    the shared session if one was installed.
+    """
+    installed = getattr(client, 'requests', None)
+    if isinstance(installed, SessionRequests):
+        installed.close()
+    client.requests = requests
+
+
+def get_stats():
+    """Return the latency statistics of the requests sent through the
+    shared session, see :meth:`LatencyHistogram.get_stats`.
+    """
+    return LATENCIES.get_stats()
@@ -1,5 +1,6 @@
 # -*- encoding: utf-8 -*-
 """Module containing convenience functions for working with the API."""
+import functools
 import time
 
 from fauxfactory import gen_string
@@ -663,27 +664,101 @@ def create_role_permissions(role, permissions_types_names):  # pragma: no cover
         ).create()
 
 
+#: States of a finished ForemanTask
+_TASK_FINISHED_STATES = ('paused', 'stopped')
+
+
+def iter_finished_tasks(task_ids, poll_rate=None, timeout=None,
+                        max_poll_rate=30, must_succeed=True):
+    """Poll tasks together and yield each one as soon as it finished.
+
+    All the unfinished tasks are fetched by a single search per check-up.
+    The delay between two check-ups starts at ``poll_rate`` and grows by
+    half when no task finished, up to ``max_poll_rate``, going back to
+    ``poll_rate`` once a task finished.
+
+    :param task_ids: The ids of the ``nailgun.entities.ForemanTask`` to poll.
+    :param poll_rate: The initial delay between two check-ups,
+        ``nailgun.entity_mixins.TASK_POLL_RATE`` by default.
+    :param timeout: Maximum number of seconds to wait for all the tasks,
+        ``nailgun.entity_mixins.TASK_TIMEOUT`` by default.
+    :param max_poll_rate: The maximum delay between two check-ups.
+    :param must_succeed: Raise an error for the tasks finishing with a result
+        other than ``success``.
+    :return: A generator of ``nailgun.entities.ForemanTask``, in the order
+        the tasks finished.
+    :raises: ``nailgun.entity_mixins.TaskTimedOutError`` if some tasks did
+        not finish before the timeout, ``nailgun.entity_mixins.
+        TaskFailedError`` if a task did not succeed.
+    """
+    if poll_rate is None:
+        poll_rate = entity_mixins.TASK_POLL_RATE
+    if timeout is None:
+        timeout = entity_mixins.TASK_TIMEOUT
+    pending = set(task_ids)
+    end_time = time.time() + timeout
+    delay = poll_rate
+    while pending:
+        tasks = entities.ForemanTask().search(query={
+            'search': ' or '.join(
+                'id = {0}'.format(task_id) for task_id in sorted(pending)),
+            'per_page': len(pending),
+        })
+        finished = [
+            task for task in tasks
+            if task.id in pending and task.state in _TASK_FINISHED_STATES
+        ]
+        for task in finished:
+            pending.discard(task.id)
+            if must_succeed and task.result != 'success':
+                raise entity_mixins.TaskFailedError(
+                    'Task {0} did not succeed. Task state: {1}, result: {2}'
+                    .format(task.id, task.state, task.result),
+                    task.id
+                )
+            yield task
+        if not pending:
+            break
+        remaining = end_time - time.time()
+        if remaining <= 0:
+            raise entity_mixins.TaskTimedOutError(
+                'Timed out polling tasks {0}'.format(
+                    ', '.join(sorted(str(task_id) for task_id in pending))),
+                sorted(pending)[0]
+            )
+        delay = poll_rate if finished else min(delay * 1.5, max_poll_rate)
+        time.sleep(min(delay, remaining))
+
+
 def wait_for_tasks(search_query, search_rate=1, max_tries=10, poll_rate=None,
                    poll_timeout=None):
     """Search for tasks by specified search query and poll them to ensure that
     task has finished.
 
+    The tasks found are polled together, see :func:`iter_finished_tasks`.
+
     :param search_query: Search query that will be passed to API call.
     :param search_rate: Delay between searches.
     :param max_tries: How many times search should be executed.
-    :param poll_rate: Delay between the end of one task check-up and
-            the start of the next check-up. Parameter for
-            ``nailgun.entities.ForemanTask.poll()`` method.
-    :param poll_timeout: Maximum number of seconds to wait until timing out.
-            Parameter for ``nailgun.entities.ForemanTask.poll()`` method.
-    :return: List of ``nailgun.entities.ForemanTasks`` entities.
+    :param poll_rate: Initial delay between the end of one tasks check-up
+            and the start of the next check-up.
+    :param poll_timeout: Maximum number of seconds to wait for all the tasks
+            until timing out.
+    :return: List of ``nailgun.entities.ForemanTasks`` entities, in the order
+            they were found, as fetched once they finished.
     :raises: ``AssertionError``. If not tasks were found until timeout.
     """
     for _ in range(max_tries):
         tasks = entities.ForemanTask().search(query={'search': search_query})
         if len(tasks) > 0:
-            for task in tasks:
-                task.poll(poll_rate=poll_rate, timeout=poll_timeout)
+            finished = {
+                task.id: task for task in iter_finished_tasks(
+                    [task.id for task in tasks],
+                    poll_rate=poll_rate,
+                    timeout=poll_timeout,
+                )
+            }
+            tasks = [finished[task.id] for task in tasks]
             break
         else:
             time.sleep(search_rate)
@@ -691,3 +766,29 @@ def wait_for_tasks(search_query, search_rate=1, max_tries=10, poll_rate=None,
         raise AssertionError(
             "No task was found using query '{}'".format(search_query))
     return tasks
+
+
+def wait_for_tasks_async(search_query, loop=None, **kwargs):
+    """Wait for tasks like :func:`wait_for_tasks` without blocking an asyncio
+    event loop, Python 3 only.
+
+    The tasks are polled in a thread of the loop default executor, so
+    several waits, for example on tasks of different subsystems, can be
+    awaited at once::
+
+        sync_tasks, publish_tasks = await asyncio.gather(
+            wait_for_tasks_async(sync_query),
+            wait_for_tasks_async(publish_query),
+        )
+
+    :param search_query: Search query that will be passed to API call.
+    :param loop: The event loop, the current one by default.
+    :param kwargs: The other arguments of :func:`wait_for_tasks`.
+    :return: An ``asyncio.Future`` of the list of tasks returned by
+        :func:`wait_for_tasks`.
+    """
+    import asyncio
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    return loop.run_in_executor(
+        None, functools.partial(wait_for_tasks, search_query, **kwargs))
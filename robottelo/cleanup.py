@@ -1,17 +1,73 @@
 # -*- encoding: utf-8 -*-
-"""Cleanup module for different entities"""
+"""Cleanup module for different entities
+
+When ``cleanup_deferred`` is set in the ``[robottelo]`` section the cleanups
+are not run when they are requested but put on the :data:`CLEANUP_QUEUE`,
+kept in the ``cleanup_queue_storage`` shared function storage. A background
+thread drains the queue while the tests keep running and the remaining
+cleanups are run at the end of the session, see :class:`CleanupQueue`. The
+queue holds the entities registered by the :class:`EntitiesCleaner`, the
+virtual machines given to :func:`vm_cleanup`, the calls to the other
+``*_cleanup`` helpers and the CLI entities added with
+:meth:`CleanupQueue.add_cli_entity`.
+"""
+import functools
+import json
 import logging
-from collections import deque, defaultdict
+import threading
+import time
+from collections import deque, defaultdict, namedtuple
+from multiprocessing.pool import ThreadPool
+
+import import_string
+import six
 from nailgun import entities, signals
+from robottelo.api.utils import iter_finished_tasks
 from robottelo.cli.base import CLIReturnCodeError
 from robottelo.cli.proxy import Proxy
+from robottelo.config import settings
 from robottelo.constants import DEFAULT_ORG_ID
 from robottelo.decorators import bz_bug_is_open
+from robottelo.decorators.func_shared.shared import (
+    _get_default_scope,
+    _storage_handlers,
+)
+from robottelo.vm import VirtualMachine
 
 
 LOGGER = logging.getLogger(__name__)
 
+#: The outcome of the cleanup of an entity: its ``status`` is one of
+#: ``updated``, ``deleted``, ``skipped`` or ``failed``, ``duration`` is in
+#: seconds and ``message`` explains why it was skipped or failed
+CleanupResult = namedtuple(
+    'CleanupResult',
+    'entity_type entity_id action status duration message'
+)
+
+
+def is_cleanup_deferred():
+    """Return whether the cleanups are put on the :data:`CLEANUP_QUEUE`."""
+    return bool(settings.cleanup_deferred)
+
+
+def deferrable(function):
+    """Decorator putting the calls to a cleanup helper on the
+    :data:`CLEANUP_QUEUE` when the cleanups are deferred.
+
+    The calls whose arguments are not json compatible are run at once.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if is_cleanup_deferred() and CLEANUP_QUEUE.add_function(
+                wrapper, *args, **kwargs):
+            return None
+        return function(*args, **kwargs)
+    wrapper.__wrapped__ = function
+    return wrapper
+
 
+@deferrable
 def capsule_cleanup(proxy_id=None):
     """Deletes the capsule with the given id"""
     if bz_bug_is_open(1398695):
@@ -24,21 +80,25 @@ def capsule_cleanup(proxy_id=None):
         Proxy.delete({'id': proxy_id})
 
 
+@deferrable
 def realm_cleanup(realm_id=None):
     """Deletes the realm with the given id"""
     entities.Realm(id=realm_id).delete()
 
 
+@deferrable
 def location_cleanup(loc_id=None):
     """Deletes the location with the given id"""
     entities.Location(id=loc_id).delete()
 
 
+@deferrable
 def org_cleanup(org_id=None):
     """Deletes the Org with the given id"""
     entities.Organization(id=org_id).delete()
 
 
+@deferrable
 def host_cleanup(host_id=None):
     """Deletes the Host with the given id"""
     entities.Host(id=host_id).delete()
@@ -57,16 +117,27 @@ def vm_cleanup(vm):
 
     :param robottelo.vm.VirtualMachine vm: virtual machine to destroy
     """
+    if is_cleanup_deferred() and CLEANUP_QUEUE.add_vm(vm):
+        return
     vm.destroy()
 
 
 class EntitiesCleaner(object):
-    """Register and clean entities for cleanup using signals"""
+    """Register and clean entities for cleanup using signals
+
+    The entities are cleaned by dependency level, hosts first, then host
+    groups and finally organizations, the entities of a level being
+    processed concurrently by at most ``workers`` threads,
+    ``cleanup_workers`` from the ``[robottelo]`` section by default. The
+    outcome of each entity cleanup is kept in :attr:`results`.
+    """
 
-    def __init__(self, *types_to_cleanup):
+    def __init__(self, *types_to_cleanup, **kwargs):
         self.cleanup_queue = defaultdict(deque)
         self.deleted_entities = defaultdict(set)
+        self.results = []
         self.types_to_cleanup = types_to_cleanup
+        self.workers = kwargs.pop('workers', None)
         self.logger = logging.getLogger('robottelo')
         self.connect_cleanup_signals()
 
@@ -85,6 +156,8 @@ class EntitiesCleaner(object):
 
     def clean(self):
         """This method is called in TearDownClass only when cleanup=true"""
+        start = time.time()
+        self.results = []
         default_org = entities.Organization(id=DEFAULT_ORG_ID)
         # reassign created hosts to default org
         self.update_entities(
@@ -107,40 +180,444 @@ class EntitiesCleaner(object):
         )
 
         self.logger.debug(
-            'Cleanup deleted %s entities', len(self.deleted_entities))
+            'Cleanup deleted %s entities',
+            sum(len(ids) for ids in self.deleted_entities.values()))
+        self.logger.info(
+            'Cleanup finished in %.2fs\n%s',
+            time.time() - start, self.format_results())
+
+    def _run_level(self, function, entity_list):
+        """Call ``function`` with each entity of ``entity_list``
+        concurrently and return the values it returned, in order.
+        """
+        if not entity_list:
+            return []
+        workers = self.workers or settings.cleanup_workers or 1
+        if workers == 1 or len(entity_list) == 1:
+            return [function(entity) for entity in entity_list]
+        pool = ThreadPool(min(workers, len(entity_list)))
+        try:
+            return pool.map(function, entity_list)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _orgs_with_hosts(self, orgs):
+        """Return the ids of the organizations of ``orgs`` having hosts,
+        searching the hosts of all the organizations at once.
+        """
+        if not orgs:
+            return set()
+        query = {
+            'search': ' or '.join(
+                'organization_id={0}'.format(org.id) for org in orgs),
+            'per_page': 1000,
+        }
+        return set(
+            host.organization.id
+            for host in entities.Host().search(query=query)
+            if getattr(host, 'organization', None) is not None
+        )
 
     def delete_entities(self, entity_list, **kwargs):
+        """Delete the entities of ``entity_list`` concurrently.
+
+        Organizations which still have hosts are skipped. When
+        ``synchronous=False`` is passed the delete tasks are polled together
+        once they all were started.
+        """
         self.logger.debug(
             'Cleanup got %s entities to delete', len(entity_list))
+        to_delete = []
+        queued = set()
         for entity in entity_list:
             entity_type = entity.__class__.__name__
             if entity.id in self.deleted_entities[entity_type]:
                 # skip already deleted entities
-                continue
+                self.results.append(CleanupResult(
+                    entity_type, entity.id, 'delete', 'skipped', 0,
+                    'already deleted'))
+            elif (entity_type, entity.id) not in queued:
+                queued.add((entity_type, entity.id))
+                to_delete.append(entity)
+        orgs = [
+            entity for entity in to_delete
+            if isinstance(entity, entities.Organization)
+        ]
+        try:
+            orgs_with_hosts = self._orgs_with_hosts(orgs)
+        except Exception as e:
+            self.logger.warn('Error searching organizations hosts %s', str(e))
+            orgs_with_hosts = set(org.id for org in orgs)
+        for org in orgs:
+            if org.id in orgs_with_hosts:
+                # Do not delete organizations with hosts
+                self.logger.debug(
+                    'Org %s can\'t be deleted as it has hosts', org.id)
+                self.results.append(CleanupResult(
+                    org.__class__.__name__, org.id, 'delete', 'skipped', 0,
+                    'organization has hosts'))
+                to_delete.remove(org)
+
+        def delete(entity):
+            start = time.time()
             try:
-                if isinstance(entity, entities.Organization):
-                    query = {'search': 'organization_id={0}'.format(entity.id)}
-                    org_hosts = entities.Host().search(query=query)
-                    if org_hosts:  # Do not delete organizations with hosts
-                        self.logger.debug(
-                            'Org %s can\'t be deleted as it has %s hosts',
-                            entity.id,
-                            len(org_hosts)
-                        )
-                        return
-                entity.delete(**kwargs)
+                response = entity.delete(**kwargs)
             except Exception as e:
                 self.logger.warn('Error deleting entity %s', str(e))
+                return entity, start, None, str(e)
+            task_id = None
+            if isinstance(response, dict) and 'state' in response:
+                task_id = response.get('id')
+            return entity, start, task_id, None
+
+        tasks = {}
+        for entity, start, task_id, error in self._run_level(
+                delete, to_delete):
+            if error is not None:
+                self._add_result(entity, 'delete', start, error)
+            elif task_id is None:
+                self._add_result(entity, 'delete', start)
             else:
+                tasks[task_id] = (entity, start)
+        if tasks:
+            self._wait_for_delete_tasks(tasks)
+
+    def _wait_for_delete_tasks(self, tasks):
+        """Poll the delete tasks together, ``tasks`` mapping a task id to
+        the deleted entity and the time its delete started.
+        """
+        pending = dict(tasks)
+        try:
+            for task in iter_finished_tasks(list(tasks), must_succeed=False):
+                entity, start = pending.pop(task.id)
+                error = None
+                if task.result != 'success':
+                    error = 'task {0} finished with result {1}'.format(
+                        task.id, task.result)
+                    self.logger.warn('Error deleting entity %s', error)
+                self._add_result(entity, 'delete', start, error)
+        except Exception as e:
+            self.logger.warn('Error waiting for delete tasks %s', str(e))
+            for entity, start in pending.values():
+                self._add_result(entity, 'delete', start, str(e))
+
+    def _add_result(self, entity, action, start, error=None):
+        """Record the outcome of an entity cleanup started at ``start``."""
+        entity_type = entity.__class__.__name__
+        if error is None:
+            status = 'deleted' if action == 'delete' else 'updated'
+            if action == 'delete':
                 self.deleted_entities[entity_type].add(entity.id)
+        else:
+            status = 'failed'
+        self.results.append(CleanupResult(
+            entity_type, entity.id, action, status, time.time() - start,
+            error))
 
     def update_entities(self, entity_list, **kwargs):
+        """Update the entities of ``entity_list`` concurrently with the
+        field values of ``kwargs``.
+        """
         self.logger.debug(
             'Cleanup got %s entities to update', len(entity_list))
-        for entity in entity_list:
+
+        def update(entity):
+            start = time.time()
             try:
                 for key, value in kwargs.items():
                     setattr(entity, key, value)
                 entity.update(fields=kwargs.keys())
             except Exception as e:
                 self.logger.warn('Error updating entity %s', str(e))
+                return entity, start, str(e)
+            return entity, start, None
+
+        for entity, start, error in self._run_level(update, entity_list):
+            self._add_result(entity, 'update', start, error)
+
+    def get_summary(self):
+        """Return the number of entities per entity type and status."""
+        summary = defaultdict(lambda: defaultdict(int))
+        for result in self.results:
+            summary[result.entity_type][result.status] += 1
+        return {
+            entity_type: dict(statuses)
+            for entity_type, statuses in summary.items()
+        }
+
+    def format_results(self):
+        """Return the outcome of the last cleanup, one line per entity."""
+        return '\n'.join(
+            '  {0} {1} {2} in {3:.2f}s{4}'.format(
+                result.entity_type, result.entity_id, result.status,
+                result.duration,
+                ': {0}'.format(result.message) if result.message else ''
+            )
+            for result in self.results
+        )
+
+
+class CleanupQueue(object):
+    """Queue of cleanups shared by the processes using the same storage,
+    drained by a background thread.
+
+    The cleanups are stored as json records and run in the order they were
+    added, by any process draining the queue. A failing cleanup is put back
+    at the end of the queue until it failed ``max_attempts`` times.
+
+    :param storage: The name of the shared function storage handler, ``file``
+        or ``redis``, or a storage handler instance,
+        ``cleanup_queue_storage`` by default.
+    :param scope: The namespace of the queue in the storage, the shared
+        function default scope by default.
+    :param int interval: The number of seconds the background thread waits
+        between two drains, ``cleanup_queue_interval`` by default.
+    :param int batch_size: The number of cleanups taken from the storage at
+        once.
+    :param int max_attempts: The number of times a cleanup is run before it
+        is dropped.
+    """
+
+    def __init__(self, storage=None, scope=None, interval=None,
+                 batch_size=10, max_attempts=3):
+        self._storage = storage
+        self._scope = scope
+        self._interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def storage(self):
+        """The storage handler of the queue."""
+        storage = self._storage
+        if storage is None:
+            storage = settings.cleanup_queue_storage or 'file'
+        if not isinstance(storage, six.string_types):
+            return storage
+        if storage not in _storage_handlers:
+            raise ValueError(
+                'cleanup queue storage "{0}" is not one of {1}'.format(
+                    storage, sorted(_storage_handlers)))
+        self._storage = _storage_handlers[storage]()
+        return self._storage
+
+    @property
+    def key(self):
+        """The storage key of the queue."""
+        scope = self._scope or _get_default_scope()
+        return '{0}.cleanup_queue'.format(scope)
+
+    @property
+    def interval(self):
+        """The number of seconds between two drains."""
+        if self._interval is not None:
+            return self._interval
+        return settings.cleanup_queue_interval or 10
+
+    def _update(self, update):
+        """Call ``update`` with the queued records, with the storage lock
+        held, and store the records it modified.
+        """
+        with self.storage.lock(self.key) as lock_data:
+            self.storage.when_lock_acquired(lock_data)
+            records = self.storage.get(self.key) or []
+            result = update(records)
+            self.storage.set(self.key, records)
+        return result
+
+    def _put(self, record):
+        """Add a record at the end of the queue.
+
+        :return: Whether the record was added, it is not if it is not json
+            compatible.
+        """
+        try:
+            json.dumps(record)
+        except (TypeError, ValueError):
+            LOGGER.warning('cleanup %s is not json compatible', record)
+            return False
+        self._update(lambda records: records.append(record))
+        return True
+
+    def _take(self, count):
+        """Remove and return the first ``count`` records of the queue."""
+        def take(records):
+            taken = records[:count]
+            del records[:count]
+            return taken
+        return self._update(take)
+
+    def __len__(self):
+        return self._update(len)
+
+    def add_entities(self, cleaner):
+        """Queue the cleanup of the entities registered by an
+        :class:`EntitiesCleaner`.
+
+        :return: Whether entities were queued.
+        """
+        registered = {
+            entity_type: [entity.id for entity in entity_list]
+            for entity_type, entity_list in cleaner.cleanup_queue.items()
+            if entity_list
+        }
+        if not registered:
+            return False
+        return self._put({'kind': 'entities', 'entities': registered})
+
+    def add_cli_entity(self, cli_class, options):
+        """Queue the deletion of an entity with a CLI class.
+
+        :param cli_class: A :class:`robottelo.cli.base.Base` subclass, like
+            :class:`robottelo.cli.org.Org`.
+        :param dict options: The options of its ``delete`` command, like
+            ``{'id': org['id']}``.
+        :return: Whether the deletion was queued.
+        """
+        return self._put({
+            'kind': 'cli',
+            'command': '{0}.{1}'.format(
+                cli_class.__module__, cli_class.__name__),
+            'options': options,
+        })
+
+    def add_vm(self, vm):
+        """Queue the destruction of a virtual machine.
+
+        :param robottelo.vm.VirtualMachine vm: The virtual machine.
+        :return: Whether the destruction was queued, the subclasses of
+            :class:`robottelo.vm.VirtualMachine` are not queued.
+        """
+        if type(vm) is not VirtualMachine:
+            return False
+        if not vm._created:
+            return True
+        return self._put({
+            'kind': 'vm',
+            'distro': vm.distro,
+            'provisioning_server': vm.provisioning_server,
+            'image_dir': vm.image_dir,
+            'hostname': vm._hostname,
+            'domain': vm._domain,
+            'target_image': vm._target_image,
+            'ip_addr': vm.ip_addr,
+            'subscribed': vm._subscribed,
+        })
+
+    def add_function(self, function, *args, **kwargs):
+        """Queue a call to a module level cleanup function.
+
+        :return: Whether the call was queued.
+        """
+        return self._put({
+            'kind': 'function',
+            'function': '{0}.{1}'.format(
+                function.__module__, function.__name__),
+            'args': list(args),
+            'kwargs': kwargs,
+        })
+
+    def _run_cleanup(self, record):
+        """Run the cleanup of a record."""
+        kind = record['kind']
+        if kind == 'entities':
+            cleaner = EntitiesCleaner()
+            for entity_type, entity_ids in record['entities'].items():
+                entity_class = getattr(entities, entity_type)
+                cleaner.cleanup_queue[entity_type].extend(
+                    entity_class(id=entity_id) for entity_id in entity_ids)
+            cleaner.clean()
+        elif kind == 'cli':
+            import_string(record['command']).delete(record['options'])
+        elif kind == 'vm':
+            vm = VirtualMachine(
+                distro=record['distro'],
+                provisioning_server=record['provisioning_server'],
+                image_dir=record['image_dir'],
+                hostname=record['hostname'],
+                domain=record['domain'],
+                target_image=record['target_image'],
+            )
+            vm.ip_addr = record['ip_addr']
+            vm._created = True
+            vm._subscribed = record['subscribed']
+            vm.destroy()
+        elif kind == 'function':
+            function = import_string(record['function'])
+            function = getattr(function, '__wrapped__', function)
+            function(*record['args'], **record['kwargs'])
+        else:
+            raise ValueError('unknown cleanup kind {0}'.format(kind))
+
+    def drain(self, limit=None):
+        """Run the queued cleanups until the queue is empty.
+
+        :param int limit: The maximum number of cleanups to run.
+        :return: The number of cleanups which succeeded.
+        """
+        done = 0
+        run = 0
+        while limit is None or run < limit:
+            count = self.batch_size
+            if limit is not None:
+                count = min(count, limit - run)
+            records = self._take(count)
+            if not records:
+                break
+            for record in records:
+                run += 1
+                try:
+                    self._run_cleanup(record)
+                except Exception:
+                    attempts = record.get('attempts', 0) + 1
+                    LOGGER.exception(
+                        'cleanup %s failed, attempt %s of %s',
+                        record, attempts, self.max_attempts)
+                    if attempts < self.max_attempts:
+                        record['attempts'] = attempts
+                        self._put(record)
+                else:
+                    done += 1
+        return done
+
+    def _run(self):
+        """Drain the queue every :attr:`interval` seconds until stopped."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.drain()
+            except Exception:
+                LOGGER.exception('draining the cleanup queue failed')
+
+    def start(self):
+        """Start the background thread draining the queue."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='cleanup-queue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background thread once its current cleanup finished."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush(self):
+        """Stop the background thread and run all the queued cleanups.
+
+        :return: The number of cleanups which succeeded.
+        """
+        self.stop()
+        done = self.drain()
+        LOGGER.info('cleanup queue flushed, %s cleanups succeeded', done)
+        return done
+
+
+#: The queue of the deferred cleanups
+CLEANUP_QUEUE = CleanupQueue()
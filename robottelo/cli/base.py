@@ -1,10 +1,17 @@
 # -*- encoding: utf-8 -*-
 """Generic base class for cli hammer commands."""
+import collections
+import copy
 import logging
 import re
+import six
+import threading
+import time
 
+from contextlib import contextmanager
+from six.moves import queue
 from robottelo import ssh
-from robottelo.cli import hammer
+from robottelo.cli import hammer, hammer_shell
 from robottelo.config import settings
 
 
@@ -61,6 +68,173 @@ class CLIDataBaseError(CLIBaseError):
     """
 
 
+class CLIResultCache(object):
+    """Thread safe LRU cache of the results of read only hammer commands.
+
+    Results are kept for ``hammer_cache_ttl`` seconds, at most
+    ``hammer_cache_size`` of them, as configured in the ``[robottelo]``
+    section. A ``hammer_cache_ttl`` of 0 disables the cache.
+
+    Running any other command through :meth:`Base.execute` invalidates the
+    cached results of the same resource, being the first word of the
+    ``command_base``. Changes made by other means, like the API or ssh, are
+    not noticed, so tests which need fresh data should use :meth:`disabled`.
+    """
+
+    #: Subcommands whose results are cached
+    CACHED_SUBCOMMANDS = frozenset(('info', 'list'))
+    #: Subcommands which do not invalidate the cache
+    READ_ONLY_SUBCOMMANDS = CACHED_SUBCOMMANDS | frozenset((
+        'dump', 'puppet-classes', 'sc-params'))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._generations = collections.defaultdict(int)
+        self._disabled = 0
+        self.reset_stats()
+
+    @staticmethod
+    def _resource(command_base):
+        """Return the resource which ``command_base`` works on."""
+        return command_base.split()[0] if command_base else command_base
+
+    @classmethod
+    def is_read_only(cls, command_sub):
+        """Whether ``command_sub`` only reads data from the server."""
+        return bool(command_sub) and (
+            command_sub in cls.READ_ONLY_SUBCOMMANDS or
+            command_sub.split()[-1] in cls.CACHED_SUBCOMMANDS
+        )
+
+    @property
+    def enabled(self):
+        """Whether results are currently cached."""
+        return bool(settings.hammer_cache_ttl) and not self._disabled
+
+    @contextmanager
+    def disabled(self):
+        """Context manager running the CLI commands without the cache."""
+        with self._lock:
+            self._disabled += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._disabled -= 1
+
+    def make_key(self, command_base, command_sub, options, user,
+                 output_format=None):
+        """Return the cache key of a command, ``None`` if its result must not
+        be cached.
+
+        The options are normalized the same way
+        :meth:`Base._construct_command` does, so options leading to the same
+        command share the same key.
+        """
+        if not self.enabled or command_sub not in self.CACHED_SUBCOMMANDS:
+            return None
+        normalized = []
+        for key, val in (options or {}).items():
+            if val is None or val is False:
+                continue
+            if isinstance(val, list):
+                val = ','.join(str(el) for el in val)
+            elif val is not True:
+                val = six.text_type(val)
+            normalized.append((key, val))
+        return (
+            command_base,
+            command_sub,
+            tuple(sorted(normalized)),
+            user,
+            output_format,
+        )
+
+    def generation(self, command_base):
+        """Return the invalidation counter of the ``command_base`` resource.
+
+        It must be read before running a command whose result is passed to
+        :meth:`set`.
+        """
+        with self._lock:
+            return self._generations[self._resource(command_base)]
+
+    def get(self, key):
+        """Return a ``(found, result)`` tuple for ``key``."""
+        if key is None:
+            return False, None
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[0] < time.time():
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries[key] = entry
+            self.hits += 1
+            result = entry[1]
+        return True, copy.deepcopy(result)
+
+    def set(self, key, result, generation):
+        """Cache ``result`` unless its resource was invalidated since
+        ``generation`` was read.
+        """
+        if key is None:
+            return
+        entry = (time.time() + settings.hammer_cache_ttl,
+                 copy.deepcopy(result))
+        with self._lock:
+            if generation != self._generations[self._resource(key[0])]:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > max(settings.hammer_cache_size, 1):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, command_base):
+        """Drop the cached results of the ``command_base`` resource."""
+        resource = self._resource(command_base)
+        with self._lock:
+            self._generations[resource] += 1
+            stale = [
+                key for key in self._entries
+                if self._resource(key[0]) == resource
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop all the cached results."""
+        with self._lock:
+            for resource in list(self._generations):
+                self._generations[resource] += 1
+            self._entries.clear()
+
+    def reset_stats(self):
+        """Reset the cache statistics counters."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_stats(self):
+        """Return a dictionary with the cache statistics."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hits': self.hits,
+                'invalidations': self.invalidations,
+                'misses': self.misses,
+            }
+
+
 class Base(object):
     """
     @param command_base: base command of hammer.
@@ -124,8 +298,9 @@ class Base(object):
     @since: 27.Nov.2013
     """
     command_base = None  # each inherited instance should define this
-    command_sub = None  # specific to instance, like: create, update, etc
     command_requires_org = False  # True when command requires organization-id
+    cache = CLIResultCache()  # results of read only commands, see the class
+    _create_state = threading.local()  # see skip_create_info
 
     logger = logging.getLogger('robottelo')
     _db_error_regex = re.compile(
@@ -133,7 +308,7 @@ class Base(object):
     )
 
     @classmethod
-    def _handle_response(cls, response, ignore_stderr=None):
+    def _handle_response(cls, response, ignore_stderr=None, command_sub=None):
         """Verify ``return_code`` of the CLI command.
 
         Check for a non-zero return code or any stderr contents.
@@ -142,6 +317,8 @@ class Base(object):
             :mod:`robottelo.ssh.command`.
         :param ignore_stderr: indicates whether to throw a warning in logs if
             ``stderr`` is not empty.
+        :param command_sub: the subcommand which was run, used in the error
+            message.
         :returns: contents of ``stdout``.
         :raises robottelo.cli.base.CLIReturnCodeError: If return code is
             different from zero.
@@ -151,7 +328,7 @@ class Base(object):
                 u'Command "{0} {1}" finished with return_code {2}\n'
                 'stderr contains following message:\n{3}'.format(
                     cls.command_base,
-                    cls.command_sub,
+                    command_sub,
                     response.return_code,
                     response.stderr
                 )
@@ -174,30 +351,53 @@ class Base(object):
         Adds OS to record.
         """
 
-        cls.command_sub = 'add-operatingsystem'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('add-operatingsystem', options))
 
         return result
 
+    @classmethod
+    @contextmanager
+    def skip_create_info(cls, fields):
+        """Context manager making :meth:`create` return the create output
+        instead of running the ``info`` command when that output holds all of
+        ``fields``. It only applies to the commands run by the current thread.
+
+        :param fields: The normalized names of the fields the caller needs,
+            for example ``('id', 'name')``.
+        """
+        previous = getattr(cls._create_state, 'fields', None)
+        cls._create_state.fields = frozenset(fields)
+        try:
+            yield
+        finally:
+            cls._create_state.fields = previous
+
     @classmethod
     def create(cls, options=None):
         """
         Creates a new record using the arguments passed via dictionary.
         """
 
-        cls.command_sub = 'create'
-
         if options is None:
             options = {}
 
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('create', options),
+            output_format=cls._read_output_format('csv'),
+        )
+        # The JSON output of create is a single message object
+        if isinstance(result, dict):
+            result = [result]
 
         # Extract new object ID if it was successfully created
         if len(result) > 0 and 'id' in result[0]:
             obj_id = result[0]['id']
 
+            fields = getattr(Base._create_state, 'fields', None)
+            if fields is not None and fields.issubset(result[0]):
+                return result[0]
+
             # Fetch new object
             # Some Katello obj require the organization-id for subcommands
             info_options = {u'id': obj_id}
@@ -217,9 +417,8 @@ class Base(object):
     @classmethod
     def delete(cls, options=None):
         """Deletes existing record."""
-        cls.command_sub = 'delete'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('delete', options),
             ignore_stderr=True,
         )
 
@@ -229,9 +428,8 @@ class Base(object):
         Deletes parameter from record.
         """
 
-        cls.command_sub = 'delete-parameter'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('delete-parameter', options))
 
         return result
 
@@ -241,12 +439,19 @@ class Base(object):
         Displays the content for existing partition table.
         """
 
-        cls.command_sub = 'dump'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('dump', options))
 
         return result
 
+    @classmethod
+    def _read_output_format(cls, default):
+        """Return the output format of the read commands, ``json`` if the
+        ``hammer_json_output`` setting is enabled, ``default`` otherwise.
+        """
+        if settings.hammer_json_output:
+            return 'json'
+        return default
+
     @classmethod
     def _get_username_password(cls, username=None, password=None):
         """Lookup for the username and password for cli command in following
@@ -278,35 +483,132 @@ class Base(object):
                 timeout=None, ignore_stderr=None, return_raw_response=None,
                 connection_timeout=None):
         """Executes the cli ``command`` on the server via ssh"""
+        command_sub = cls._get_command_sub(command)
         user, password = cls._get_username_password(user, password)
         time_hammer = False
         if settings.performance:
             time_hammer = settings.performance.time_hammer
 
-        # add time to measure hammer performance
-        cmd = u'LANG={0} {1} hammer -v {2} {3} {4} {5}'.format(
-            settings.locale,
-            u'time -p' if time_hammer else '',
-            u'-u {0}'.format(user) if user is not None
-            else u'--interactive no',
-            u'-p {0}'.format(password) if password is not None else '',
-            u'--output={0}'.format(output_format) if output_format else u'',
-            command,
-        )
-        response = ssh.command(
-            cmd.encode('utf-8'),
-            output_format=output_format,
-            timeout=timeout,
-            connection_timeout=connection_timeout,
-        )
+        hammer_args = cls._hammer_args(command, user, password, output_format)
+        try:
+            response = None
+            if settings.hammer_shell and not time_hammer:
+                try:
+                    response = hammer_shell.get_hammer_shell_pool().run(
+                        hammer_args,
+                        output_format=output_format,
+                        timeout=timeout,
+                        connection_timeout=connection_timeout,
+                        user=user,
+                        password=password,
+                    )
+                except hammer_shell.HammerShellError as err:
+                    if err.command_sent:
+                        # the command may have run, running it again could
+                        # create or delete entities twice
+                        raise
+                    cls.logger.warning(
+                        u'hammer session failed, running the command in a new '
+                        u'hammer process: {0}'.format(err)
+                    )
+            if response is None:
+                # add time to measure hammer performance
+                cmd = u'LANG={0} {1} hammer {2}'.format(
+                    settings.locale,
+                    u'time -p' if time_hammer else '',
+                    hammer_args,
+                )
+                response = ssh.command(
+                    cmd.encode('utf-8'),
+                    output_format=output_format,
+                    timeout=timeout,
+                    connection_timeout=connection_timeout,
+                )
+        finally:
+            if not CLIResultCache.is_read_only(command_sub):
+                cls.cache.invalidate(cls.command_base)
         if return_raw_response:
             return response
         else:
             return cls._handle_response(
                 response,
                 ignore_stderr=ignore_stderr,
+                command_sub=command_sub,
             )
 
+    @classmethod
+    def _hammer_args(cls, command, user, password, output_format=None):
+        """Return the hammer arguments running ``command`` as ``user``."""
+        return u'-v {0} {1} {2} {3}'.format(
+            u'-u {0}'.format(user) if user is not None
+            else u'--interactive no',
+            u'-p {0}'.format(password) if password is not None else '',
+            u'--output={0}'.format(output_format) if output_format else u'',
+            command,
+        )
+
+    @classmethod
+    def execute_iter_csv(cls, command, user=None, password=None,
+                         timeout=None, ignore_stderr=None,
+                         connection_timeout=None):
+        """Executes the cli ``command`` on the server via ssh with CSV output,
+        yielding a dictionary for each row as soon as it is received.
+
+        The response is checked like :meth:`execute` does once all the rows
+        were yielded, only the last lines of the output being kept for its
+        error message. When the caller stops early the command is left to
+        finish in the background and its remaining output is dropped.
+        """
+        command_sub = cls._get_command_sub(command)
+        user, password = cls._get_username_password(user, password)
+        cmd = u'LANG={0} hammer {1}'.format(
+            settings.locale,
+            cls._hammer_args(command, user, password, 'csv'),
+        )
+        lines = queue.Queue()
+        finished = object()
+        outcome = {}
+        state = {'consuming': True}
+
+        def receive_line(line):
+            if state['consuming']:
+                lines.put(line)
+
+        def run_command():
+            try:
+                outcome['response'] = ssh.command(
+                    cmd.encode('utf-8'),
+                    timeout=timeout,
+                    connection_timeout=connection_timeout,
+                    stdout_callback=receive_line,
+                    keep_output=False,
+                )
+            except Exception as err:
+                outcome['error'] = err
+            finally:
+                lines.put(finished)
+
+        def received_lines():
+            for line in iter(lines.get, finished):
+                yield line
+
+        thread = threading.Thread(target=run_command)
+        thread.daemon = True
+        thread.start()
+        try:
+            for row in hammer.iter_csv(received_lines()):
+                yield row
+        finally:
+            state['consuming'] = False
+        thread.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        cls._handle_response(
+            outcome['response'],
+            ignore_stderr=ignore_stderr,
+            command_sub=command_sub,
+        )
+
     @classmethod
     def exists(cls, options=None, search=None):
         """Search for an entity using the query ``search[0]="search[1]"``
@@ -327,19 +629,23 @@ class Base(object):
                 u'search': u'{0}=\\"{1}\\"'.format(search[0], search[1])
             })
 
-        result = cls.list(options)
-        if result:
-            result = result[0]
+        for result in cls.list(options, lazy=True):
+            return result
 
-        return result
+        return []
 
     @classmethod
     def info(cls, options=None, output_format=None, return_raw_response=None):
-        """Reads the entity information."""
-        cls.command_sub = 'info'
+        """Reads the entity information.
 
+        The plain output is parsed by :func:`robottelo.cli.hammer.parse_info`
+        unless ``output_format`` is given or the ``hammer_json_output``
+        setting is enabled.
+        """
         if options is None:
             options = {}
+        if output_format is None and not return_raw_response:
+            output_format = cls._read_output_format(None)
 
         if cls.command_requires_org and 'organization-id' not in options:
             raise CLIError(
@@ -348,26 +654,42 @@ class Base(object):
                 )
             )
 
+        cache_key = None
+        if not return_raw_response:
+            cache_key = cls.cache.make_key(
+                cls.command_base, u'info', options,
+                cls._get_username_password()[0], output_format)
+        found, result = cls.cache.get(cache_key)
+        if found:
+            return result
+        generation = cls.cache.generation(cls.command_base)
         result = cls.execute(
-            command=cls._construct_command(options),
+            command=cls._construct_command('info', options),
             output_format=output_format,
             return_raw_response=return_raw_response,
         )
         if not return_raw_response and output_format != 'json':
             result = hammer.parse_info(result)
+        cls.cache.set(cache_key, result, generation)
         return result
 
     @classmethod
-    def list(cls, options=None, per_page=True, output_format='csv'):
+    def list(cls, options=None, per_page=True, output_format=None,
+             lazy=False):
         """
         List information.
         @param options: ID (sometimes name works as well) to retrieve info.
+        @param output_format: csv by default, json when the
+            ``hammer_json_output`` setting is enabled.
+        @param lazy: return an iterator over the entities instead of a list,
+            the CSV output being parsed as it is received so the caller can
+            stop as soon as it found what it needs.
         """
 
-        cls.command_sub = 'list'
-
         if options is None:
             options = {}
+        if output_format is None:
+            output_format = cls._read_output_format('csv')
 
         if 'per-page' not in options and per_page:
             options[u'per-page'] = 10000
@@ -379,10 +701,82 @@ class Base(object):
                 )
             )
 
+        cache_key = cls.cache.make_key(
+            cls.command_base, u'list', options,
+            cls._get_username_password()[0], output_format)
+        found, result = cls.cache.get(cache_key)
+        if found:
+            return iter(result) if lazy else result
+        if lazy and output_format == 'csv':
+            return cls.execute_iter_csv(
+                cls._construct_command('list', options))
+        generation = cls.cache.generation(cls.command_base)
         result = cls.execute(
-            cls._construct_command(options), output_format=output_format)
+            cls._construct_command('list', options),
+            output_format=output_format)
+        cls.cache.set(cache_key, result, generation)
 
-        return result
+        return iter(result) if lazy else result
+
+    @classmethod
+    def iter_list(cls, options=None, page_size=1000, prefetch=False):
+        """
+        Iterate over the entities listed, requesting them one page at a time
+        instead of all at once.
+        @param options: the options of the list command, ``page`` and
+            ``per-page`` being set for each request.
+        @param page_size: the number of entities requested at once.
+        @param prefetch: request the next page on a background thread while
+            the caller consumes the current one.
+        """
+        if page_size < 1:
+            raise CLIError('page_size must be a positive number')
+        options = dict(options or {})
+
+        def fetch_page(number):
+            """Return the entities of a page, its options being built from a
+            copy as ``list`` updates them.
+            """
+            page_options = dict(options)
+            page_options[u'page'] = number
+            page_options[u'per-page'] = page_size
+            return cls.list(page_options, per_page=False)
+
+        def start_prefetch(number):
+            """Fetch a page on a daemon thread, returning the thread and the
+            dict the result or the error is stored in.
+            """
+            outcome = {}
+
+            def run():
+                try:
+                    outcome['result'] = fetch_page(number)
+                except Exception as err:
+                    outcome['error'] = err
+            thread = threading.Thread(target=run)
+            thread.daemon = True
+            thread.start()
+            return thread, outcome
+
+        number = 1
+        page = fetch_page(number)
+        while page:
+            pending = None
+            if prefetch and len(page) >= page_size:
+                pending = start_prefetch(number + 1)
+            for entity in page:
+                yield entity
+            if len(page) < page_size:
+                return
+            number += 1
+            if pending is None:
+                page = fetch_page(number)
+            else:
+                thread, outcome = pending
+                thread.join()
+                if 'error' in outcome:
+                    raise outcome['error']
+                page = outcome['result']
 
     @classmethod
     def puppetclasses(cls, options=None):
@@ -390,10 +784,9 @@ class Base(object):
         Lists all puppet classes.
         """
 
-        cls.command_sub = 'puppet-classes'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('puppet-classes', options),
+            output_format='csv')
 
         return result
 
@@ -403,9 +796,8 @@ class Base(object):
         Removes OS from record.
         """
 
-        cls.command_sub = 'remove-operatingsystem'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('remove-operatingsystem', options))
 
         return result
 
@@ -415,10 +807,8 @@ class Base(object):
         Lists all smart class parameters.
         """
 
-        cls.command_sub = 'sc-params'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('sc-params', options), output_format='csv')
 
         return result
 
@@ -428,9 +818,7 @@ class Base(object):
         Creates or updates parameter for a record.
         """
 
-        cls.command_sub = 'set-parameter'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('set-parameter', options))
 
         return result
 
@@ -440,10 +828,8 @@ class Base(object):
         Updates existing record.
         """
 
-        cls.command_sub = 'update'
-
         result = cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('update', options),
             output_format='csv',
             return_raw_response=return_raw_response,
         )
@@ -465,8 +851,14 @@ class Base(object):
         return Wrapper
 
     @classmethod
-    def _construct_command(cls, options=None):
-        """Build a hammer cli command based on the options passed"""
+    def _construct_command(cls, command_sub, options=None):
+        """Build a hammer cli command based on the subcommand and the options
+        passed.
+
+        The subcommand is given on each call instead of being stored in the
+        class, so the commands of a class can be built from several threads
+        at once.
+        """
         tail = u''
 
         if options is None:
@@ -483,8 +875,20 @@ class Base(object):
                 tail += u' --{0}="{1}"'.format(key, val)
         cmd = u'{0} {1} {2}'.format(
             cls.command_base,
-            cls.command_sub,
+            command_sub,
             tail.strip()
         )
 
         return cmd
+
+    @classmethod
+    def _get_command_sub(cls, command):
+        """Return the subcommand of a command built by
+        :meth:`_construct_command`, ``None`` if it can not be found.
+        """
+        if isinstance(command, bytes):
+            command = command.decode('utf-8')
+        prefix = u'{0} '.format(cls.command_base)
+        if not cls.command_base or not command.startswith(prefix):
+            return None
+        return command[len(prefix):].split(u' --', 1)[0].strip() or None
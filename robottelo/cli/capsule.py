@@ -35,10 +35,10 @@ class Capsule(Base):
     def content_add_lifecycle_environment(cls, options):
         """Add lifecycle environments to the capsule."""
 
-        cls.command_sub = 'content add-lifecycle-environment'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command(
+                'content add-lifecycle-environment', options),
+            output_format='csv')
 
         return result
 
@@ -46,10 +46,10 @@ class Capsule(Base):
     def content_available_lifecycle_environments(cls, options):
         """List the lifecycle environments not attached to the capsule."""
 
-        cls.command_sub = 'content available-lifecycle-environments'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command(
+                'content available-lifecycle-environments', options),
+            output_format='csv')
 
         return result
 
@@ -57,10 +57,9 @@ class Capsule(Base):
     def content_info(cls, options):
         """Get current capsule synchronization status."""
 
-        cls.command_sub = 'content info'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='json')
+            cls._construct_command('content info', options),
+            output_format='json')
 
         return result
 
@@ -68,10 +67,9 @@ class Capsule(Base):
     def content_lifecycle_environments(cls, options):
         """List the lifecycle environments attached to the capsule."""
 
-        cls.command_sub = 'content lifecycle-environments'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('content lifecycle-environments', options),
+            output_format='csv')
 
         return result
 
@@ -79,10 +77,10 @@ class Capsule(Base):
     def content_remove_lifecycle_environment(cls, options):
         """Remove lifecycle environments from the capsule."""
 
-        cls.command_sub = 'content remove-lifecycle-environment'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command(
+                'content remove-lifecycle-environment', options),
+            output_format='csv')
 
         return result
 
@@ -90,10 +88,9 @@ class Capsule(Base):
     def content_synchronization_status(cls, options):
         """Get current capsule synchronization status."""
 
-        cls.command_sub = 'content synchronization-status'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('content synchronization-status', options),
+            output_format='csv')
 
         return result
 
@@ -101,10 +98,9 @@ class Capsule(Base):
     def content_synchronize(cls, options):
         """Synchronize the content to the capsule."""
 
-        cls.command_sub = 'content synchronize'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('content synchronize', options),
+            output_format='csv')
 
         return result
 
@@ -112,10 +108,9 @@ class Capsule(Base):
     def import_classes(cls, options):
         """Import puppet classes from puppet Capsule."""
 
-        cls.command_sub = 'import-classes'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('import-classes', options),
+            output_format='csv')
 
         return result
 
@@ -123,9 +118,8 @@ class Capsule(Base):
     def refresh_features(cls, options):
         """Refresh capsule features."""
 
-        cls.command_sub = 'refresh-features'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('refresh-features', options),
+            output_format='csv')
 
         return result
@@ -53,8 +53,7 @@ class CSV_(Base):
             -h, --help                    print help
             -v, --verbose                 be verbose
         """
-        cls.command_sub = 'activation-keys'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('activation-keys', options))
 
     @classmethod
     def content_hosts(cls, options=None):
@@ -128,8 +127,7 @@ class CSV_(Base):
             Subscription End        - Subscription end date (only applicable
                                     for --itemized-subscriptions)
         """
-        cls.command_sub = 'content-hosts'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('content-hosts', options))
 
     @classmethod
     def subscriptions(cls, options=None):
@@ -151,5 +149,4 @@ class CSV_(Base):
                                           this name
             --search SEARCH               Only export search results
         """
-        cls.command_sub = 'subscriptions'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('subscriptions', options))
@@ -116,7 +116,7 @@ class DockerContainer(Base):
         return super(DockerContainer, cls).info(options)
 
     @classmethod
-    def list(cls, options=None, per_page=True):
+    def list(cls, options=None, per_page=True, lazy=False):
         """Lists docker containers
 
         Usage::
@@ -132,7 +132,7 @@ class DockerContainer(Base):
                                                       request
 
         """
-        return super(DockerContainer, cls).list(options)
+        return super(DockerContainer, cls).list(options, lazy=lazy)
 
     @classmethod
     def logs(cls, options=None):
@@ -156,8 +156,7 @@ class DockerContainer(Base):
                                                       Default: 100
 
         """
-        cls.command_sub = 'logs'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('logs', options))
 
     @classmethod
     def start(cls, options=None):
@@ -175,8 +174,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'start'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('start', options))
 
     @classmethod
     def status(cls, options=None):
@@ -194,8 +192,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'status'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('status', options))
 
     @classmethod
     def stop(cls, options=None):
@@ -213,8 +210,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'stop'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('stop', options))
 
 
 class DockerManifest(Base):
@@ -256,7 +252,7 @@ class DockerManifest(Base):
         return super(DockerManifest, cls).info(options)
 
     @classmethod
-    def list(cls, options=None, per_page=True):
+    def list(cls, options=None, per_page=True, lazy=False):
         """List docker manifests
 
         Usage::
@@ -308,7 +304,8 @@ class DockerManifest(Base):
          --search SEARCH                                     Search string
 
         """
-        return super(DockerManifest, cls).list(options, per_page)
+        return super(DockerManifest, cls).list(
+            options, per_page, lazy=lazy)
 
 
 class DockerRegistry(Base):
@@ -386,7 +383,7 @@ class DockerRegistry(Base):
         return super(DockerRegistry, cls).info(options)
 
     @classmethod
-    def list(cls, options=None, per_page=True):
+    def list(cls, options=None, per_page=True, lazy=False):
         """List docker registries
 
         Usage::
@@ -401,7 +398,8 @@ class DockerRegistry(Base):
             --search SEARCH               filter results
 
         """
-        return super(DockerRegistry, cls).list(options, per_page)
+        return super(DockerRegistry, cls).list(
+            options, per_page, lazy=lazy)
 
     @classmethod
     def update(cls, options=None):
@@ -464,7 +462,7 @@ class DockerTag(Base):
         return super(DockerTag, cls).info(options)
 
     @classmethod
-    def list(cls, options=None, per_page=True):
+    def list(cls, options=None, per_page=True, lazy=False):
         """List docker tags
 
         Usage::
@@ -506,7 +504,8 @@ class DockerTag(Base):
             --repository-id REPOSITORY_ID                       repository ID
 
         """
-        return super(DockerTag, cls).list(options, per_page)
+        return super(DockerTag, cls).list(
+            options, per_page, lazy=lazy)
 
 
 class Docker(Base):
@@ -4,10 +4,12 @@ Factory object creation for all CLI methods
 """
 
 import datetime
+import functools
 import json
 import logging
 import os
 import random
+import threading
 import time
 
 from fauxfactory import (
@@ -18,11 +20,12 @@ from fauxfactory import (
     gen_netmask,
     gen_string,
 )
+from multiprocessing.pool import ThreadPool
 from os import chmod
 from robottelo import manifests, ssh
 from robottelo.cli.activationkey import ActivationKey
 from robottelo.cli.architecture import Architecture
-from robottelo.cli.base import CLIReturnCodeError
+from robottelo.cli.base import Base, CLIReturnCodeError
 from robottelo.cli.capsule import Capsule
 from robottelo.cli.computeresource import ComputeResource
 from robottelo.cli.contentview import (
@@ -93,6 +96,7 @@ from robottelo.helpers import (
     update_dictionary, default_url_on_new_port, get_available_capsule_port
 )
 from robottelo.ssh import download_file, upload_file
+from robottelo.step_graph import StepGraph
 from tempfile import mkstemp
 from time import sleep
 
@@ -162,6 +166,143 @@ def _entity_with_credentials(credentials, cli_entity_cls):
     return cli_entity_cls
 
 
+def _cli_entity_exists(cli_object):
+    """Return a function telling whether an entity cached by a factory still
+    exists on the server, to be passed to
+    :func:`robottelo.decorators.cacheable`.
+
+    :param cli_object: The CLI object whose ``info`` fetches the entity by
+        ``id``.
+    """
+    def exists(entity):
+        try:
+            with Base.cache.disabled():
+                cli_object.info({u'id': entity['id']})
+        except CLIReturnCodeError:
+            return False
+        return True
+    return exists
+
+
+#: Semaphores bounding the bulk creates run at once against each server
+_bulk_semaphores = {}
+_bulk_semaphores_lock = threading.Lock()
+
+
+def _bulk_semaphore(hostname):
+    """Return the semaphore bounding the bulk creates run on ``hostname``.
+
+    It is shared by all the bulk creates of the process, so concurrent calls
+    to :func:`create_objects_bulk` do not run more than
+    ``hammer_bulk_workers`` creates at once against the same server.
+    """
+    with _bulk_semaphores_lock:
+        if hostname not in _bulk_semaphores:
+            _bulk_semaphores[hostname] = threading.BoundedSemaphore(
+                max(settings.hammer_bulk_workers, 1))
+        return _bulk_semaphores[hostname]
+
+
+def create_objects_bulk(factory, options_list, info_fields=None,
+                        workers=None):
+    """Run a ``make_*`` factory once per options concurrently.
+
+    :param factory: A factory function accepting an options dictionary, like
+        :func:`make_user`.
+    :param options_list: An iterable of the options passed to each factory
+        call, ``None`` using the factory defaults.
+    :param info_fields: The fields the caller needs from the created
+        entities. When the create output holds all of them, the ``info``
+        command usually run after a create is skipped and the create output
+        is returned instead. See :meth:`robottelo.cli.base.Base.create`.
+    :param int workers: The maximum number of factory calls run at once by
+        this call, ``hammer_bulk_workers`` from the ``[robottelo]`` section
+        by default, which also bounds all the bulk creates run on the server.
+    :return: A list holding for each options, in the same order, either the
+        created entity or the :class:`CLIFactoryError` its creation raised.
+    :rtype: list
+    """
+    options_list = list(options_list)
+    if not options_list:
+        return []
+    if workers is None:
+        workers = settings.hammer_bulk_workers
+    workers = max(1, min(workers, len(options_list)))
+    semaphore = _bulk_semaphore(settings.server.hostname)
+    name = getattr(factory, '__name__', repr(factory))
+
+    def create(options):
+        """Run the factory, returning the error it raised if any."""
+        with semaphore:
+            try:
+                if info_fields is None:
+                    return factory(options)
+                with Base.skip_create_info(info_fields):
+                    return factory(options)
+            except CLIFactoryError as err:
+                return err
+            except Exception as err:
+                return CLIFactoryError(
+                    u'{0} failed with options {1!r}: {2!r}'.format(
+                        name, options, err)
+                )
+
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(create, options_list)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def make_many(factory, count, options_fn=None, info_fields=None,
+              workers=None):
+    """Create ``count`` entities with a ``make_*`` factory concurrently.
+
+    Usage::
+
+        users = make_many(
+            make_user, 20, lambda index: {'organization-ids': org['id']},
+            info_fields=('id', 'login'),
+        )
+
+    :param factory: A factory function accepting an options dictionary, like
+        :func:`make_user`.
+    :param int count: The number of entities to create.
+    :param options_fn: A function returning the options of the entity from
+        its index, the factory defaults being used if it is ``None``.
+    :param info_fields: See :func:`create_objects_bulk`.
+    :param int workers: See :func:`create_objects_bulk`.
+    :raise robottelo.cli.factory.CLIFactoryError: Raise an exception holding
+        the error of each entity which could not be created, once all the
+        creates finished.
+    :return: The created entities, in index order.
+    :rtype: list
+    """
+    results = create_objects_bulk(
+        factory,
+        (options_fn(index) if options_fn else None
+         for index in range(count)),
+        info_fields=info_fields,
+        workers=workers,
+    )
+    errors = [
+        u'{0}: {1}'.format(index, result)
+        for index, result in enumerate(results)
+        if isinstance(result, CLIFactoryError)
+    ]
+    if errors:
+        raise CLIFactoryError(
+            u'Failed to create {0} of {1} entities with {2}:\n{3}'.format(
+                len(errors),
+                count,
+                getattr(factory, '__name__', repr(factory)),
+                u'\n'.join(errors),
+            )
+        )
+    return results
+
+
 @cacheable
 def make_activation_key(options=None):
     """
@@ -211,7 +352,7 @@ def make_activation_key(options=None):
     return create_object(ActivationKey, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Architecture))
 def make_architecture(options=None):
     """
     Usage::
@@ -627,7 +768,7 @@ def make_gpg_key(options=None):
     return create_object(GPGKey, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Location))
 def make_location(options=None):
     """Location CLI factory
 
@@ -724,7 +865,7 @@ def make_location(options=None):
     return create_object(Location, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Model))
 def make_model(options=None):
     """
     Usage::
@@ -748,7 +889,7 @@ def make_model(options=None):
     return create_object(Model, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(PartitionTable))
 def make_partition_table(options=None):
     """
     Usage::
@@ -1026,7 +1167,7 @@ def make_repository_with_credentials(options=None, credentials=None):
     return create_object(repo_cls, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Role))
 def make_role(options=None):
     """Usage::
 
@@ -1206,7 +1347,7 @@ def make_scap_policy(options=None):
     return create_object(Scappolicy, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Subnet))
 def make_subnet(options=None):
     """
     Usage::
@@ -1805,7 +1946,7 @@ def make_job_template(options=None):
     return create_object(JobTemplate, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(User))
 def make_user(options=None):
     """
     Usage::
@@ -2094,7 +2235,7 @@ def make_compute_resource(options=None):
     return create_object(ComputeResource, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Org))
 def make_org(options=None):
     return make_org_with_credentials(options)
 
@@ -2246,7 +2387,7 @@ def make_realm(options=None):
     return create_object(Realm, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(OperatingSys))
 def make_os(options=None):
     """
     Usage::
@@ -2353,7 +2494,7 @@ def make_scapcontent(options=None):
     return create_object(Scapcontent, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Domain))
 def make_domain(options=None):
     """
     Usage::
@@ -2389,7 +2530,7 @@ def make_domain(options=None):
     return create_object(Domain, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(HostGroup))
 def make_hostgroup(options=None):
     """
     Usage::
@@ -2512,7 +2653,7 @@ def make_hostgroup(options=None):
     return create_object(HostGroup, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Medium))
 def make_medium(options=None):
     """
     Usage::
@@ -2572,7 +2713,7 @@ def make_medium(options=None):
     return create_object(Medium, args, options)
 
 
-@cacheable
+@cacheable(validate=_cli_entity_exists(Environment))
 def make_environment(options=None):
     """
     Usage::
@@ -2954,6 +3095,99 @@ def activationkey_add_subscription_to_repo(options=None):
                 )
 
 
+def _add_publish_promote_steps(graph):
+    """Add the steps publishing a content view and promoting its new version
+    to a lifecycle environment to the ``graph`` of an org setup.
+
+    The graph must define the ``org_id``, ``env_id`` and ``cv_id`` steps, the
+    ``add_repository`` step adding the repository to the content view and
+    the ``synchronize`` step synchronizing the repository.
+    """
+    # Publish a new version of CV
+    @graph.step(requires=['add_repository', 'synchronize'])
+    def publish(results):
+        try:
+            ContentView.publish({u'id': results['cv_id']})
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to publish new version of content view\n{0}'
+                .format(err.msg)
+            )
+
+    # Promote the new version to the lifecycle environment
+    @graph.step(requires=['publish', 'env_id'])
+    def promote(results):
+        try:
+            cvv = ContentView.info({u'id': results['cv_id']})['versions'][-1]
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to fetch content view info\n{0}'.format(err.msg))
+        try:
+            ContentView.version_promote({
+                u'id': cvv['id'],
+                u'organization-id': results['org_id'],
+                u'to-lifecycle-environment-id': results['env_id'],
+            })
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to promote version to next environment\n{0}'
+                .format(err.msg)
+            )
+
+
+def _add_activation_key_steps(graph, options, subscription_requires,
+                              subscription_name):
+    """Add the steps setting up the activation key to the ``graph`` of an org
+    setup.
+
+    A new activation key is created while the content view is being
+    prepared, then associated with the content view and the lifecycle
+    environment once the content view is promoted. A given activation key is
+    only associated with the content view. The graph must define the steps
+    required by :func:`_add_publish_promote_steps`.
+
+    :param dict options: The setup options, holding ``activationkey-id`` if
+        the activation key is given.
+    :param list subscription_requires: The steps required to find the
+        subscription to add to the activation key.
+    :param subscription_name: Returns the name of the subscription from the
+        results of the steps.
+    """
+    @graph.step(requires=['org_id'])
+    def activationkey_id(results):
+        if options.get('activationkey-id') is None:
+            return make_activation_key(
+                {u'organization-id': results['org_id']})['id']
+        return options['activationkey-id']
+
+    # Associate the activation key with the promoted content view
+    @graph.step(requires=['activationkey_id', 'promote'])
+    def associate_activation_key(results):
+        update_options = {
+            u'content-view-id': results['cv_id'],
+            u'id': results['activationkey_id'],
+            u'organization-id': results['org_id'],
+        }
+        if options.get('activationkey-id') is None:
+            update_options[u'lifecycle-environment-id'] = results['env_id']
+        try:
+            ActivationKey.update(update_options)
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to associate activation-key with CV\n{0}'
+                .format(err.msg)
+            )
+
+    # Add subscription to activation-key
+    @graph.step(requires=['activationkey_id'] + list(subscription_requires))
+    def add_subscription(results):
+        activationkey_add_subscription_to_repo({
+            u'activationkey-id': results['activationkey_id'],
+            u'organization-id': results['org_id'],
+            u'subscription': subscription_name(results),
+        })
+
+
 def setup_org_for_a_custom_repo(options=None):
     """Sets up Org for the given custom repo by:
 
@@ -2968,6 +3202,10 @@ def setup_org_for_a_custom_repo(options=None):
         associates it with the content view.
     5. Adds the custom repo subscription to the activation key
 
+    The steps which do not depend on each other, like creating the content
+    view while the repository synchronizes, run concurrently. See
+    :class:`robottelo.step_graph.StepGraph`.
+
     Options::
 
         url - URL to custom repository
@@ -2988,99 +3226,79 @@ def setup_org_for_a_custom_repo(options=None):
             not options or
             not options.get('url')):
         raise CLIFactoryError('Please provide valid custom repo URL.')
+    graph = StepGraph('setup_org_for_a_custom_repo')
+
     # Create new organization and lifecycle environment if needed
-    if options.get('organization-id') is None:
-        org_id = make_org()['id']
-    else:
-        org_id = options['organization-id']
-    if options.get('lifecycle-environment-id') is None:
-        env_id = make_lifecycle_environment({u'organization-id': org_id})['id']
-    else:
-        env_id = options['lifecycle-environment-id']
+    @graph.step()
+    def org_id(results):
+        if options.get('organization-id') is None:
+            return make_org()['id']
+        return options['organization-id']
+
+    @graph.step(requires=['org_id'])
+    def env_id(results):
+        if options.get('lifecycle-environment-id') is None:
+            return make_lifecycle_environment(
+                {u'organization-id': results['org_id']})['id']
+        return options['lifecycle-environment-id']
+
     # Create custom product and repository
-    custom_product = make_product({u'organization-id': org_id})
-    custom_repo = make_repository({
-        u'content-type': 'yum',
-        u'product-id': custom_product['id'],
-        u'url': options.get('url'),
-    })
+    @graph.step(requires=['org_id'])
+    def custom_product(results):
+        return make_product({u'organization-id': results['org_id']})
+
+    @graph.step(requires=['custom_product'])
+    def custom_repo(results):
+        return make_repository({
+            u'content-type': 'yum',
+            u'product-id': results['custom_product']['id'],
+            u'url': options.get('url'),
+        })
+
     # Synchronize custom repository
-    try:
-        Repository.synchronize({'id': custom_repo['id']})
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to synchronize repository\n{0}'.format(err.msg))
+    @graph.step(requires=['custom_repo'])
+    def synchronize(results):
+        try:
+            Repository.synchronize({'id': results['custom_repo']['id']})
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to synchronize repository\n{0}'.format(err.msg))
+
     # Create CV if needed and associate repo with it
-    if options.get('content-view-id') is None:
-        cv_id = make_content_view({u'organization-id': org_id})['id']
-    else:
-        cv_id = options['content-view-id']
-    try:
-        ContentView.add_repository({
-            u'id': cv_id,
-            u'organization-id': org_id,
-            u'repository-id': custom_repo['id'],
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to add repository to content view\n{0}'.format(err.msg))
-    # Publish a new version of CV
-    try:
-        ContentView.publish({u'id': cv_id})
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to publish new version of content view\n{0}'
-            .format(err.msg)
-        )
-    # Get the version id
-    cvv = ContentView.info({u'id': cv_id})['versions'][-1]
-    # Promote version to next env
-    try:
-        ContentView.version_promote({
-            u'id': cvv['id'],
-            u'organization-id': org_id,
-            u'to-lifecycle-environment-id': env_id,
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to promote version to next environment\n{0}'
-            .format(err.msg)
-        )
-    # Create activation key if needed and associate content view with it
-    if options.get('activationkey-id') is None:
-        activationkey_id = make_activation_key({
-            u'content-view-id': cv_id,
-            u'lifecycle-environment-id': env_id,
-            u'organization-id': org_id,
-        })['id']
-    else:
-        activationkey_id = options['activationkey-id']
-        # Given activation key may have no (or different) CV associated.
-        # Associate activation key with CV just to be sure
+    @graph.step(requires=['org_id'])
+    def cv_id(results):
+        if options.get('content-view-id') is None:
+            return make_content_view(
+                {u'organization-id': results['org_id']})['id']
+        return options['content-view-id']
+
+    @graph.step(requires=['cv_id', 'custom_repo'])
+    def add_repository(results):
         try:
-            ActivationKey.update({
-                u'content-view-id': cv_id,
-                u'id': activationkey_id,
-                u'organization-id': org_id,
+            ContentView.add_repository({
+                u'id': results['cv_id'],
+                u'organization-id': results['org_id'],
+                u'repository-id': results['custom_repo']['id'],
             })
         except CLIReturnCodeError as err:
             raise CLIFactoryError(
-                u'Failed to associate activation-key with CV\n{0}'
+                u'Failed to add repository to content view\n{0}'
                 .format(err.msg)
             )
-    # Add subscription to activation-key
-    activationkey_add_subscription_to_repo({
-        u'activationkey-id': activationkey_id,
-        u'organization-id': org_id,
-        u'subscription': custom_product['name'],
-    })
+
+    _add_publish_promote_steps(graph)
+    _add_activation_key_steps(
+        graph, options, ['org_id', 'custom_product'],
+        lambda results: results['custom_product']['name'],
+    )
+    results = graph.run()
     return {
-        u'activationkey-id': activationkey_id,
-        u'content-view-id': cv_id,
-        u'lifecycle-environment-id': env_id,
-        u'organization-id': org_id,
-        u'product-id': custom_product['id'],
-        u'repository-id': custom_repo['id'],
+        u'activationkey-id': results['activationkey_id'],
+        u'content-view-id': results['cv_id'],
+        u'lifecycle-environment-id': results['env_id'],
+        u'organization-id': results['org_id'],
+        u'product-id': results['custom_product']['id'],
+        u'repository-id': results['custom_repo']['id'],
     }
 
 
@@ -3099,6 +3317,9 @@ def _setup_org_for_a_rh_repo(options=None):
         associates it with the content view.
     6. Adds the RH repo subscription to the activation key
 
+    The steps which do not depend on each other run concurrently, as in
+    ``setup_org_for_a_custom_repo``.
+
     Note that in most cases you should use ``setup_org_for_a_rh_repo`` instead
     as it's more flexible.
 
@@ -3131,133 +3352,112 @@ def _setup_org_for_a_rh_repo(options=None):
             not options.get('repository')):
         raise CLIFactoryError(
             'Please provide valid product, repository-set and repo.')
+    graph = StepGraph('setup_org_for_a_rh_repo')
+
     # Create new organization and lifecycle environment if needed
-    if options.get('organization-id') is None:
-        org_id = make_org()['id']
-    else:
-        org_id = options['organization-id']
-    if options.get('lifecycle-environment-id') is None:
-        env_id = make_lifecycle_environment({u'organization-id': org_id})['id']
-    else:
-        env_id = options['lifecycle-environment-id']
+    @graph.step()
+    def org_id(results):
+        if options.get('organization-id') is None:
+            return make_org()['id']
+        return options['organization-id']
+
+    @graph.step(requires=['org_id'])
+    def env_id(results):
+        if options.get('lifecycle-environment-id') is None:
+            return make_lifecycle_environment(
+                {u'organization-id': results['org_id']})['id']
+        return options['lifecycle-environment-id']
+
     # Clone manifest and upload it
-    with manifests.clone() as manifest:
-        upload_file(manifest.content, manifest.filename)
-    try:
-        Subscription.upload({
-            u'file': manifest.filename,
-            u'organization-id': org_id,
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to upload manifest\n{0}'.format(err.msg))
+    @graph.step(requires=['org_id'])
+    def upload_manifest(results):
+        with manifests.clone() as manifest:
+            upload_file(manifest.content, manifest.filename)
+        try:
+            Subscription.upload({
+                u'file': manifest.filename,
+                u'organization-id': results['org_id'],
+            })
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to upload manifest\n{0}'.format(err.msg))
+
     # Enable repo from Repository Set
-    try:
-        RepositorySet.enable({
-            u'basearch': 'x86_64',
-            u'name': options['repository-set'],
-            u'organization-id': org_id,
-            u'product': options['product'],
-            u'releasever': options.get('releasever'),
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to enable repository set\n{0}'.format(err.msg))
+    @graph.step(requires=['upload_manifest'])
+    def enable(results):
+        try:
+            RepositorySet.enable({
+                u'basearch': 'x86_64',
+                u'name': options['repository-set'],
+                u'organization-id': results['org_id'],
+                u'product': options['product'],
+                u'releasever': options.get('releasever'),
+            })
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to enable repository set\n{0}'.format(err.msg))
+
     # Fetch repository info
-    try:
-        rhel_repo = Repository.info({
-            u'name': options['repository'],
-            u'organization-id': org_id,
-            u'product': options['product'],
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to fetch repository info\n{0}'.format(err.msg))
+    @graph.step(requires=['enable'])
+    def rhel_repo(results):
+        try:
+            return Repository.info({
+                u'name': options['repository'],
+                u'organization-id': results['org_id'],
+                u'product': options['product'],
+            })
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to fetch repository info\n{0}'.format(err.msg))
+
     # Synchronize the RH repository
-    try:
-        Repository.synchronize({
-            u'name': options['repository'],
-            u'organization-id': org_id,
-            u'product': options['product'],
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to synchronize repository\n{0}'.format(err.msg))
+    @graph.step(requires=['enable'])
+    def synchronize(results):
+        try:
+            Repository.synchronize({
+                u'name': options['repository'],
+                u'organization-id': results['org_id'],
+                u'product': options['product'],
+            })
+        except CLIReturnCodeError as err:
+            raise CLIFactoryError(
+                u'Failed to synchronize repository\n{0}'.format(err.msg))
+
     # Create CV if needed and associate repo with it
-    if options.get('content-view-id') is None:
-        cv_id = make_content_view({u'organization-id': org_id})['id']
-    else:
-        cv_id = options['content-view-id']
-    try:
-        ContentView.add_repository({
-            u'id': cv_id,
-            u'organization-id': org_id,
-            u'repository-id': rhel_repo['id'],
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to add repository to content view\n{0}'.format(err.msg))
-    # Publish a new version of CV
-    try:
-        ContentView.publish({u'id': cv_id})
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to publish new version of content view\n{0}'
-            .format(err.msg)
-        )
-    # Get the version id
-    try:
-        cvv = ContentView.info({u'id': cv_id})['versions'][-1]
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to fetch content view info\n{0}'.format(err.msg))
-    # Promote version1 to next env
-    try:
-        ContentView.version_promote({
-            u'id': cvv['id'],
-            u'organization-id': org_id,
-            u'to-lifecycle-environment-id': env_id,
-        })
-    except CLIReturnCodeError as err:
-        raise CLIFactoryError(
-            u'Failed to promote version to next environment\n{0}'
-            .format(err.msg)
-        )
-    # Create activation key if needed and associate content view with it
-    if options.get('activationkey-id') is None:
-        activationkey_id = make_activation_key({
-            u'content-view-id': cv_id,
-            u'lifecycle-environment-id': env_id,
-            u'organization-id': org_id,
-        })['id']
-    else:
-        activationkey_id = options['activationkey-id']
-        # Given activation key may have no (or different) CV associated.
-        # Associate activation key with CV just to be sure
+    @graph.step(requires=['org_id'])
+    def cv_id(results):
+        if options.get('content-view-id') is None:
+            return make_content_view(
+                {u'organization-id': results['org_id']})['id']
+        return options['content-view-id']
+
+    @graph.step(requires=['cv_id', 'rhel_repo'])
+    def add_repository(results):
         try:
-            ActivationKey.update({
-                u'id': activationkey_id,
-                u'organization-id': org_id,
-                u'content-view-id': cv_id,
+            ContentView.add_repository({
+                u'id': results['cv_id'],
+                u'organization-id': results['org_id'],
+                u'repository-id': results['rhel_repo']['id'],
             })
         except CLIReturnCodeError as err:
             raise CLIFactoryError(
-                u'Failed to associate activation-key with CV\n{0}'
+                u'Failed to add repository to content view\n{0}'
                 .format(err.msg)
             )
-    # Add subscription to activation-key
-    activationkey_add_subscription_to_repo({
-        u'organization-id': org_id,
-        u'activationkey-id': activationkey_id,
-        u'subscription': options.get(
+
+    _add_publish_promote_steps(graph)
+    _add_activation_key_steps(
+        graph, options, ['org_id', 'upload_manifest'],
+        lambda results: options.get(
             u'subscription', DEFAULT_SUBSCRIPTION_NAME),
-    })
+    )
+    results = graph.run()
     return {
-        u'activationkey-id': activationkey_id,
-        u'content-view-id': cv_id,
-        u'lifecycle-environment-id': env_id,
-        u'organization-id': org_id,
-        u'repository-id': rhel_repo['id'],
+        u'activationkey-id': results['activationkey_id'],
+        u'content-view-id': results['cv_id'],
+        u'lifecycle-environment-id': results['env_id'],
+        u'organization-id': results['org_id'],
+        u'repository-id': results['rhel_repo']['id'],
     }
 
 
@@ -3323,182 +3523,253 @@ def configure_env_for_provision(org=None, loc=None):
     :return: List of created entities that can be re-used further in
         provisioning or validation procedure (e.g. hostgroup or subnet)
     """
+    graph = StepGraph('configure_env_for_provision')
+
     # Create new organization and location in case they were not passed
-    if org is None:
-        org = make_org()
-    if loc is None:
-        loc = make_location()
+    @graph.step(name='org')
+    def make_org_step(results):
+        return make_org() if org is None else org
+
+    @graph.step(name='loc')
+    def make_loc_step(results):
+        return make_location() if loc is None else loc
 
     # Get a Library Lifecycle environment and the default CV for the org
-    lce = LifecycleEnvironment.info(
-        {u'name': u'Library', 'organization-id': org['id']}
-    )
-    cv = ContentView.info(
-        {u'name': u'Default Organization View', u'organization-id': org['id']}
-    )
+    @graph.step(requires=['org'])
+    def lce(results):
+        return LifecycleEnvironment.info(
+            {u'name': u'Library', 'organization-id': results['org']['id']}
+        )
+
+    @graph.step(requires=['org'])
+    def cv(results):
+        return ContentView.info({
+            u'name': u'Default Organization View',
+            u'organization-id': results['org']['id'],
+        })
 
     # Create puppet environment and associate organization and location
-    env = make_environment({
-        'location-ids': loc['id'],
-        'organization-ids': org['id'],
-    })
+    @graph.step(requires=['org', 'loc'])
+    def env(results):
+        return make_environment({
+            'location-ids': results['loc']['id'],
+            'organization-ids': results['org']['id'],
+        })
 
     # Search for SmartProxy, and associate location
-    puppet_proxy = Proxy.info({'id': Proxy.list()[0]['id']})
-    Proxy.update({
-        'id': puppet_proxy['id'],
-        'locations': list(
-            set(puppet_proxy.get('locations') or []) | {loc['name']}),
-    })
+    @graph.step(requires=['loc'])
+    def puppet_proxy(results):
+        puppet_proxy = Proxy.info({'id': Proxy.list()[0]['id']})
+        Proxy.update({
+            'id': puppet_proxy['id'],
+            'locations': list(
+                set(puppet_proxy.get('locations') or []) |
+                {results['loc']['name']}
+            ),
+        })
+        return puppet_proxy
 
     # Network
     # Search for existing domain or create new otherwise. Associate org,
     # location and dns to it
-    _, _, domain_name = settings.server.hostname.partition('.')
-    domain = Domain.list({'search': 'name={0}'.format(domain_name)})
-    if len(domain) == 1:
-        domain = Domain.info({'id': domain[0]['id']})
-        Domain.update({
-            'name': domain_name,
-            'locations': list(
-                set(domain.get('locations') or []) | {loc['name']}),
-            'organizations': list(
-                set(domain.get('organizations') or []) | {org['name']}),
-            'dns-id': puppet_proxy['id'],
-        })
-    else:
-        # Create new domain
-        domain = make_domain({
-            'name': domain_name,
-            'location-ids': loc['id'],
-            'organization-ids': org['id'],
-            'dns-id': puppet_proxy['id'],
-        })
+    @graph.step(requires=['org', 'loc', 'puppet_proxy'])
+    def domain(results):
+        org, loc = results['org'], results['loc']
+        puppet_proxy = results['puppet_proxy']
+        _, _, domain_name = settings.server.hostname.partition('.')
+        domain = Domain.list({'search': 'name={0}'.format(domain_name)})
+        if len(domain) == 1:
+            domain = Domain.info({'id': domain[0]['id']})
+            Domain.update({
+                'name': domain_name,
+                'locations': list(
+                    set(domain.get('locations') or []) | {loc['name']}),
+                'organizations': list(
+                    set(domain.get('organizations') or []) | {org['name']}),
+                'dns-id': puppet_proxy['id'],
+            })
+        else:
+            # Create new domain
+            domain = make_domain({
+                'name': domain_name,
+                'location-ids': loc['id'],
+                'organization-ids': org['id'],
+                'dns-id': puppet_proxy['id'],
+            })
+        return domain
+
     # Search if subnet is defined with given network. If so, just update its
     # relevant fields otherwise create new subnet
-    network = settings.vlan_networking.subnet
-    subnet = Subnet.list({'search': 'network={0}'.format(network)})
-    if len(subnet) == 1:
-        subnet = Subnet.info({'id': subnet[0]['id']})
-        Subnet.update({
-            'name': subnet['name'],
-            'domains': list(
-                      set(subnet.get('domains') or []) | {domain['name']}),
-            'locations': list(
-                set(subnet.get('locations') or []) | {loc['name']}),
-            'organizations': list(
-                set(subnet.get('organizations') or []) | {org['name']}),
-            'dhcp-id': puppet_proxy['id'],
-            'dns-id': puppet_proxy['id'],
-            'tftp-id': puppet_proxy['id'],
-        })
-    else:
-        # Create new subnet
-        subnet = make_subnet({
-            'name': gen_string('alpha'),
-            'network': network,
-            'mask': settings.vlan_networking.netmask,
-            'domain-ids': domain['id'],
-            'location-ids': loc['id'],
-            'organization-ids': org['id'],
-            'dhcp-id': puppet_proxy['id'],
-            'dns-id': puppet_proxy['id'],
-            'tftp-id': puppet_proxy['id'],
-        })
+    @graph.step(requires=['org', 'loc', 'puppet_proxy', 'domain'])
+    def subnet(results):
+        org, loc = results['org'], results['loc']
+        puppet_proxy, domain = results['puppet_proxy'], results['domain']
+        network = settings.vlan_networking.subnet
+        subnet = Subnet.list({'search': 'network={0}'.format(network)})
+        if len(subnet) == 1:
+            subnet = Subnet.info({'id': subnet[0]['id']})
+            Subnet.update({
+                'name': subnet['name'],
+                'domains': list(
+                    set(subnet.get('domains') or []) | {domain['name']}),
+                'locations': list(
+                    set(subnet.get('locations') or []) | {loc['name']}),
+                'organizations': list(
+                    set(subnet.get('organizations') or []) | {org['name']}),
+                'dhcp-id': puppet_proxy['id'],
+                'dns-id': puppet_proxy['id'],
+                'tftp-id': puppet_proxy['id'],
+            })
+        else:
+            # Create new subnet
+            subnet = make_subnet({
+                'name': gen_string('alpha'),
+                'network': network,
+                'mask': settings.vlan_networking.netmask,
+                'domain-ids': domain['id'],
+                'location-ids': loc['id'],
+                'organization-ids': org['id'],
+                'dhcp-id': puppet_proxy['id'],
+                'dns-id': puppet_proxy['id'],
+                'tftp-id': puppet_proxy['id'],
+            })
+        return subnet
 
     # Get the Partition table entity
-    ptable = PartitionTable.info({'name': DEFAULT_PTABLE})
+    @graph.step()
+    def ptable(results):
+        return PartitionTable.info({'name': DEFAULT_PTABLE})
 
     # Get the OS entity
-    os = OperatingSys.list({
-        'search': 'name="RedHat" AND major="{0}" OR major="{1}"'.format(
-            RHEL_6_MAJOR_VERSION, RHEL_7_MAJOR_VERSION)
-    })[0]
+    @graph.step()
+    def os_entry(results):
+        return OperatingSys.list({
+            'search': 'name="RedHat" AND major="{0}" OR major="{1}"'.format(
+                RHEL_6_MAJOR_VERSION, RHEL_7_MAJOR_VERSION)
+        })[0]
 
     # Get proper Provisioning templates and update with OS, Org, Location
-    provisioning_template = Template.info({'name': DEFAULT_TEMPLATE})
-    pxe_template = Template.info({'name': DEFAULT_PXE_TEMPLATE})
-    for template in provisioning_template, pxe_template:
-        if os['title'] not in template['operating-systems']:
-            Template.update({
-                'id': template['id'],
-                'locations': list(
-                    set(template.get('locations') or []) | {loc['name']}),
-                'operatingsystems': list(set(
-                    template.get('operating-systems') or []) | {os['title']}),
-                'organizations': list(
-                    set(template.get('organizations') or []) | {org['name']}),
-            })
+    @graph.step(requires=['org', 'loc', 'os_entry'])
+    def templates(results):
+        org, loc = results['org'], results['loc']
+        os_title = results['os_entry']['title']
+        provisioning_template = Template.info({'name': DEFAULT_TEMPLATE})
+        pxe_template = Template.info({'name': DEFAULT_PXE_TEMPLATE})
+        for template in provisioning_template, pxe_template:
+            if os_title not in template['operating-systems']:
+                Template.update({
+                    'id': template['id'],
+                    'locations': list(
+                        set(template.get('locations') or []) |
+                        {loc['name']}
+                    ),
+                    'operatingsystems': list(
+                        set(template.get('operating-systems') or []) |
+                        {os_title}
+                    ),
+                    'organizations': list(
+                        set(template.get('organizations') or []) |
+                        {org['name']}
+                    ),
+                })
+        return provisioning_template, pxe_template
 
     # Get the architecture entity
-    arch = Architecture.list(
-        {'search': 'name={0}'.format(DEFAULT_ARCHITECTURE)})[0]
+    @graph.step()
+    def arch(results):
+        return Architecture.list(
+            {'search': 'name={0}'.format(DEFAULT_ARCHITECTURE)})[0]
+
+    @graph.step(requires=['os_entry', 'templates'])
+    def os_info(results):
+        return OperatingSys.info({'id': results['os_entry']['id']})
 
-    os = OperatingSys.info({'id': os['id']})
     # Get the media and update its location
-    medium = Medium.list({'search': 'path={0}'.format(settings.rhel7_os)})
-    if medium:
-        media = Medium.info({'id': medium[0]['id']})
-        Medium.update({
-            'id': media['id'],
-            'operatingsystems': list(
-                set(media.get('operating-systems') or []) | {os['title']}),
-            'locations': list(
-                set(media.get('locations') or []) | {loc['name']}),
-            'organizations': list(
-                set(media.get('organizations') or []) | {org['name']}),
-        })
-    else:
-        media = make_medium({
-            'location-ids': loc['id'],
-            'operatingsystem-ids': os['id'],
-            'organization-ids': org['id'],
-            'path': settings.rhel7_os
-        })
+    @graph.step(requires=['org', 'loc', 'os_info'])
+    def media(results):
+        org, loc, os_info = results['org'], results['loc'], results['os_info']
+        medium = Medium.list({'search': 'path={0}'.format(settings.rhel7_os)})
+        if medium:
+            media = Medium.info({'id': medium[0]['id']})
+            Medium.update({
+                'id': media['id'],
+                'operatingsystems': list(
+                    set(media.get('operating-systems') or []) |
+                    {os_info['title']}
+                ),
+                'locations': list(
+                    set(media.get('locations') or []) | {loc['name']}),
+                'organizations': list(
+                    set(media.get('organizations') or []) | {org['name']}),
+            })
+        else:
+            media = make_medium({
+                'location-ids': loc['id'],
+                'operatingsystem-ids': os_info['id'],
+                'organization-ids': org['id'],
+                'path': settings.rhel7_os
+            })
+        return media
 
     # Update the OS with found arch, ptable, templates and media
-    OperatingSys.update({
-        'id': os['id'],
-        'architectures': list(
-            set(os.get('architectures') or []) | {arch['name']}),
-        'media': list(
-            set(os.get('installation-media') or []) | {media['name']}),
-        'partition-tables': list(
-            set(os.get('partition-tables') or []) | {ptable['name']}),
-    })
-    for template in (provisioning_template, pxe_template):
-        if '{} ({})'.format(template['name'], template['type']) not in os[
-                'templates']:
-            OperatingSys.update({
-                'id': os['id'],
-                'config-templates': list(
-                    set(os['templates']) | {template['name']}),
-            })
+    @graph.step(requires=['os_info', 'arch', 'media', 'ptable', 'templates'])
+    def update_os(results):
+        os_info = results['os_info']
+        OperatingSys.update({
+            'id': os_info['id'],
+            'architectures': list(
+                set(os_info.get('architectures') or []) |
+                {results['arch']['name']}
+            ),
+            'media': list(
+                set(os_info.get('installation-media') or []) |
+                {results['media']['name']}
+            ),
+            'partition-tables': list(
+                set(os_info.get('partition-tables') or []) |
+                {results['ptable']['name']}
+            ),
+        })
+        for template in results['templates']:
+            if '{} ({})'.format(template['name'], template['type']) not in (
+                    os_info['templates']):
+                OperatingSys.update({
+                    'id': os_info['id'],
+                    'config-templates': list(
+                        set(os_info['templates']) | {template['name']}),
+                })
 
     # Create new hostgroup using proper entities
-    hostgroup = make_hostgroup({
-        'location-ids': loc['id'],
-        'environment-id': env['id'],
-        'lifecycle-environment-id': lce['id'],
-        'puppet-proxy-id': puppet_proxy['id'],
-        'puppet-ca-proxy-id': puppet_proxy['id'],
-        'content-view-id': cv['id'],
-        'domain-id': domain['id'],
-        'subnet-id': subnet['id'],
-        'organization-ids': org['id'],
-        'architecture-id': arch['id'],
-        'partition-table-id': ptable['id'],
-        'medium-id': media['id'],
-        'operatingsystem-id': os['id'],
-        'content-source-id': puppet_proxy['id'],
-    })
+    @graph.step(requires=[
+        'org', 'loc', 'lce', 'cv', 'env', 'puppet_proxy', 'domain', 'subnet',
+        'arch', 'ptable', 'media', 'os_info', 'update_os',
+    ])
+    def hostgroup(results):
+        puppet_proxy = results['puppet_proxy']
+        return make_hostgroup({
+            'location-ids': results['loc']['id'],
+            'environment-id': results['env']['id'],
+            'lifecycle-environment-id': results['lce']['id'],
+            'puppet-proxy-id': puppet_proxy['id'],
+            'puppet-ca-proxy-id': puppet_proxy['id'],
+            'content-view-id': results['cv']['id'],
+            'domain-id': results['domain']['id'],
+            'subnet-id': results['subnet']['id'],
+            'organization-ids': results['org']['id'],
+            'architecture-id': results['arch']['id'],
+            'partition-table-id': results['ptable']['id'],
+            'medium-id': results['media']['id'],
+            'operatingsystem-id': results['os_info']['id'],
+            'content-source-id': puppet_proxy['id'],
+        })
 
+    results = graph.run()
     return {
-        'hostgroup': hostgroup,
-        'subnet': subnet,
-        'domain': domain,
-        'ptable': ptable,
-        'os': os
+        'hostgroup': results['hostgroup'],
+        'subnet': results['subnet'],
+        'domain': results['domain'],
+        'ptable': results['ptable'],
+        'os': results['os_info'],
     }
 
 
@@ -3894,14 +4165,20 @@ def setup_cdn_and_custom_repositories(
         policy
     :return: a dict containing the content view and repos info
     """
-    custom_product = None
-    repos_info = []
-    for repo in repos:
-        custom_repo_url = repo.get('url')
-        cdn = repo.get('cdn', False)
-        if not cdn and not custom_repo_url:
+    custom_repos = [repo for repo in repos if not repo.get('cdn', False)]
+    for repo in custom_repos:
+        if not repo.get('url'):
             raise CLIFactoryError(u'Custom repository with url not supplied')
-        if cdn:
+    graph = StepGraph('setup_cdn_and_custom_repositories')
+
+    @graph.step()
+    def custom_product(results):
+        if custom_repos:
+            return make_product_wait({'organization-id': org_id})
+
+    def setup_repository(repo, results):
+        """Enable or create the repository and set its download policy"""
+        if repo.get('cdn', False):
             RepositorySet.enable({
                 u'organization-id': org_id,
                 u'product': repo['product'],
@@ -3915,14 +4192,10 @@ def setup_cdn_and_custom_repositories(
                 u'product': repo['product'],
             })
         else:
-            if custom_product is None:
-                custom_product = make_product_wait({
-                    'organization-id': org_id,
-                })
             repo_info = make_repository({
-                'product-id': custom_product['id'],
+                'product-id': results['custom_product']['id'],
                 'organization-id': org_id,
-                'url': custom_repo_url,
+                'url': repo['url'],
             })
         if download_policy:
             # Set download policy
@@ -3930,11 +4203,35 @@ def setup_cdn_and_custom_repositories(
                 'download-policy': download_policy,
                 'id': repo_info['id'],
             })
-        repos_info.append(repo_info)
-    # Synchronize the repositories
-    for repo_info in repos_info:
-        Repository.synchronize({'id': repo_info['id']}, timeout=4800)
-    return custom_product, repos_info
+        return repo_info
+
+    def synchronize(index, results):
+        """Synchronize the repository set up by the ``repository-index``
+        step
+        """
+        Repository.synchronize(
+            {'id': results['repository-{0}'.format(index)]['id']},
+            timeout=4800,
+        )
+
+    for index, repo in enumerate(repos):
+        graph.add(
+            'repository-{0}'.format(index),
+            functools.partial(setup_repository, repo),
+            requires=[] if repo.get('cdn', False) else ['custom_product'],
+        )
+        # Synchronize the repositories
+        graph.add(
+            'synchronize-{0}'.format(index),
+            functools.partial(synchronize, index),
+            requires=['repository-{0}'.format(index)],
+        )
+    results = graph.run()
+    repos_info = [
+        results['repository-{0}'.format(index)]
+        for index in range(len(repos))
+    ]
+    return results['custom_product'], repos_info
 
 
 def setup_cdn_and_custom_repos_content(
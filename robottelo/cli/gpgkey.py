@@ -35,7 +35,5 @@ class GPGKey(Base):
         Gets information for GPG Key
         """
 
-        cls.command_sub = 'info'
-
         return cls.execute(
-            cls._construct_command(options), output_format='json')
+            cls._construct_command('info', options), output_format='json')
@@ -5,7 +5,6 @@ import json
 import re
 import six
 from six import text_type
-from six.moves import cStringIO as StringIO
 from six.moves import zip
 
 
@@ -28,12 +27,14 @@ def _csv_reader(output):
     :return: generator that will yield a list of unicode string values.
 
     """
-    data = '\n'.join(output)
+    # the reader needs the line endings to keep the new lines of quoted
+    # values spanning several lines
     if six.PY2:
-        data = data.encode('utf8')
-    handler = StringIO(data)
+        lines = (u'{0}\n'.format(line).encode('utf8') for line in output)
+    else:
+        lines = (u'{0}\n'.format(line) for line in output)
 
-    for row in csv.reader(handler):  # pragma: no cover
+    for row in csv.reader(lines):  # pragma: no cover
         if six.PY2:
             yield [value.decode('utf8') for value in row]
         else:
@@ -46,35 +47,63 @@ def _normalize(header):
     return header.replace(' ', '-').lower()
 
 
+#: Memo of the normalized keys, hammer outputs use a small set of keys
+_normalized_keys = {}
+#: Maximum number of keys kept in ``_normalized_keys``
+_NORMALIZED_KEYS_MAX = 10000
+
+
+def _normalize_pairs(pairs):
+    """Build a dict from the key value ``pairs`` of a JSON object, replacing
+    empty spaces with "-" and lowering the chars of the keys.
+
+    Used as ``object_pairs_hook`` so the keys are normalized while the JSON
+    is decoded.
+    """
+    keys = _normalized_keys
+    obj = {}
+    for key, value in pairs:
+        normalized = keys.get(key)
+        if normalized is None:
+            normalized = _normalize(key)
+            if len(keys) < _NORMALIZED_KEYS_MAX:
+                keys[key] = normalized
+        obj[normalized] = value
+    return obj
+
+
 def parse_json(stdout):
     """Parse JSON output from Hammer CLI and convert it to python dictionary
     while normalizing keys.
+
+    Integers are returned as strings to conform to the CSV parser.
     """
-    parsed = json.loads(stdout)
-    return _normalize_obj(parsed)
+    return json.loads(
+        stdout, object_pairs_hook=_normalize_pairs, parse_int=text_type)
 
 
-def _normalize_obj(obj):
-    """Normalize all dict's keys replacing empty spaces with "-" and lowering
-    chars
+def iter_csv(output):
+    """Parse CSV output from Hammer CLI, yielding a dictionary for each row.
+
+    The lines are read as they are needed, so ``output`` can be a generator
+    of the lines of a command still running, and the caller can stop as
+    soon as it found the row it needs. All the rows share the same key
+    strings.
     """
-    if isinstance(obj, dict):
-        return {_normalize(k): _normalize_obj(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_normalize_obj(v) for v in obj]
-    # doing this to conform to csv parser
-    elif isinstance(obj, int) and not isinstance(obj, bool):
-        return text_type(obj)
-    return obj
+    reader = _csv_reader(output)
+    # Generate the key names, spaces will be converted to dashes "-"
+    keys = None
+    for values in reader:
+        if keys is None:
+            keys = [_normalize(header) for header in values]
+        elif len(values) > 0:
+            # Create a dict mapping each key with each value
+            yield dict(zip(keys, values))
 
 
 def parse_csv(output):
     """Parse CSV output from Hammer CLI and convert it to python dictionary."""
-    reader = _csv_reader(output)
-    # Generate the key names, spaces will be converted to dashes "-"
-    keys = [_normalize(header) for header in next(reader)]
-    # For each entry, create a dict mapping each key with each value
-    return [dict(zip(keys, values)) for values in reader if len(values) > 0]
+    return list(iter_csv(output))
 
 
 def parse_help(output):
@@ -149,16 +178,10 @@ def get_line_indentation_spaces(line, tab_spaces=4):
     """
     if not line or len(line) < tab_spaces:
         return 0
-    spaces = 0
-    for char in line:
-        if char not in (' ', '\t'):
-            break
-        if char == '\t':
-            spaces += tab_spaces
-        else:
-            spaces += 1
-
-    return spaces
+    indentation = len(line) - len(line.lstrip(' \t'))
+    if not indentation:
+        return 0
+    return indentation + (tab_spaces - 1) * line.count('\t', 0, indentation)
 
 
 def get_line_indentation_level(line, tab_spaces=4, indentation_spaces=4):
@@ -185,8 +208,19 @@ def get_line_indentation_level(line, tab_spaces=4, indentation_spaces=4):
         line, tab_spaces=tab_spaces)//indentation_spaces
 
 
+#: Numbered value of a single attribute collection, like ``1) template1``
+_NUMBERED_VALUE_REGEX = re.compile(r'\d+\)\s+(.+)$')
+#: Number of the first property of a numbered collection item
+_ITEM_NUMBER_REGEX = re.compile(r'(\d+)\)')
+
+
 def parse_info(output):
-    """Parse the info output and returns a dict mapping the values."""
+    """Parse the info output and returns a dict mapping the values.
+
+    Each line is read once, the state kept between lines being the name of
+    the last group of sub-properties, whether it is a numbered list of
+    properties and the last second level key which can hold a third level.
+    """
     # info dictionary
     contents = {}
     sub_prop = None  # stores name of the last group of sub-properties
@@ -197,96 +231,106 @@ def parse_info(output):
         # skip empty lines
         if line == '':
             continue
-        current_indent_level = get_line_indentation_level(line)
+        stripped = line.lstrip()
+        if not line.startswith(' '):
+            # top level property, unless indented by tabs it clears the
+            # second level key
+            if (not line.startswith('\t') or
+                    get_line_indentation_level(line) <= 1):
+                second_level_key = None
+            sub_num = None  # new property implies no sub property
+            key, value = stripped.split(':', 1)
+            key = key.lstrip().replace(' ', '-').lower()
+            value = value.lstrip()
+            if value == '':  # 'key:' no value, new sub-property
+                sub_prop = key
+                contents[sub_prop] = {}
+            else:  # 'key: value' line
+                contents[key] = value
+            continue
+
+        # sub-properties are indented, usually by spaces only
+        indentation = len(line) - len(stripped)
+        if len(line) < 4:
+            current_indent_level = 0
+        elif line.count(' ', 0, indentation) == indentation:
+            current_indent_level = indentation // 4
+        else:
+            current_indent_level = get_line_indentation_level(line)
         if current_indent_level <= 1:
             # we are entering or leaving a second level from lower/upper levels
             # clear the second level key
             second_level_key = None
-        if line.startswith(' '):  # sub-properties are indented
-            # values are separated by ':' or '=>', but not by '::' which can be
-            # entity name like 'test::params::keys'
-            if line.find(':') != -1 and not line.find('::') != -1:
-                key, value = line.lstrip().split(":", 1)
-            elif line.find('=>') != -1 and len(
-                    line.lstrip().split(" =>", 1)) == 2:
-                key, value = line.lstrip().split(" =>", 1)
-            else:
-                key = value = None
-
-            if key is None and value is None:
-                # Parse single attribute collection properties
-                # Template
-                #  1) template1
-                #  2) template2
-                #
-                # or
-                # Template
-                #  template1
-                #  template2
-                match = re.match(r'\d+\)\s+(.+)$', line.lstrip())
-
-                if match is None:
-                    match = re.match(r'(.*)$', line.lstrip())
-
-                value = match.group(1)
-
-                if isinstance(contents[sub_prop], dict):
-                    contents[sub_prop] = []
+        # values are separated by ':' or '=>', but not by '::' which can be
+        # entity name like 'test::params::keys'
+        if ':' in line and '::' not in line:
+            key, value = stripped.split(':', 1)
+        elif '=>' in line and ' =>' in stripped:
+            key, value = stripped.split(' =>', 1)
+        else:
+            # Parse single attribute collection properties
+            # Template
+            #  1) template1
+            #  2) template2
+            #
+            # or
+            # Template
+            #  template1
+            #  template2
+            match = None
+            if stripped[:1].isdigit():
+                match = _NUMBERED_VALUE_REGEX.match(stripped)
+            value = stripped if match is None else match.group(1)
+            collection = contents[sub_prop]
+            if isinstance(collection, dict):
+                collection = contents[sub_prop] = []
+            collection.append(value)
+            continue
 
-                contents[sub_prop].append(value)
-            else:
-                # some properties have many numbered values
-                # Example:
-                # Content:
-                #  1) Repo Name: repo1
-                #     URL:       /custom/4f84fc90-9ffa-...
-                #  2) Repo Name: puppet1
-                #     URL:       /custom/4f84fc90-9ffa-...
-                starts_with_number = re.match(r'(\d+)\)', key)
-                if starts_with_number:
-                    sub_num = int(starts_with_number.group(1))
-                    # no. 1) we need to change dict() to list()
-                    if sub_num == 1:
-                        contents[sub_prop] = []
-                    # remove number from key
-                    key = re.sub(r'\d+\)', '', key)
-                    # append empty dict to array
-                    contents[sub_prop].append({})
-
-                key = key.lstrip().replace(' ', '-').lower()
-                value = value.lstrip()
-                # add value to dictionary
-                if sub_num is not None:
-                    contents[sub_prop][-1][key] = value
-                else:
-                    # a third level is always represented as a dictionary and
-                    # we need to detect if we are at third level
-                    # example:
-                    # Content Information:
-                    #     Content View:
-                    #         ID:   10
-                    #         Name: Default Organization View
-                    # the "ID" and "Name" are located at third indent level
-                    # "content view" is located at second indent level
-                    if current_indent_level == 2 and second_level_key:
-                        # we are at third level indentation
-                        if not contents[sub_prop][second_level_key]:
-                            contents[sub_prop][second_level_key] = {}
-                        contents[sub_prop][second_level_key][key] = value
-                    else:
-                        contents[sub_prop][key] = value
-                    if current_indent_level == 1 and not value:
-                        # always set the last possible second level key
-                        # that can form a third level
-                        second_level_key = key
+        # some properties have many numbered values
+        # Example:
+        # Content:
+        #  1) Repo Name: repo1
+        #     URL:       /custom/4f84fc90-9ffa-...
+        #  2) Repo Name: puppet1
+        #     URL:       /custom/4f84fc90-9ffa-...
+        if key[:1].isdigit():
+            starts_with_number = _ITEM_NUMBER_REGEX.match(key)
+            if starts_with_number:
+                sub_num = int(starts_with_number.group(1))
+                # no. 1) we need to change dict() to list()
+                if sub_num == 1:
+                    contents[sub_prop] = []
+                # remove number from key
+                key = _ITEM_NUMBER_REGEX.sub('', key)
+                # append empty dict to array
+                contents[sub_prop].append({})
+
+        key = key.lstrip().replace(' ', '-').lower()
+        value = value.lstrip()
+        # add value to dictionary
+        if sub_num is not None:
+            contents[sub_prop][-1][key] = value
+        # a third level is always represented as a dictionary and we need to
+        # detect if we are at third level
+        # example:
+        # Content Information:
+        #     Content View:
+        #         ID:   10
+        #         Name: Default Organization View
+        # the "ID" and "Name" are located at third indent level
+        # "content view" is located at second indent level
+        elif current_indent_level == 2 and second_level_key:
+            # we are at third level indentation
+            section = contents[sub_prop]
+            if not section[second_level_key]:
+                section[second_level_key] = {}
+            section[second_level_key][key] = value
         else:
-            sub_num = None  # new property implies no sub property
-            key, value = line.lstrip().split(":", 1)
-            key = key.lstrip().replace(' ', '-').lower()
-            if value.lstrip() == '':  # 'key:' no value, new sub-property
-                sub_prop = key
-                contents[sub_prop] = {}
-            else:  # 'key: value' line
-                contents[key] = value.lstrip()
+            contents[sub_prop][key] = value
+            if current_indent_level == 1 and not value:
+                # always set the last possible second level key that can
+                # form a third level
+                second_level_key = key
 
     return contents
@@ -0,0 +1,388 @@
+# -*- encoding: utf-8 -*-
+"""Long lived hammer sessions.
+
+Starting hammer loads the Ruby interpreter, the gems and the apipie cache,
+which usually costs more than the API call the command performs. A
+:class:`HammerShell` starts a small Ruby program on the server which reads
+hammer command lines from its ``stdin`` and runs each of them by loading the
+``hammer`` executable in the same process, so that cost is paid only once.
+
+After each command the program writes a marker line holding a random token
+to ``stdout`` and ``stderr``, the ``stdout`` one also holding the command exit
+status, which is used to split the output of consecutive commands. When
+running hammer raises an exception instead of exiting, e.g. when the
+``hammer`` executable is a shell wrapper which can not be loaded by Ruby, the
+marker holds ``error`` instead of the exit status.
+
+The sessions are kept in a process wide pool keyed by hostname and hammer
+user, as the in-process hammer keeps the API connection of the first user it
+ran a command for. They are used by :meth:`robottelo.cli.base.Base.execute`
+when the ``[robottelo] hammer_shell`` setting is enabled.
+"""
+import atexit
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+import uuid
+
+from six.moves import shlex_quote
+
+from robottelo import ssh
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+#: Ruby program running the hammer command lines read from ``stdin``. Each
+#: line is a JSON list holding the hammer arguments as they would be written
+#: on a shell command line.
+HAMMER_SHELL_PROGRAM = u'''
+$VERBOSE = nil
+require 'json'
+require 'shellwords'
+hammer = ARGV.shift
+token = ARGV.shift
+$0 = 'hammer'
+$stdout.sync = true
+$stderr.sync = true
+while (line = $stdin.gets)
+  status = begin
+    ARGV.replace(Shellwords.shellsplit(JSON.parse(line).first))
+    load hammer
+    0
+  rescue SystemExit => error
+    error.status
+  rescue Exception => error
+    $stderr.puts(error.message)
+    'error'
+  end
+  $stdout.print("\\n#{token}:#{status}\\n")
+  $stderr.print("\\n#{token}:\\n")
+end
+'''
+
+#: Maximum number of bytes read from the session channel at once
+_CHUNK_SIZE = 32768
+#: Marker status of a command whose hammer run raised an exception
+_ERROR_STATUS = u'error'
+#: Exit status of a command whose hammer run raised an exception
+_ERROR_RETURN_CODE = 70
+
+
+class HammerShellError(Exception):
+    """Indicates that a hammer session exited or did not follow the expected
+    protocol.
+
+    :param str message: The error message.
+    :param bool command_sent: Whether the command was written to the session,
+        in which case it may have run and must not be run again.
+    """
+
+    def __init__(self, message, command_sent=False):
+        super(HammerShellError, self).__init__(message)
+        self.command_sent = command_sent
+
+
+class _MarkedStream(object):
+    """Buffer for a session stream, looking for the command end marker."""
+
+    def __init__(self, marker):
+        self.marker = marker
+        self.data = bytearray()
+        self._search_from = 0
+        self.output = None
+        self.suffix = None
+
+    def feed(self, data):
+        """Consume a chunk of bytes read from the channel."""
+        if self.output is not None:
+            raise HammerShellError(
+                'Unexpected output after the end of the command',
+                command_sent=True)
+        self.data.extend(data)
+        position = self.data.find(self.marker, self._search_from)
+        if position == -1:
+            self._search_from = max(0, len(self.data) - len(self.marker))
+            return
+        line_end = self.data.find(b'\n', position + len(self.marker))
+        if line_end == -1:
+            self._search_from = position
+            return
+        if line_end + 1 != len(self.data):
+            raise HammerShellError(
+                'Unexpected output after the end of the command',
+                command_sent=True)
+        self.output = bytes(self.data[:position]).decode('utf-8')
+        self.suffix = bytes(
+            self.data[position + len(self.marker):line_end]).decode('utf-8')
+
+    @property
+    def complete(self):
+        """Whether the command end marker was received."""
+        return self.output is not None
+
+
+class HammerShell(object):
+    """A hammer session running on the server over its own ssh connection.
+
+    :param str hostname: The server to run the session on. If it is ``None``
+        ``hostname`` from configuration's ``server`` section will be used.
+    :param int connection_timeout: Time to wait for establishing the
+        connection.
+    :param str user: The hammer user the session runs the commands as.
+    :param str password: The password of the hammer user.
+    """
+
+    def __init__(self, hostname=None, connection_timeout=None, user=None,
+                 password=None):
+        self.hostname = hostname or settings.server.hostname
+        self.connection_timeout = connection_timeout
+        self.user = user
+        self.password = password
+        self.token = u'__robottelo_hammer_{0}'.format(uuid.uuid4().hex)
+        self.commands_count = 0
+        self._client = None
+        self._channel = None
+
+    @property
+    def key(self):
+        """The key of the session in a :class:`HammerShellPool`."""
+        return (self.hostname, self.user, self.password)
+
+    @property
+    def alive(self):
+        """Whether the session is started and still running."""
+        return (
+            self._channel is not None and
+            not self._channel.closed and
+            not self._channel.exit_status_ready()
+        )
+
+    def start(self):
+        """Connect to the server and start the session program."""
+        self._client = ssh.get_client(
+            hostname=self.hostname, timeout=self.connection_timeout)
+        self._channel = self._client.get_transport().open_session()
+        self._channel.exec_command(
+            u'LANG={0} ruby -e {1} "$(command -v hammer)" {2}'.format(
+                settings.locale, shlex_quote(HAMMER_SHELL_PROGRAM), self.token)
+        )
+        logger.debug('Started hammer session %s on [%s]',
+                     self.token, self.hostname)
+
+    def close(self):
+        """Stop the session and close its connection."""
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+            logger.debug('Closed hammer session %s after %s commands',
+                         self.token, self.commands_count)
+
+    def run(self, args, output_format=None, timeout=None):
+        """Run a hammer command in the session.
+
+        :param str args: The hammer arguments, as they would be written after
+            ``hammer`` on a shell command line.
+        :param output_format: plain|json|csv|list valid only for hammer
+            commands
+        :param timeout: Time to wait for the command to finish. A session
+            whose command timed out can not be used anymore.
+        :return: SSHCommandResult
+        :raises robottelo.cli.hammer_shell.HammerShellError: If the session
+            is not running, broke the protocol or could not run hammer for its
+            first command.
+        """
+        if not self.alive:
+            raise HammerShellError(
+                'hammer session {0} is not running'.format(self.token))
+        if timeout is None:
+            timeout = settings.ssh_client.command_timeout
+        if isinstance(args, bytes):
+            args = args.decode('utf-8')
+        logger.info('>>> [hammer session] hammer %s', args)
+        line = json.dumps([args]) + u'\n'
+        try:
+            self._channel.sendall(line.encode('utf-8'))
+        except (EOFError, socket.error) as err:
+            raise HammerShellError(
+                'unable to send the command to hammer session {0}: {1}'
+                .format(self.token, err))
+        self.commands_count += 1
+        marker = u'\n{0}:'.format(self.token).encode('utf-8')
+        stdout = _MarkedStream(marker)
+        stderr = _MarkedStream(marker)
+        end_time = time.time() + timeout if timeout else None
+        channel = self._channel
+        while not (stdout.complete and stderr.complete):
+            while channel.recv_ready():
+                stdout.feed(channel.recv(_CHUNK_SIZE))
+            while channel.recv_stderr_ready():
+                stderr.feed(channel.recv_stderr(_CHUNK_SIZE))
+            if stdout.complete and stderr.complete:
+                break
+            if channel.exit_status_ready() or channel.closed:
+                raise HammerShellError(
+                    'hammer session {0} exited with status {1}'.format(
+                        self.token, channel.recv_exit_status()),
+                    command_sent=True)
+            wait = None
+            if end_time is not None:
+                wait = end_time - time.time()
+                if wait <= 0:
+                    raise ssh.SSHCommandTimeoutError(
+                        'hammer command: {0} \n did not respond in the '
+                        'predefined time (timeout={1})'.format(args, timeout)
+                    )
+            select.select([channel], [], [], wait)
+        if stdout.suffix == _ERROR_STATUS:
+            if self.commands_count == 1:
+                # the session can not run hammer at all, the command did not
+                # run
+                raise HammerShellError(
+                    'hammer session {0} could not run hammer: {1}'.format(
+                        self.token, stderr.output.strip()))
+            return_code = _ERROR_RETURN_CODE
+        else:
+            try:
+                return_code = int(stdout.suffix)
+            except ValueError:
+                raise HammerShellError(
+                    'Invalid exit status {0!r} received from hammer session '
+                    '{1}'.format(stdout.suffix, self.token),
+                    command_sent=True)
+        if stdout.output:
+            logger.info('<<< stdout\n%s', stdout.output)
+        if stderr.output:
+            logger.info('<<< stderr\n%s', stderr.output)
+        return ssh.build_command_result(
+            stdout.output, stderr.output, return_code, output_format)
+
+
+class HammerShellPool(object):
+    """Thread safe pool of :class:`HammerShell` sessions keyed by hostname,
+user and password.
+
+    Sessions are checked out exclusively, so each one runs a single command
+    at a time. When a new session fails on its first command the pool is
+    disabled, as that usually means the server can not run it, and the
+    callers should use one-shot hammer commands instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+        self.disabled = False
+
+    def _check_pid(self):
+        """Forget the sessions inherited from a parent process, must be called
+        with the lock held.
+        """
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._pid = os.getpid()
+
+    def acquire(self, hostname, connection_timeout=None, user=None,
+                password=None):
+        """Check out a running session of user, starting a new one if
+        needed.
+        """
+        stale = []
+        shell = None
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get((hostname, user, password), [])
+            while idle:
+                candidate = idle.pop()
+                if candidate.alive:
+                    shell = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if shell is None:
+            shell = HammerShell(
+                hostname, connection_timeout, user=user, password=password)
+            shell.start()
+        return shell
+
+    def release(self, shell, discard=False):
+        """Return a checked out session to the pool.
+
+        :param shell: A session returned by :meth:`acquire`.
+        :param bool discard: Close the session instead of keeping it.
+        """
+        with self._lock:
+            if not discard and shell.alive and self._pid == os.getpid():
+                self._idle.setdefault(shell.key, []).append(shell)
+                return
+        shell.close()
+
+    def run(self, args, hostname=None, output_format=None, timeout=None,
+            connection_timeout=None, user=None, password=None):
+        """Run a hammer command in a pooled session.
+
+        See :meth:`HammerShell.run` for the arguments. ``user`` and
+        ``password`` must be the hammer credentials ``args`` holds, so that
+        the commands of different users never share a session.
+        """
+        if self.disabled:
+            raise HammerShellError('hammer sessions are disabled')
+        shell = self.acquire(
+            hostname or settings.server.hostname, connection_timeout,
+            user=user, password=password)
+        try:
+            result = shell.run(args, output_format, timeout)
+        except HammerShellError:
+            if shell.commands_count <= 1:
+                logger.warning(
+                    'Disabling hammer sessions, a new session failed on its '
+                    'first command')
+                self.disabled = True
+            self.release(shell, discard=True)
+            raise
+        except Exception:
+            self.release(shell, discard=True)
+            raise
+        self.release(shell)
+        return result
+
+    def close_all(self):
+        """Close all the idle sessions of the pool."""
+        with self._lock:
+            self._check_pid()
+            idle, self._idle = self._idle, {}
+        for shells in idle.values():
+            for shell in shells:
+                shell.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hammer_shell_pool():
+    """Return the process wide :class:`HammerShellPool`."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HammerShellPool()
+        return _pool
+
+
+def close_hammer_shell_pool():
+    """Close every idle hammer session and drop the process wide pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+
+atexit.register(close_hammer_shell_pool)
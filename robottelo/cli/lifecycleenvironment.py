@@ -30,13 +30,12 @@ class LifecycleEnvironment(Base):
     command_requires_org = True
 
     @classmethod
-    def list(cls, options=None, per_page=False):
+    def list(cls, options=None, per_page=False, lazy=False):
         result = super(LifecycleEnvironment, cls).list(
-            options, per_page=per_page)
+            options, per_page=per_page, lazy=lazy)
 
         return result
 
     @classmethod
     def paths(cls, options=None):
-        cls.command_sub = 'paths'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('paths', options))
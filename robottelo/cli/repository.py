@@ -21,7 +21,7 @@ Subcommands::
     update                        Update a repository
     upload-content                Upload content into the repository
 """
-from robottelo.cli.base import Base
+from robottelo.cli.base import Base, CLIError
 
 
 class Repository(Base):
@@ -30,48 +30,33 @@ class Repository(Base):
     """
 
     command_base = 'repository'
-    command_requires_org = True
-
-    @classmethod
-    def create(cls, options=None):
-        """Create a custom repository"""
-        cls.command_requires_org = False
-
-        try:
-            result = super(Repository, cls).create(options)
-        finally:
-            cls.command_requires_org = True
-
-        return result
 
     @classmethod
     def export(cls, options=None):
         """Export a repository"""
-        cls.command_sub = 'export'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('export', options),
             output_format='csv',
             ignore_stderr=True,
         )
 
     @classmethod
-    def info(cls, options=None):
-        """Show a custom repository"""
-        cls.command_requires_org = False
-
-        try:
-            result = super(Repository, cls).info(options)
-        finally:
-            cls.command_requires_org = True
-
-        return result
+    def list(cls, options=None, per_page=True, output_format=None,
+             lazy=False):
+        """List repositories, only the list command requires the
+        organization.
+        """
+        if not options or 'organization-id' not in options:
+            raise CLIError(
+                'organization-id option is required for Repository.list')
+        return super(Repository, cls).list(
+            options, per_page, output_format, lazy)
 
     @classmethod
     def synchronize(cls, options, return_raw_response=None, timeout=3600):
         """Synchronizes a repository."""
-        cls.command_sub = 'synchronize'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('synchronize', options),
             output_format='csv',
             ignore_stderr=True,
             return_raw_response=return_raw_response,
@@ -81,9 +66,8 @@ class Repository(Base):
     @classmethod
     def remove_content(cls, options):
         """Remove content from a repository"""
-        cls.command_sub = 'remove-content'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('remove-content', options),
             output_format='csv',
             ignore_stderr=True,
         )
@@ -91,9 +75,8 @@ class Repository(Base):
     @classmethod
     def upload_content(cls, options):
         """Upload content to repository."""
-        cls.command_sub = 'upload-content'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('upload-content', options),
             output_format='csv',
             ignore_stderr=True,
         )
@@ -57,9 +57,9 @@ class SmartClassParameter(Base):
                                                                 yes/no, 1/0.
             --value VALUE                                       Override value
         """
-        cls.command_sub = 'add-override-value'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('add-override-value', options),
+            output_format='csv')
 
     @classmethod
     def remove_override_value(cls, options=None):
@@ -80,6 +80,6 @@ class SmartClassParameter(Base):
                                                                 parameter name
             --smart-class-parameter-id SMART_CLASS_PARAMETER_ID
         """
-        cls.command_sub = 'remove-override-value'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('remove-override-value', options),
+            output_format='csv')
@@ -0,0 +1,45 @@
+# coding: utf-8
+"""
+This module contains commands to maintain the shared functions storage
+
+Commands included:
+
+GC
+--
+
+A command to remove the expired values of the sqlite shared functions storage
+and to reclaim the database free space::
+
+    $ manage shared gc
+    $ manage shared gc --max-age 3600 --no-vacuum
+
+"""
+import click
+
+from robottelo.config import settings
+from robottelo.decorators.func_shared.shared import _check_config
+from robottelo.decorators.func_shared.sqlite_storage import (
+    SQLiteStorageHandler)
+
+
+@click.command()
+@click.option('--path', required=False, default=None,
+              help='the sqlite database path, default from settings')
+@click.option('--max-age', required=False, default=None, type=int,
+              help='remove the values older than this number of seconds, '
+                   'default the shared function share_timeout')
+@click.option('--vacuum/--no-vacuum', default=True,
+              help='rebuild the database to reclaim its free space')
+def gc(path, max_age, vacuum):
+    """Removes the expired values of the sqlite shared functions storage:\n
+        example: $ manage shared gc --max-age 3600\n
+    """
+    settings.configure()
+    _check_config()
+    storage = SQLiteStorageHandler(path=path)
+    if vacuum:
+        removed = storage.vacuum(timeout=max_age)
+    else:
+        removed = storage.sweep_expired(timeout=max_age)
+    click.echo('removed {0} expired values from {1}'.format(
+        removed, storage.path))
@@ -516,6 +516,66 @@ class FakeManifestSettings(FeatureSettings):
         return validation_errors
 
 
+class HttpClientSettings(FeatureSettings):
+    """Settings of the HTTP session shared by the NailGun calls."""
+    def __init__(self, *args, **kwargs):
+        super(HttpClientSettings, self).__init__(*args, **kwargs)
+        self._enabled = None
+        self._pool_connections = None
+        self._pool_maxsize = None
+        self._retries = None
+        self._backoff_factor = None
+
+    @property
+    def enabled(self):
+        return self._enabled if self._enabled is not None else True
+
+    @property
+    def pool_connections(self):
+        return self._pool_connections if (
+            self._pool_connections is not None) else 10
+
+    @property
+    def pool_maxsize(self):
+        return self._pool_maxsize if (
+            self._pool_maxsize is not None) else 10
+
+    @property
+    def retries(self):
+        return self._retries if self._retries is not None else 3
+
+    @property
+    def backoff_factor(self):
+        return self._backoff_factor if (
+            self._backoff_factor is not None) else 0.5
+
+    def read(self, reader):
+        """Read HTTP client settings."""
+        self._enabled = reader.get(
+            'http_client', 'enabled', default=True, cast=bool)
+        self._pool_connections = reader.get(
+            'http_client', 'pool_connections', default=10, cast=int)
+        self._pool_maxsize = reader.get(
+            'http_client', 'pool_maxsize', default=10, cast=int)
+        self._retries = reader.get(
+            'http_client', 'retries', default=3, cast=int)
+        self._backoff_factor = reader.get(
+            'http_client', 'backoff_factor', default=0.5, cast=float)
+
+    def validate(self):
+        """Validate HTTP client settings."""
+        validation_errors = []
+        if self.pool_connections < 1 or self.pool_maxsize < 1:
+            validation_errors.append(
+                '[http_client] pool_connections and pool_maxsize must be at '
+                'least 1')
+        if self.retries < 0 or self.backoff_factor < 0:
+            validation_errors.append(
+                '[http_client] retries and backoff_factor can not be '
+                'negative')
+        return validation_errors
+
+
 class LDAPSettings(FeatureSettings):
     """LDAP settings definitions."""
     def __init__(self, *args, **kwargs):
@@ -855,6 +915,9 @@ class SSHClientSettings(FeatureSettings):
         super(SSHClientSettings, self).__init__(*args, **kwargs)
         self._command_timeout = None
         self._connection_timeout = None
+        self._connection_pool = None
+        self._pool_max_idle = None
+        self._pool_keepalive = None
 
     @property
     def command_timeout(self):
@@ -866,12 +929,33 @@ class SSHClientSettings(FeatureSettings):
         return self._connection_timeout if (
             self._connection_timeout is not None) else 10
 
+    @property
+    def connection_pool(self):
+        return self._connection_pool if (
+            self._connection_pool is not None) else True
+
+    @property
+    def pool_max_idle(self):
+        return self._pool_max_idle if (
+            self._pool_max_idle is not None) else 300
+
+    @property
+    def pool_keepalive(self):
+        return self._pool_keepalive if (
+            self._pool_keepalive is not None) else 30
+
     def read(self, reader):
         """Read SSHClient settings."""
         self._command_timeout = reader.get(
             'ssh_client', 'command_timeout', default=300, cast=int)
         self._connection_timeout = reader.get(
             'ssh_client', 'connection_timeout', default=10, cast=int)
+        self._connection_pool = reader.get(
+            'ssh_client', 'connection_pool', default=True, cast=bool)
+        self._pool_max_idle = reader.get(
+            'ssh_client', 'pool_max_idle', default=300, cast=int)
+        self._pool_keepalive = reader.get(
+            'ssh_client', 'pool_keepalive', default=30, cast=int)
 
     def validate(self):
         """Validate SSHClient settings."""
@@ -957,6 +1041,12 @@ class SharedFunctionSettings(FeatureSettings):
         self.redis_db = None
         self.redis_password = None
         self.call_retries = None
+        self.pool_size = None
+        self.pool_fill_interval = None
+        self.memory_tier = None
+        self.encoding = None
+        self.sqlite_path = None
+        self.lock_lease = None
 
     def read(self, reader):
         """Read shared settings."""
@@ -978,11 +1068,21 @@ class SharedFunctionSettings(FeatureSettings):
             'shared_function', 'redis_password', None)
         self.call_retries = reader.get(
             'shared_function', 'call_retries', 2, int)
+        self.pool_size = reader.get(
+            'shared_function', 'pool_size', 2, int)
+        self.pool_fill_interval = reader.get(
+            'shared_function', 'pool_fill_interval', 30, int)
+        self.memory_tier = reader.get(
+            'shared_function', 'memory_tier', True, bool)
+        self.encoding = reader.get('shared_function', 'encoding', 'json')
+        self.sqlite_path = reader.get('shared_function', 'sqlite_path', None)
+        self.lock_lease = reader.get(
+            'shared_function', 'lock_lease', 30, int)
 
     def validate(self):
         """Validate the shared settings"""
         validation_errors = []
-        supported_storage_handlers = ['file', 'redis']
+        supported_storage_handlers = ['file', 'redis', 'sqlite']
         if self.storage not in supported_storage_handlers:
             validation_errors.append(
                 '[shared] storage must be one of {}'
@@ -994,6 +1094,20 @@ class SharedFunctionSettings(FeatureSettings):
             except ImportError:
                 validation_errors.append(
                     '[shared] python redis package not installed')
+        if self.encoding is None:
+            self.encoding = 'json'
+        supported_encodings = ['json', 'zlib', 'msgpack']
+        if self.encoding not in supported_encodings:
+            validation_errors.append(
+                '[shared] encoding must be one of {}'
+                .format(supported_encodings)
+            )
+        if self.encoding == 'msgpack':
+            try:
+                importlib.import_module('msgpack')
+            except ImportError:
+                validation_errors.append(
+                    '[shared] python msgpack package not installed')
         if self.share_timeout is None:
             self.share_timeout = self.MAX_SHARE_TIMEOUT
         if self.share_timeout > self.MAX_SHARE_TIMEOUT:
@@ -1022,6 +1136,21 @@ class Settings(object):
         self.rhel6_os = None
         self.rhel7_os = None
         self.capsule_repo = None
+        self.cleanup_deferred = None
+        self.cleanup_queue_interval = None
+        self.cleanup_queue_storage = None
+        self.cleanup_workers = None
+        self.hammer_bulk_workers = None
+        self.hammer_cache_size = None
+        self.hammer_cache_ttl = None
+        self.hammer_json_output = None
+        self.hammer_shell = None
+        self.lock_backend = None
+        self.lock_stats = None
+        self.object_cache_size = None
+        self.object_cache_storage = None
+        self.object_cache_ttl = None
+        self.object_cache_validate = None
         self.sattools_repo = None
         self.screenshots_path = None
         self.tmp_dir = None
@@ -1047,6 +1176,7 @@ class Settings(object):
         self.ec2 = EC2Settings()
         self.fake_capsules = FakeCapsuleSettings()
         self.fake_manifest = FakeManifestSettings()
+        self.http_client = HttpClientSettings()
         self.ldap = LDAPSettings()
         self.ipa = LDAPIPASettings()
         self.oscap = OscapSettings()
@@ -1139,6 +1269,36 @@ class Settings(object):
         self.run_one_datapoint = self.reader.get(
             'robottelo', 'run_one_datapoint', False, bool)
         self.cleanup = self.reader.get('robottelo', 'cleanup', False, bool)
+        self.cleanup_deferred = self.reader.get(
+            'robottelo', 'cleanup_deferred', False, bool)
+        self.cleanup_queue_interval = self.reader.get(
+            'robottelo', 'cleanup_queue_interval', 10, int)
+        self.cleanup_queue_storage = self.reader.get(
+            'robottelo', 'cleanup_queue_storage', 'file')
+        self.cleanup_workers = self.reader.get(
+            'robottelo', 'cleanup_workers', 4, int)
+        self.hammer_bulk_workers = self.reader.get(
+            'robottelo', 'hammer_bulk_workers', 4, int)
+        self.hammer_cache_size = self.reader.get(
+            'robottelo', 'hammer_cache_size', 1024, int)
+        self.hammer_cache_ttl = self.reader.get(
+            'robottelo', 'hammer_cache_ttl', 0, int)
+        self.hammer_json_output = self.reader.get(
+            'robottelo', 'hammer_json_output', False, bool)
+        self.hammer_shell = self.reader.get(
+            'robottelo', 'hammer_shell', False, bool)
+        self.lock_backend = self.reader.get(
+            'robottelo', 'lock_backend', 'file')
+        self.lock_stats = self.reader.get(
+            'robottelo', 'lock_stats', False, bool)
+        self.object_cache_size = self.reader.get(
+            'robottelo', 'object_cache_size', 128, int)
+        self.object_cache_storage = self.reader.get(
+            'robottelo', 'object_cache_storage', None)
+        self.object_cache_ttl = self.reader.get(
+            'robottelo', 'object_cache_ttl', 0, int)
+        self.object_cache_validate = self.reader.get(
+            'robottelo', 'object_cache_validate', True, bool)
         self.upstream = self.reader.get('robottelo', 'upstream', True, bool)
         self.verbosity = self.reader.get(
             'robottelo',
@@ -1178,6 +1338,12 @@ class Settings(object):
                 '[robottelo] webdriver should be one of {0}.'
                 .format(', '.join(webdrivers))
             )
+        lock_backends = ('file', 'redis')
+        if self.lock_backend not in lock_backends:
+            validation_errors.append(
+                '[robottelo] lock_backend should be one of {0}.'
+                .format(', '.join(lock_backends))
+            )
         if self.browser == 'saucelabs':
             if self.saucelabs_user is None:
                 validation_errors.append(
@@ -1218,6 +1384,9 @@ class Settings(object):
         returned by :meth:`robottelo.helpers.get_nailgun_config`. See
         ``robottelo.entity_mixins.Entity`` for more information on the effects
         of this.
+        * Make ``nailgun.client`` send its requests through the shared
+          session of :mod:`robottelo.api.http`, configured by the
+          ``[http_client]`` section.
         * Set a default value for ``nailgun.entities.GPGKey.content``.
         * Set the default value for
           ``nailgun.entities.DockerComputeResource.url``
@@ -1230,6 +1399,9 @@ class Settings(object):
             self.server.get_credentials(),
             verify=False,
         )
+        # imported here as the module reads these settings
+        from robottelo.api import http
+        http.install()
 
         gpgkey_init = entities.GPGKey.__init__
 
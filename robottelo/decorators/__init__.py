@@ -1,5 +1,6 @@
 # -*- encoding: utf-8 -*-
 """Implements various decorators"""
+import atexit
 import logging
 from functools import partial, wraps
 
@@ -16,10 +17,12 @@ from robozilla.decorators import (  # noqa
 
 from robottelo.config import settings
 from robottelo.constants import NOT_IMPLEMENTED
+from robottelo.decorators.object_cache import ObjectCache
 from robottelo.host_info import get_host_sat_version
 
 LOGGER = logging.getLogger(__name__)
-OBJECT_CACHE = {}
+OBJECT_CACHE = ObjectCache()
+atexit.register(OBJECT_CACHE.log_stats)
 
 # Test Tier Decorators
 # CRUD tests
@@ -175,8 +178,19 @@ def stubbed(reason=None):
     return wrapper
 
 
-def cacheable(func):
-    """Decorator that makes an optional object cache available"""
+def cacheable(func=None, validate=None):
+    """Decorator that makes an optional object cache available.
+
+    Objects are cached in :data:`OBJECT_CACHE` per factory, options and
+    server hostname. See :mod:`robottelo.decorators.object_cache`.
+
+    :param validate: Called with a cached object, returns whether it can
+        still be used, for example whether it still exists on the server.
+        It is not called if the ``object_cache_validate`` setting is
+        disabled.
+    """
+    if func is None:
+        return partial(cacheable, validate=validate)
 
     @wraps(func)
     def cacheable_function(options=None, cached=False):
@@ -184,12 +198,21 @@ def cacheable(func):
         This is the function being returned.
         Requires input function's name start with 'make_'
         """
-        object_key = func.__name__.replace('make_', '')
-        if cached is True and object_key in OBJECT_CACHE:
-            return OBJECT_CACHE[object_key]
+        if cached is not True:
+            return func(options)
+        object_key = OBJECT_CACHE.make_key(
+            func.__name__.replace('make_', ''),
+            options,
+            settings.server.hostname,
+        )
+        check = validate
+        if settings.object_cache_validate is False:
+            check = None
+        found, new_object = OBJECT_CACHE.get(object_key, validate=check)
+        if found:
+            return new_object
         new_object = func(options)
-        if cached is True:
-            OBJECT_CACHE[object_key] = new_object
+        OBJECT_CACHE.set(object_key, new_object)
         return new_object
 
     return cacheable_function
@@ -39,18 +39,52 @@ Usage::
        def test_that_conflict_with_test_to_lock(self)
             with locking_function(self.test_to_lock):
                 # do some operations that conflict with test_to_lock
+
+    # tests only reading a shared state can hold the lock at the same time,
+    # while the functions modifying it wait for them and run alone
+    class SomeTestCase(TestCase):
+
+        @lock_function(mode=LOCK_SHARED)
+        def test_reading_manifest(self):
+            pass
+
+        def test_refreshing_manifest(self):
+            with locking_function(self.test_reading_manifest):
+                # refresh the manifest
+
+    # at most size workers can hold a semaphore at once, each one in its own
+    # slot, for example to share a pool of libvirt hosts
+    with locking_function(use_libvirt_host, mode=LOCK_SEMAPHORE,
+                          size=3) as slot:
+        libvirt_host = libvirt_hosts[slot]
+
+    # with lock_backend=redis the exclusive and semaphore locks are redis
+    # lease locks, shared by the workers of all the hosts using the same redis
+    # and released after lock_lease seconds when their holder crashes
+    set_default_backend(LOCK_BACKEND_REDIS)
 """
+import collections
+import fcntl
 import functools
 import inspect
 import logging
 import os
+import random
 import tempfile
+import time
 
 from contextlib import contextmanager
 
 from pytest_services.locks import file_lock
+from zc.lockfile import LockError, SimpleLockFile
 
 from robottelo.config import settings
+from robottelo.decorators import lock_stats, setting_is_set
+from robottelo.decorators.func_shared import redis_storage
+from robottelo.decorators.func_shared.redis_storage import (
+    LeaseLockError,
+    RedisLeaseLock,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -60,8 +94,31 @@ LOCK_DIR = None
 LOCK_DEFAULT_TIMEOUT = 1800  # 30 minutes
 LOCK_FILE_NAME_EXT = 'lock'
 LOCK_DEFAULT_SCOPE = None
+LOCK_DEFAULT_BACKEND = None
 
 _DEFAULT_CLASS_NAME_DEPTH = 3
+_LOCK_STATS_KIND = 'func_locker'
+
+#: Only one process holds the lock, the default mode
+LOCK_EXCLUSIVE = 'exclusive'
+#: Many processes hold the lock together, while no process holds it in
+#: exclusive mode
+LOCK_SHARED = 'shared'
+#: At most ``size`` processes hold the lock, each one in its own slot
+LOCK_SEMAPHORE = 'semaphore'
+LOCK_MODES = (LOCK_EXCLUSIVE, LOCK_SHARED, LOCK_SEMAPHORE)
+
+#: The locks are files locked by the processes of this host, the default
+LOCK_BACKEND_FILE = 'file'
+#: The locks are redis lease locks, released after the lease if the holder
+#: crashes
+LOCK_BACKEND_REDIS = 'redis'
+LOCK_REDIS_KEY_PREFIX = 'func_locker'
+
+_redis_client = None
+
+# the shared locks held by the processes, keyed by process id and lock path
+_shared_locks = collections.Counter()
 
 
 class FunctionLockerError(Exception):
@@ -85,6 +142,47 @@ def _get_default_scope():
         return LOCK_DEFAULT_SCOPE
 
 
+def set_default_backend(value):
+    """Set the default locking backend
+
+    :type value: str
+    """
+    global LOCK_DEFAULT_BACKEND
+    LOCK_DEFAULT_BACKEND = value
+
+
+def _get_default_backend():
+    if LOCK_DEFAULT_BACKEND is None:
+        return settings.lock_backend or LOCK_BACKEND_FILE
+    else:
+        return LOCK_DEFAULT_BACKEND
+
+
+def _get_redis_client():
+    """Return the redis client of the redis backend, connected to the redis
+    of the shared function settings
+    """
+    global _redis_client
+    if _redis_client is None:
+        if setting_is_set('shared_function'):
+            shared_settings = settings.shared_function
+            _redis_client = redis_storage.redis.StrictRedis(
+                host=shared_settings.redis_host,
+                port=shared_settings.redis_port,
+                db=shared_settings.redis_db,
+                password=shared_settings.redis_password
+            )
+            redis_storage.LOCK_LEASE = shared_settings.lock_lease
+        else:
+            _redis_client = redis_storage.redis.StrictRedis(
+                host=redis_storage.REDIS_HOST,
+                port=redis_storage.REDIS_PORT,
+                db=redis_storage.REDIS_DB,
+                password=redis_storage.REDIS_PASSWORD
+            )
+    return _redis_client
+
+
 def get_temp_dir():
     tmp_dir = settings.tmp_dir
     if not tmp_dir:
@@ -168,13 +266,18 @@ def _get_function_name_lock_path(function_name, scope=None, scope_kwargs=None,
 
 def _check_deadlock(lock_file_path, process_id):
     """To prevent process deadlock, raise exception if the file content is the
-    same as process_id
+    same as process_id or if the process holds the lock in shared mode
 
     note: this function is called before the lock
 
     :type lock_file_path: str
     :type process_id: str
     """
+    if _shared_locks[(process_id, lock_file_path)]:
+        raise FunctionLockerError(
+            'recursion detected: the function file already '
+            'locked in shared mode by the same process'
+        )
     if os.path.exists(lock_file_path):
         try:
             lock_file_handler = open(lock_file_path, 'r')
@@ -200,8 +303,225 @@ def _write_content(handler, content):
     handler.flush()
 
 
+def _check_mode(mode, size):
+    """Raise FunctionLockerError if the lock mode or the semaphore size is
+    not valid
+    """
+    if mode not in LOCK_MODES:
+        raise FunctionLockerError(
+            'lock mode "{0}" is not one of {1}'.format(mode, LOCK_MODES))
+    if mode == LOCK_SEMAPHORE and (not size or size < 1):
+        raise FunctionLockerError(
+            'a semaphore lock needs a size of at least 1')
+
+
+def _get_turnstile_path(lock_file_path):
+    """Return the path of the file locked by the processes waiting to lock
+    lock_file_path, exclusive waiters holding it so that new shared lockers
+    do not starve them
+    """
+    return '{0}.turnstile'.format(lock_file_path)
+
+
+def _get_slot_path(lock_file_path, slot):
+    """Return the path of the file of a semaphore slot"""
+    return '{0}.{1}'.format(lock_file_path, slot)
+
+
+def _retry_delay():
+    """Return the time to wait before trying to lock again"""
+    return random.random() * 0.1 + 0.05
+
+
+@contextmanager
+def _exclusive_lock(lock_file_path, process_id, timeout):
+    """Lock lock_file_path exclusively and write the process id to it"""
+    with file_lock(_get_turnstile_path(lock_file_path), remove=False,
+                   timeout=timeout):
+        with file_lock(lock_file_path, remove=False,
+                       timeout=timeout) as handler:
+            # write the process id that locked this function
+            _write_content(handler, process_id)
+            try:
+                yield handler
+            finally:
+                # clear the file
+                _write_content(handler, None)
+
+
+@contextmanager
+def _shared_lock(lock_file_path, process_id, timeout):
+    """Lock lock_file_path in shared mode, once no exclusive locker holds or
+    waits for it
+    """
+    with file_lock(_get_turnstile_path(lock_file_path), remove=False,
+                   timeout=timeout):
+        handler = open(lock_file_path, 'a+')
+        total_seconds_slept = 0
+        while True:
+            try:
+                fcntl.flock(handler.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+                break
+            except (IOError, OSError):
+                if total_seconds_slept >= timeout:
+                    handler.close()
+                    raise LockError(
+                        "Couldn't lock {0!r}".format(lock_file_path))
+            seconds_to_sleep = _retry_delay()
+            total_seconds_slept += seconds_to_sleep
+            time.sleep(seconds_to_sleep)
+    _shared_locks[(process_id, lock_file_path)] += 1
+    try:
+        yield None
+    finally:
+        _shared_locks[(process_id, lock_file_path)] -= 1
+        fcntl.flock(handler.fileno(), fcntl.LOCK_UN)
+        handler.close()
+
+
+@contextmanager
+def _semaphore_lock(lock_file_path, process_id, size, timeout):
+    """Lock the first free of the size slots of lock_file_path and yield its
+    index
+    """
+    slot_paths = [_get_slot_path(lock_file_path, slot)
+                  for slot in range(size)]
+    for slot_path in slot_paths:
+        _check_deadlock(slot_path, process_id)
+    total_seconds_slept = 0
+    while True:
+        for slot, slot_path in enumerate(slot_paths):
+            try:
+                lock_file = SimpleLockFile(slot_path)
+            except LockError:
+                continue
+            # write the process id that locked this slot
+            _write_content(lock_file._fp, process_id)
+            try:
+                yield slot
+            finally:
+                # clear the file
+                _write_content(lock_file._fp, None)
+                lock_file.close()
+            return
+        if total_seconds_slept >= timeout:
+            raise LockError(
+                "Couldn't lock any of the {0} slots of {1!r}".format(
+                    size, lock_file_path))
+        seconds_to_sleep = _retry_delay()
+        total_seconds_slept += seconds_to_sleep
+        time.sleep(seconds_to_sleep)
+
+
+def _check_redis_deadlock(lock_name, owner_id):
+    """To prevent process deadlock, raise exception if the redis lock is
+    owned by owner_id
+
+    :type lock_name: str
+    :type owner_id: str
+    """
+    if RedisLeaseLock.get_owner(_get_redis_client(), lock_name) == owner_id:
+        raise FunctionLockerError(
+            'recursion detected: the function lock already '
+            'acquired by the same process'
+        )
+
+
+@contextmanager
+def _redis_exclusive_lock(lock_name, owner_id, timeout):
+    """Acquire the redis lease lock lock_name"""
+    with RedisLeaseLock(_get_redis_client(), lock_name,
+                        blocking_timeout=timeout, owner=owner_id) as lease:
+        yield lease
+
+
+@contextmanager
+def _redis_semaphore_lock(lock_name, owner_id, size, timeout):
+    """Acquire the redis lease lock of the first free of the size slots of
+    lock_name and yield its index
+    """
+    slot_names = [_get_slot_path(lock_name, slot) for slot in range(size)]
+    for slot_name in slot_names:
+        _check_redis_deadlock(slot_name, owner_id)
+    leases = [RedisLeaseLock(_get_redis_client(), slot_name,
+                             owner=owner_id)
+              for slot_name in slot_names]
+    total_seconds_slept = 0
+    while True:
+        for slot, lease in enumerate(leases):
+            if not lease.acquire(blocking=False):
+                continue
+            try:
+                yield slot
+            finally:
+                lease.release()
+            return
+        if total_seconds_slept >= timeout:
+            raise LeaseLockError(
+                "Couldn't lock any of the {0} slots of {1!r}".format(
+                    size, lock_name))
+        seconds_to_sleep = _retry_delay()
+        total_seconds_slept += seconds_to_sleep
+        time.sleep(seconds_to_sleep)
+
+
+def _get_locker(lock_file_path, lock_key, process_id, mode, size, timeout):
+    """Return the context manager locking lock_file_path in the given mode
+    with the default backend
+    """
+    if _get_default_backend() == LOCK_BACKEND_REDIS:
+        if mode == LOCK_SHARED:
+            raise FunctionLockerError(
+                'the redis lock backend does not support the shared mode')
+        lock_name = '.'.join([LOCK_REDIS_KEY_PREFIX, lock_key])
+        # the process ids of the hosts sharing the redis server may collide
+        owner_id = redis_storage.get_owner_id()
+        # to prevent dead lock when recursively calling this function
+        # check if the same process is trying to acquire the lock
+        _check_redis_deadlock(lock_name, owner_id)
+        if mode == LOCK_EXCLUSIVE:
+            return _redis_exclusive_lock(lock_name, owner_id, timeout)
+        return _redis_semaphore_lock(lock_name, owner_id, size, timeout)
+
+    # to prevent dead lock when recursively calling this function
+    # check if the same process is trying to acquire the lock
+    _check_deadlock(lock_file_path, process_id)
+    if mode == LOCK_EXCLUSIVE:
+        return _exclusive_lock(lock_file_path, process_id, timeout)
+    elif mode == LOCK_SHARED:
+        return _shared_lock(lock_file_path, process_id, timeout)
+    return _semaphore_lock(lock_file_path, process_id, size, timeout)
+
+
+@contextmanager
+def _lock(lock_file_path, function_name, mode=LOCK_EXCLUSIVE, size=None,
+          timeout=LOCK_DEFAULT_TIMEOUT):
+    """Lock lock_file_path in the given mode and log the time waited for the
+    lock
+
+    :return: the lock file handler, or the redis lease lock with the redis
+        backend, in exclusive mode, the slot index in semaphore mode and None
+        in shared mode
+    """
+    process_id = str(os.getpid())
+    lock_key = os.path.relpath(lock_file_path, _get_temp_lock_function_dir())
+    locker = _get_locker(
+        lock_file_path, lock_key, process_id, mode, size, timeout)
+    start = time.time()
+    with lock_stats.timed(_LOCK_STATS_KIND, lock_key, locker,
+                          mode=mode) as value:
+        logger.info(
+            'process id: {0} - lock function name: {1} - {2} lock using file '
+            'path: {3} - waited {4:.2f}s'.format(
+                process_id, function_name, mode, lock_file_path,
+                time.time() - start)
+        )
+        yield value
+
+
 def lock_function(function=None, scope=_get_default_scope, scope_context=None,
-                  scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT):
+                  scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT,
+                  mode=LOCK_EXCLUSIVE, size=None):
     """Generic function locker, lock any decorated function. Any parallel
      pytest xdist worker will wait for this function to finish
 
@@ -210,6 +530,8 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
     :type scope_kwargs: dict
     :type scope_context: str
     :type timeout: int
+    :type mode: str
+    :type size: int
 
     :param function: the function that is intended to be locked
     :param scope: this parameter will define the namespace of locking
@@ -217,7 +539,11 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
            lock in combination with scope and function.
     :param scope_kwargs: kwargs to be passed to scope if is a callable
     :param timeout: the time in seconds to wait for acquiring the lock
+    :param mode: the lock mode, one of LOCK_EXCLUSIVE, LOCK_SHARED or
+           LOCK_SEMAPHORE
+    :param size: the number of slots of a semaphore lock
     """
+    _check_mode(mode, size)
     class_names = []
     class_name = None
     index = 1
@@ -244,27 +570,10 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
                 scope_kwargs=scope_kwargs,
                 scope_context=scope_context
                 )
-            process_id = str(os.getpid())
-            # to prevent dead lock when recursively calling this function
-            # check if the same process is trying to acquire the lock
-            _check_deadlock(lock_file_path, process_id)
-
-            with file_lock(lock_file_path, remove=False,
-                           timeout=timeout) as handler:
-                logger.info(
-                    'process id: {0} lock function using file path: {1}'
-                    .format(process_id, lock_file_path)
-                )
-                # write the process id that locked this function
-                _write_content(handler, process_id)
+            with _lock(lock_file_path, function_name, mode=mode, size=size,
+                       timeout=timeout):
                 # call the locked function
-                try:
-                    res = func(*args, **kwargs)
-                finally:
-                    # clear the file
-                    _write_content(handler, None)
-
-            return res
+                return func(*args, **kwargs)
 
         return function_wrapper
 
@@ -279,15 +588,21 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
 
 @contextmanager
 def locking_function(function, scope=_get_default_scope, scope_context=None,
-                     scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT):
+                     scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT,
+                     mode=LOCK_EXCLUSIVE, size=None):
     """Lock a function in combination with a scope and scope_context.
     Any parallel pytest xdist worker will wait for this function to finish.
 
+    The lock mode does not depend on the mode the function was decorated
+    with, so a function decorated in shared mode can be locked exclusively.
+
     :type function: callable
     :type scope: str or callable
     :type scope_kwargs: dict
     :type scope_context: str
     :type timeout: int
+    :type mode: str
+    :type size: int
 
     :param function: the function that is intended to be locked
     :param scope: this parameter will define the namespace of locking
@@ -295,7 +610,13 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
            lock in combination with scope and function.
     :param scope_kwargs: kwargs to be passed to scope if is a callable
     :param timeout: the time in seconds to wait for acquiring the lock
+    :param mode: the lock mode, one of LOCK_EXCLUSIVE, LOCK_SHARED or
+           LOCK_SEMAPHORE
+    :param size: the number of slots of a semaphore lock
+    :return: the lock file handler in exclusive mode, the slot index in
+           semaphore mode and None in shared mode
     """
+    _check_mode(mode, size)
     if not getattr(function, '__function_locked__', False):
         raise FunctionLockerError(
             'Cannot ensure locking when using a non locked function')
@@ -307,21 +628,7 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
         scope_kwargs=scope_kwargs,
         scope_context=scope_context
     )
-    process_id = str(os.getpid())
-    # to prevent dead lock when recursively calling this function
-    # check if the same process is trying to acquire the lock
-    _check_deadlock(lock_file_path, process_id)
-
-    with file_lock(lock_file_path, remove=False, timeout=timeout) as handler:
-        logger.info(
-            'process id: {0} - lock function name:{1}  - using file path: {2}'
-            .format(process_id, function_name, lock_file_path)
-        )
-        # write the process id that locked this function
-        _write_content(handler, process_id)
+    with _lock(lock_file_path, function_name, mode=mode, size=size,
+               timeout=timeout) as value:
         # let the locked code run
-        try:
-            yield handler
-        finally:
-            # clear the file
-            _write_content(handler, None)
+        yield value
@@ -1,16 +1,65 @@
 # -*- encoding: utf-8 -*-
+import base64
 import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# the encoding of the stored values, one of json, zlib or msgpack
+ENCODING = 'json'
+# the encoded values smaller than this number of bytes are not compressed
+COMPRESS_MIN_SIZE = 1024
+
+_ENCODING_JSON = 'json'
+_ENCODING_MSGPACK = 'msgpack'
+_TAG_MSGPACK = 'msgpack'
+_TAG_ZLIB = 'zlib'
+_TAGS = ('{0}+{1}'.format(_TAG_MSGPACK, _TAG_ZLIB), _TAG_MSGPACK, _TAG_ZLIB)
 
 
 class BaseStorageHandler(object):
 
     @staticmethod
     def encode(data):
-        return json.dumps(data)
+        """Encode data as json, or with the zlib and msgpack encodings as
+        ``tags:base64 payload``, the payload being compressed if not smaller
+        than ``COMPRESS_MIN_SIZE``
+        """
+        if ENCODING == _ENCODING_JSON:
+            return json.dumps(data)
+        tags = []
+        if ENCODING == _ENCODING_MSGPACK:
+            payload = msgpack.packb(data, use_bin_type=True)
+            tags.append(_TAG_MSGPACK)
+        else:
+            payload = json.dumps(data).encode('utf-8')
+        if len(payload) >= COMPRESS_MIN_SIZE:
+            payload = zlib.compress(payload)
+            tags.append(_TAG_ZLIB)
+        if not tags:
+            # a small json value is stored as is
+            return payload.decode('utf-8')
+        return '{0}:{1}'.format(
+            '+'.join(tags), base64.b64encode(payload).decode('ascii'))
 
     @staticmethod
     def decode(data):
-        return json.loads(data)
+        """Decode data encoded with any of the encodings"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        tags, _, payload = data.partition(':')
+        if tags not in _TAGS:
+            return json.loads(data)
+        tags = tags.split('+')
+        payload = base64.b64decode(payload)
+        if _TAG_ZLIB in tags:
+            payload = zlib.decompress(payload)
+        if _TAG_MSGPACK in tags:
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload.decode('utf-8'))
 
     def lock(self, lock_key):
         """Return the storage locker context manager"""
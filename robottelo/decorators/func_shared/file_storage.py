@@ -6,6 +6,7 @@ import tempfile
 from pytest_services.locks import file_lock
 
 from robottelo.config import settings
+from robottelo.decorators import lock_stats
 from robottelo.decorators.func_shared.base import BaseStorageHandler
 
 TEMP_ROOT_DIR = 'robottelo'
@@ -69,8 +70,11 @@ class FileStorageHandler(BaseStorageHandler):
     def lock(self, key):
         """Return the storage locker context manager"""
         lock_key = '{}.lock'.format(key)
-        return file_lock(self.get_key_file_path(lock_key), remove=False,
-                         timeout=self._lock_timeout)
+        return lock_stats.timed(
+            'file_storage', key,
+            file_lock(self.get_key_file_path(lock_key), remove=False,
+                      timeout=self._lock_timeout)
+        )
 
     def when_lock_acquired(self, handler):
         """Write the process id to file handler"""
@@ -101,5 +105,15 @@ class FileStorageHandler(BaseStorageHandler):
         """
         value = self.encode(value)
         key_file_path = self.get_key_file_path(key)
-        with open(key_file_path, 'w') as file_handler:
-            file_handler.write(value)
+        # write to a temporary file renamed over the key file, so that the
+        # readers not holding the lock never read a partially written value
+        tmp_file_handle, tmp_file_path = tempfile.mkstemp(
+            prefix='{0}.'.format(key), suffix='.tmp', dir=self._root_dir)
+        try:
+            with os.fdopen(tmp_file_handle, 'w') as file_handler:
+                file_handler.write(value)
+            os.rename(tmp_file_path, key_file_path)
+        except Exception:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
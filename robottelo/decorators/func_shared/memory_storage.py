@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+import json
+import threading
+import time
+
+from robottelo.decorators.func_shared.base import BaseStorageHandler
+
+# after this number of seconds the values are dropped
+TIMEOUT = 86400
+
+
+class MemoryStorageHandler(BaseStorageHandler):
+    """Process memory key value storage handler, kept in front of the file
+    and redis ones so that a process reads the values it already read only
+    once.
+    """
+
+    def __init__(self, timeout=None):
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._data = {}
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return TIMEOUT
+
+    def lock(self, key):
+        """Return the storage locker context manager"""
+        with self._lock:
+            return self._locks.setdefault(key, threading.RLock())
+
+    def when_lock_acquired(self, data):
+        # do nothing
+        pass
+
+    def get(self, key):
+        """Return the key value, None if missing or expired
+
+        :type key: str
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expire_time, value = entry
+            if time.time() >= expire_time:
+                del self._data[key]
+                return None
+        # the values are kept encoded, so that the callers can not modify
+        # them, but never compressed
+        return json.loads(value)
+
+    def set(self, key, value, timeout=None):
+        """Keep the value of key for timeout seconds
+
+        :type key: str
+        :type value: object
+        :type timeout: int
+        """
+        if timeout is None:
+            timeout = self.timeout
+        value = json.dumps(value)
+        with self._lock:
+            self._data[key] = (time.time() + timeout, value)
+
+    def delete(self, key):
+        """Drop the value of key"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all the values"""
+        with self._lock:
+            self._data.clear()
@@ -1,25 +1,208 @@
 # -*- encoding: utf-8 -*-
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+from contextlib import contextmanager
+
 try:
     import redis
 except ImportError:
     redis = None
 
+from robottelo.decorators import lock_stats
 from robottelo.decorators.func_shared.base import BaseStorageHandler
 
+logger = logging.getLogger(__name__)
+
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
 REDIS_PASSWORD = None
 LOCK_TIMEOUT = 7200
+# the number of seconds a lock is held if not renewed by its heartbeat, a
+# crashed holder lock being released after at most this time
+LOCK_LEASE = 30
+
+# renew the lease if still held by the caller
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# release the lock if still held by the caller
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+# write the value if the lock is still held by the caller and no newer
+# fencing token was issued
+_FENCED_SET_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1]
+        and redis.call('get', KEYS[2]) == ARGV[2] then
+    redis.call('set', KEYS[3], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# the owner id of the current process, keyed by process id so that a forked
+# process gets its own one
+_owner_ids = {}
+
+
+def get_owner_id():
+    """Return the lock owner id of the current process, unique across the
+    hosts sharing the redis server: ``hostname:pid:token``, the random token
+    being generated once per process
+    """
+    pid = os.getpid()
+    owner_id = _owner_ids.get(pid)
+    if owner_id is None:
+        owner_id = _owner_ids[pid] = '{0}:{1}:{2}'.format(
+            socket.gethostname(), pid, uuid.uuid4().hex)
+    return owner_id
+
+
+class LeaseLockError(Exception):
+    """Redis lease lock related exception"""
+
+
+class RedisLeaseLock(object):
+    """Redis lock held for ``lease`` seconds and renewed by a heartbeat
+    thread while the holder runs, so that the lock of a crashed holder is
+    quickly released.
+
+    Each acquire is given a fencing token, increasing for each new holder of
+    the lock, that the holder writes check to not overwrite the writes of a
+    newer holder once its lease is lost.
+
+    :param client: the redis client
+    :param str name: the lock name
+    :param int lease: the number of seconds the lock is held if not renewed
+    :param int blocking_timeout: the number of seconds to wait for the lock
+    :param str owner: the lock owner written to the lock value, by default
+        the owner id of the process, see :func:`get_owner_id`
+    """
+
+    def __init__(self, client, name, lease=None, blocking_timeout=None,
+                 owner=None):
+        if lease is None:
+            lease = LOCK_LEASE
+        if blocking_timeout is None:
+            blocking_timeout = LOCK_TIMEOUT
+        if owner is None:
+            owner = get_owner_id()
+        self.client = client
+        self.name = name
+        self.fencing_key = '{0}.fencing'.format(name)
+        self.lease = lease
+        self.blocking_timeout = blocking_timeout
+        self.value = '{0}:{1}'.format(owner, uuid.uuid4().hex)
+        self.token = None
+        self.lost = False
+        self._heartbeat_thread = None
+        self._stop_heartbeat = threading.Event()
+        self._renew_script = client.register_script(_RENEW_SCRIPT)
+        self._release_script = client.register_script(_RELEASE_SCRIPT)
+        self._fenced_set_script = client.register_script(_FENCED_SET_SCRIPT)
+
+    @staticmethod
+    def get_owner(client, name):
+        """Return the owner of the lock name, None if not locked"""
+        value = client.get(name)
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        # the owner may itself contain colons
+        return value.rsplit(':', 1)[0]
+
+    def acquire(self, blocking=True):
+        """Acquire the lock and start the heartbeat, return whether the lock
+        was acquired
+        """
+        total_seconds_slept = 0
+        while not self.client.set(self.name, self.value, nx=True,
+                                  px=int(self.lease * 1000)):
+            if not blocking:
+                return False
+            if total_seconds_slept >= self.blocking_timeout:
+                raise LeaseLockError(
+                    "Couldn't lock {0!r}".format(self.name))
+            seconds_to_sleep = random.random() * 0.1 + 0.05
+            total_seconds_slept += seconds_to_sleep
+            time.sleep(seconds_to_sleep)
+        self.token = self.client.incr(self.fencing_key)
+        self.lost = False
+        self._stop_heartbeat.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat)
+        self._heartbeat_thread.daemon = True
+        self._heartbeat_thread.start()
+        return True
+
+    def _heartbeat(self):
+        """Renew the lease until released or lost"""
+        interval = self.lease / 3.0
+        while not self._stop_heartbeat.wait(interval):
+            try:
+                renewed = self._renew_script(
+                    keys=[self.name],
+                    args=[self.value, int(self.lease * 1000)]
+                )
+            except redis.RedisError as err:
+                # try again, the lease may still be valid on next beat
+                logger.warning('unable to renew lock {0}: {1}'.format(
+                    self.name, err))
+                continue
+            if not renewed:
+                self.lost = True
+                logger.error('lock {0} lease lost, token: {1}'.format(
+                    self.name, self.token))
+                return
+
+    def release(self):
+        """Stop the heartbeat and release the lock if still held"""
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        self._release_script(keys=[self.name], args=[self.value])
+
+    def fenced_set(self, key, value):
+        """Write value to key only if the lock is still held with the current
+        fencing token, and return whether it was written
+        """
+        return bool(self._fenced_set_script(
+            keys=[self.name, self.fencing_key, key],
+            args=[self.value, self.token, value]
+        ))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
 
 class RedisStorageHandler(BaseStorageHandler):
     """Redis Key value storage handler"""
 
     def __init__(self, host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
-                 password=REDIS_PASSWORD, lock_timeout=LOCK_TIMEOUT):
+                 password=REDIS_PASSWORD, lock_timeout=LOCK_TIMEOUT,
+                 lock_lease=None):
 
         self._lock_timeout = lock_timeout
+        self._lock_lease = lock_lease
+        self._local = threading.local()
         self._client = redis.StrictRedis(
             host=host, port=port, db=db, password=password)
 
@@ -27,15 +210,33 @@ class RedisStorageHandler(BaseStorageHandler):
     def client(self):
         return self._client
 
+    @property
+    def _leases(self):
+        """The lease locks held by the current thread, keyed by key"""
+        leases = getattr(self._local, 'leases', None)
+        if leases is None:
+            leases = self._local.leases = {}
+        return leases
+
+    @contextmanager
+    def _lease(self, key, timeout):
+        lock_key = '{}.lock'.format(key)
+        with RedisLeaseLock(self.client, lock_key, lease=self._lock_lease,
+                            blocking_timeout=timeout) as lease:
+            self._leases[key] = lease
+            try:
+                yield lease
+            finally:
+                self._leases.pop(key, None)
+
     def lock(self, key, timeout=None):
         """Return the storage locker context manager"""
         if timeout is None:
             timeout = self._lock_timeout
 
-        lock_key = '{}.lock'.format(key)
-        # If acquired the lock will be acquired until release
-        return self.client.lock(
-            lock_key, timeout=None, blocking_timeout=timeout)
+        # the lock is released after its lease if the holder crashes
+        return lock_stats.timed(
+            'redis_storage', key, self._lease(key, timeout))
 
     def when_lock_acquired(self, lock_object):
         # do nothing
@@ -52,10 +253,17 @@ class RedisStorageHandler(BaseStorageHandler):
         return value
 
     def set(self, key, value):
-        """Write the value of key
+        """Write the value of key, if key is locked by this thread the lock
+        must still be held
 
         :type key: str
         :type value: object
         """
         value = self.encode(value)
-        self.client.set(key, value)
+        lease = self._leases.get(key)
+        if lease is None:
+            self.client.set(key, value)
+        elif not lease.fenced_set(key, value):
+            raise LeaseLockError(
+                'the lock of {0!r} was lost with token {1}, value not written'
+                .format(key, lease.token))
@@ -6,6 +6,9 @@ return the stored results, which make the shared function results persistent.
 Note: Shared function store it's data as json. The results of the decorated
     function must be json compatible.
 
+Note: Once ready, the results are read without locking the storage and kept in
+    the memory of the process until they expire.
+
 Usage::
 
 
@@ -100,16 +103,24 @@ from nailgun.entities import Entity
 
 from robottelo.config import settings
 from robottelo.decorators import setting_is_set
+from robottelo.decorators.func_shared import base
 from robottelo.decorators.func_shared import file_storage
+from robottelo.decorators.func_shared import memory_storage
 from robottelo.decorators.func_shared import redis_storage
+from robottelo.decorators.func_shared import sqlite_storage
 from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from robottelo.decorators.func_shared.memory_storage import (
+    MemoryStorageHandler)
 from robottelo.decorators.func_shared.redis_storage import RedisStorageHandler
+from robottelo.decorators.func_shared.sqlite_storage import (
+    SQLiteStorageHandler)
 
 logger = logging.getLogger(__name__)
 
 _storage_handlers = {
     'file': FileStorageHandler,
-    'redis': RedisStorageHandler
+    'redis': RedisStorageHandler,
+    'sqlite': SQLiteStorageHandler,
 }
 
 DEFAULT_STORAGE_HANDLER = 'file'
@@ -119,6 +130,8 @@ NAMESPACE_SCOPE = None
 # after 24 hours the shared function data will became not valid
 SHARE_DEFAULT_TIMEOUT = 86400
 DEFAULT_CALL_RETRIES = 2
+# keep the ready values read from storage in the process memory
+MEMORY_TIER = True
 
 _configured = False
 
@@ -132,6 +145,8 @@ _DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
 
 _SERVER_CERT_MD5 = None
 
+_memory_storage = MemoryStorageHandler()
+
 
 def _set_configured(value):
     global _configured
@@ -145,18 +160,26 @@ def _check_config():
     global NAMESPACE_SCOPE
     global SHARE_DEFAULT_TIMEOUT
     global DEFAULT_CALL_RETRIES
+    global MEMORY_TIER
     if not _configured and setting_is_set('shared_function'):
         DEFAULT_STORAGE_HANDLER = settings.shared_function.storage
         ENABLED = settings.shared_function.enabled
         NAMESPACE_SCOPE = settings.shared_function.scope
         SHARE_DEFAULT_TIMEOUT = settings.shared_function.share_timeout
         DEFAULT_CALL_RETRIES = settings.shared_function.call_retries
+        MEMORY_TIER = settings.shared_function.memory_tier
+        base.ENCODING = settings.shared_function.encoding
+        memory_storage.TIMEOUT = settings.shared_function.share_timeout
         file_storage.LOCK_TIMEOUT = settings.shared_function.lock_timeout
         redis_storage.LOCK_TIMEOUT = settings.shared_function.lock_timeout
+        redis_storage.LOCK_LEASE = settings.shared_function.lock_lease
         redis_storage.REDIS_HOST = settings.shared_function.redis_host
         redis_storage.REDIS_PORT = settings.shared_function.redis_port
         redis_storage.REDIS_DB = settings.shared_function.redis_db
         redis_storage.REDIS_PASSWORD = settings.shared_function.redis_password
+        sqlite_storage.LOCK_TIMEOUT = settings.shared_function.lock_timeout
+        sqlite_storage.SHARE_TIMEOUT = settings.shared_function.share_timeout
+        sqlite_storage.SQLITE_PATH = settings.shared_function.sqlite_path
         _set_configured(True)
 
 
@@ -168,6 +191,12 @@ def enable_shared_function(value):
     ENABLED = bool(value)
 
 
+def is_shared_function_enabled():
+    """Return whether the shared functions store their results"""
+    _check_config()
+    return ENABLED
+
+
 def set_default_scope(value):
     """Set the default namespace scope
     :type value: str or callable
@@ -187,6 +216,24 @@ def _get_default_scope():
     return str(format(os.getppid()))
 
 
+def enable_memory_tier(value):
+    """force and override settings, by setting the global memory tier
+    attribute
+    """
+    global MEMORY_TIER
+    MEMORY_TIER = bool(value)
+
+
+def get_memory_storage():
+    """Return the process memory storage handler instance, None if the memory
+    tier is disabled
+    """
+    _check_config()
+    if MEMORY_TIER:
+        return _memory_storage
+    return None
+
+
 def _get_default_storage_handler():
     """Return the storage handler instance"""
     if DEFAULT_STORAGE_HANDLER not in _storage_handlers:
@@ -215,10 +262,12 @@ class _SharedFunction(object):
     def __init__(self, function_key, function, args=None, kwargs=None,
                  retries=DEFAULT_CALL_RETRIES, storage_handler=None,
                  timeout=SHARE_DEFAULT_TIMEOUT,
-                 inject=False, injected_kw='_inject'):
+                 inject=False, injected_kw='_inject', memory_storage=None):
 
         if storage_handler is None:
             storage_handler = _get_default_storage_handler()
+        if memory_storage is None:
+            memory_storage = get_memory_storage()
 
         if storage_handler is None:
             raise SharedFunctionError('storage_handler not supplied')
@@ -231,6 +280,7 @@ class _SharedFunction(object):
         self._function_kwargs = kwargs
         self._function_key = function_key
         self._storage_handler = storage_handler
+        self._memory_storage = memory_storage
         self._inject = inject
         self._injected_kw = injected_kw
         if not retries:
@@ -243,6 +293,10 @@ class _SharedFunction(object):
     def storage(self):
         return self._storage_handler
 
+    @property
+    def memory(self):
+        return self._memory_storage
+
     @property
     def key(self):
         return self._function_key
@@ -300,67 +354,121 @@ class _SharedFunction(object):
 
         return False
 
+    def _is_value_ready(self, value):
+        """Return whether the stored value is a not expired result"""
+        if value is None or value['state'] not in [_STATE_READY,
+                                                   _STATE_FAILED]:
+            return False
+        creation_datetime = datetime.datetime.strptime(
+            value['creation_datetime'], _DATETIME_FORMAT)
+        return not self._has_result_expired(creation_datetime)
+
+    def _get_ready_value(self):
+        """Return the ready value from memory or from storage without taking
+        the storage lock, None if there is no ready value
+        """
+        if self.memory is not None:
+            value = self.memory.get(self.key)
+            if self._is_value_ready(value):
+                return value
+        # values are written at once, it is safe to read them unlocked
+        value = self.storage.get(self.key)
+        if self._is_value_ready(value):
+            self._set_memory_value(value)
+            return value
+        return None
+
+    def _set_memory_value(self, value):
+        """Keep value in memory until it expires"""
+        if self.memory is not None:
+            self.memory.set(self.key, value, timeout=self._share_timeout)
+
+    def _store(self, expected, value):
+        """Store value and return the stored value.
+
+        With a storage handler supporting ``compare_and_set`` the value is
+        only written if the stored value is still the expected one, otherwise
+        the ready value stored meanwhile by an other worker is returned.
+        """
+        compare_and_set = getattr(self.storage, 'compare_and_set', None)
+        if compare_and_set is None:
+            self.storage.set(self.key, value)
+            return value
+        if compare_and_set(self.key, expected, value):
+            return value
+        stored_value = self.storage.get(self.key)
+        if not self._is_value_ready(stored_value):
+            raise SharedFunctionError(
+                'the value of {0} was changed while its function was running'
+                .format(self.key))
+        logger.warning(
+            'the value of {0} was stored by the process {1} first'.format(
+                self.key, stored_value['pid']))
+        return stored_value
+
+    def _call_and_store(self, expected=None):
+        """Call the function, store its result or error and return the stored
+        value and the exception raised if any
+
+        note: must be called with the storage lock acquired, expected being
+        the value read with the lock
+        """
+        result, exp, traceback_text = self._call_function()
+        creation_datetime = datetime.datetime.utcnow().strftime(
+            _DATETIME_FORMAT)
+        if exp:
+            error = str(exp) or 'error occurred'
+            error_class_name = '{0}.{1}'.format(
+                exp.__class__.__module__, exp.__class__.__name__)
+            value = dict(state=_STATE_FAILED,
+                         id=self.transaction,
+                         result=None,
+                         error=error,
+                         error_class_name=error_class_name,
+                         traceback=traceback_text,
+                         pid=os.getpid(),
+                         creation_datetime=creation_datetime
+                         )
+        else:
+            result = self._encode_result_kwargs(result)
+            value = dict(state=_STATE_READY,
+                         id=self.transaction,
+                         result=result,
+                         error=None,
+                         pid=os.getpid(),
+                         creation_datetime=creation_datetime
+                         )
+        return self._store(expected, value), exp
+
     def __call__(self):
-        # this lock prevent any other process to run the function,
-        # and if an other process is running the function, I should wait it
-        # to finish
-        # note: when results are ready this lock has a very short time
-        with self.storage.lock(self.key) as data:
-            self.storage.when_lock_acquired(data)
-            # first must investigate, call the function or use the results
-            result = None
-            error = None
-            traceback_text = ''
-            error_class_name = None
-            exp = None
-            pid = None
-            value = self.storage.get(self.key)
-            if value is None:
-                call_function = True
-            else:
-                state = value['state']
-                result = value['result']
-                error = value['error']
-                traceback_text = value.get('traceback', '')
-                error_class_name = value.get('error_class_name')
-                pid = value['pid']
-                creation_datetime = datetime.datetime.strptime(
-                    value['creation_datetime'], _DATETIME_FORMAT)
-
-                if (state in [_STATE_READY, _STATE_FAILED]
-                        and not self._has_result_expired(creation_datetime)):
-                    call_function = False
-                else:
+        call_function = False
+        exp = None
+        # a ready value does not need the lock, that way the callers do not
+        # wait each other
+        value = self._get_ready_value()
+        if value is None:
+            # this lock prevent any other process to run the function,
+            # and if an other process is running the function, I should wait
+            # it to finish
+            with self.storage.lock(self.key) as data:
+                self.storage.when_lock_acquired(data)
+                # an other process may have stored the value while waiting
+                value = self.storage.get(self.key)
+                if not self._is_value_ready(value):
                     call_function = True
-
-            if call_function is True:
-                result, exp, traceback_text = self._call_function()
-                creation_datetime = datetime.datetime.utcnow().strftime(
-                    _DATETIME_FORMAT)
-                if exp:
-                    error = str(exp) or 'error occurred'
-                    error_class_name = '{0}.{1}'.format(
-                        exp.__class__.__module__, exp.__class__.__name__)
-                    value = dict(state=_STATE_FAILED,
-                                 id=self.transaction,
-                                 result=None,
-                                 error=error,
-                                 error_class_name=error_class_name,
-                                 traceback=traceback_text,
-                                 pid=os.getpid(),
-                                 creation_datetime=creation_datetime
-                                 )
-                else:
-                    error = None
-                    result = self._encode_result_kwargs(result)
-                    value = dict(state=_STATE_READY,
-                                 id=self.transaction,
-                                 result=result,
-                                 error=error,
-                                 pid=os.getpid(),
-                                 creation_datetime=creation_datetime
-                                 )
-                self.storage.set(self.key, value)
+                    value, exp = self._call_and_store(expected=value)
+                    if value['id'] != self.transaction:
+                        # an other worker won the race, its value is used
+                        # like a stored one
+                        call_function = False
+                        exp = None
+            self._set_memory_value(value)
+
+        result = value['result']
+        error = value['error']
+        traceback_text = value.get('traceback', '')
+        error_class_name = value.get('error_class_name')
+        pid = value['pid']
 
         if call_function and exp:
             # i'am in the first launched process
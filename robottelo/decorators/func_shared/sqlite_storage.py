@@ -0,0 +1,308 @@
+# -*- encoding: utf-8 -*-
+"""Key value storage handler keeping all the keys in a single SQLite database
+in WAL mode.
+
+Each key is a row of the ``shared_values`` table, holding the encoded value,
+its state and creation datetime, and the token, process id and datetime of
+the lock holder. Locking a key is a compare-and-set transition of its lock
+token from NULL, the lock of a dead process being taken over, and setting
+the value of a locked key only succeeds while the lock token is still the
+caller one. The READY and FAILED values of the shared functions are written
+with :meth:`SQLiteStorageHandler.compare_and_set`, a transition from the value
+read with the lock, so a worker never overwrites the value stored by an other
+one that took over its lock. The creation datetime is indexed, so that the
+expired values are cheaply removed by
+:meth:`SQLiteStorageHandler.sweep_expired`.
+"""
+import datetime
+import errno
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from contextlib import contextmanager
+
+from robottelo.decorators import lock_stats
+from robottelo.decorators.func_shared.base import BaseStorageHandler
+from robottelo.decorators.func_shared.file_storage import (
+    get_temp_dir,
+    TEMP_ROOT_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+TEMP_SQLITE_FILE_NAME = 'shared_functions.sqlite'
+SQLITE_PATH = None
+LOCK_TIMEOUT = 7200
+# after this number of seconds the values are removed by sweep_expired
+SHARE_TIMEOUT = 86400
+# the number of seconds to wait for the database when written by an other
+# process
+BUSY_TIMEOUT = 60
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+_LOCK_RETRY_DELAY = 0.1
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS shared_values ('
+    ' key TEXT PRIMARY KEY,'
+    ' value TEXT,'
+    ' state TEXT,'
+    ' creation_datetime TEXT,'
+    ' lock_token TEXT,'
+    ' lock_pid INTEGER,'
+    ' lock_datetime TEXT'
+    ')',
+    'CREATE INDEX IF NOT EXISTS shared_values_creation_datetime'
+    ' ON shared_values (creation_datetime)',
+)
+
+
+class SQLiteStorageError(Exception):
+    """SQLite storage handler related exception"""
+
+
+def _get_default_path():
+    """Return the default path of the database, creating its directory"""
+    root_dir = os.path.join(get_temp_dir(), TEMP_ROOT_DIR)
+    if not os.path.exists(root_dir):
+        try:
+            # it can happen that the workers try to create this path at the
+            # same time
+            os.makedirs(root_dir)
+        except OSError:
+            if not os.path.exists(root_dir):
+                raise
+    return os.path.join(root_dir, TEMP_SQLITE_FILE_NAME)
+
+
+def _utcnow():
+    return datetime.datetime.utcnow().strftime(_DATETIME_FORMAT)
+
+
+def _is_process_alive(pid):
+    """Return whether the process pid of this host is running"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+    return True
+
+
+class SQLiteStorageHandler(BaseStorageHandler):
+    """SQLite database key value storage handler."""
+
+    def __init__(self, path=None, lock_timeout=None):
+        if path is None:
+            path = SQLITE_PATH or _get_default_path()
+        self._path = path
+        self._lock_timeout = lock_timeout
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def lock_timeout(self):
+        if self._lock_timeout is not None:
+            return self._lock_timeout
+        return LOCK_TIMEOUT
+
+    @property
+    def connection(self):
+        """Return the connection of the current thread and process, the
+        connections can not be shared by threads or across forks
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # in autocommit mode each statement is atomic
+            connection = sqlite3.connect(
+                self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.tokens = {}
+        return connection
+
+    @property
+    def _tokens(self):
+        """The lock tokens held by the current thread, keyed by key"""
+        # the connection property resets them for each thread and process
+        self.connection
+        return self._local.tokens
+
+    def _insert_key(self, key):
+        self.connection.execute(
+            'INSERT OR IGNORE INTO shared_values (key) VALUES (?)', (key,))
+
+    def _try_lock(self, key, token):
+        """Set the lock token of key if not locked or locked by a dead
+        process, and return whether it was set
+        """
+        cursor = self.connection.execute(
+            'UPDATE shared_values SET lock_token = ?, lock_pid = ?,'
+            ' lock_datetime = ? WHERE key = ? AND lock_token IS NULL',
+            (token, os.getpid(), _utcnow(), key)
+        )
+        if cursor.rowcount == 1:
+            return True
+        row = self.connection.execute(
+            'SELECT lock_token, lock_pid FROM shared_values WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if row is None or row[0] is None or _is_process_alive(row[1]):
+            return False
+        logger.warning(
+            'taking over the lock of {0} held by the dead process {1}'
+            .format(key, row[1]))
+        cursor = self.connection.execute(
+            'UPDATE shared_values SET lock_token = ?, lock_pid = ?,'
+            ' lock_datetime = ? WHERE key = ? AND lock_token = ?',
+            (token, os.getpid(), _utcnow(), key, row[0])
+        )
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def _lock(self, key, timeout):
+        token = uuid.uuid4().hex
+        self._insert_key(key)
+        total_seconds_slept = 0
+        while not self._try_lock(key, token):
+            if total_seconds_slept >= timeout:
+                raise SQLiteStorageError("Couldn't lock {0!r}".format(key))
+            time.sleep(_LOCK_RETRY_DELAY)
+            total_seconds_slept += _LOCK_RETRY_DELAY
+        self._tokens[key] = token
+        try:
+            yield token
+        finally:
+            self._tokens.pop(key, None)
+            self.connection.execute(
+                'UPDATE shared_values SET lock_token = NULL, lock_pid = NULL,'
+                ' lock_datetime = NULL WHERE key = ? AND lock_token = ?',
+                (key, token)
+            )
+
+    def lock(self, key, timeout=None):
+        """Return the storage locker context manager"""
+        if timeout is None:
+            timeout = self.lock_timeout
+        return lock_stats.timed(
+            'sqlite_storage', key, self._lock(key, timeout))
+
+    def when_lock_acquired(self, token):
+        # the process id is already written with the lock token
+        pass
+
+    def get(self, key):
+        """Return the key value
+
+        :type key: str
+        """
+        row = self.connection.execute(
+            'SELECT value FROM shared_values WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return self.decode(row[0])
+
+    @staticmethod
+    def _get_columns(value):
+        """Return the state and creation datetime columns of value"""
+        if isinstance(value, dict):
+            return (value.get('state'),
+                    value.get('creation_datetime') or _utcnow())
+        return None, _utcnow()
+
+    def set(self, key, value):
+        """Write the value of key, if key is locked by this thread the lock
+        must still be held
+
+        :type key: str
+        :type value: object
+        """
+        state, creation_datetime = self._get_columns(value)
+        self._insert_key(key)
+        token = self._tokens.get(key)
+        cursor = self.connection.execute(
+            'UPDATE shared_values SET value = ?, state = ?,'
+            ' creation_datetime = ? WHERE key = ?'
+            ' AND (? IS NULL OR lock_token = ?)',
+            (self.encode(value), state, creation_datetime, key, token, token)
+        )
+        if cursor.rowcount != 1:
+            raise SQLiteStorageError(
+                'the lock of {0!r} was taken over, value not written'
+                .format(key))
+
+    def compare_and_set(self, key, expected, value):
+        """Write the value of key only if its current value is expected, as
+        returned by get, and return whether it was written. If key is locked by
+        this thread the lock must still be held.
+
+        :type key: str
+        :type expected: object
+        :type value: object
+        :rtype: bool
+        """
+        if expected is not None:
+            expected = self.encode(expected)
+        state, creation_datetime = self._get_columns(value)
+        self._insert_key(key)
+        token = self._tokens.get(key)
+        cursor = self.connection.execute(
+            'UPDATE shared_values SET value = ?, state = ?,'
+            ' creation_datetime = ? WHERE key = ? AND value IS ?'
+            ' AND (? IS NULL OR lock_token = ?)',
+            (self.encode(value), state, creation_datetime, key, expected,
+             token, token)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        """Remove key if not locked"""
+        self.connection.execute(
+            'DELETE FROM shared_values WHERE key = ? AND lock_token IS NULL',
+            (key,)
+        )
+
+    def sweep_expired(self, timeout=None):
+        """Remove the not locked values created more than timeout seconds
+        ago, and return the number of values removed
+
+        :type timeout: int
+        :rtype: int
+        """
+        if timeout is None:
+            timeout = SHARE_TIMEOUT
+        expire_datetime = (
+            datetime.datetime.utcnow() - datetime.timedelta(seconds=timeout)
+        ).strftime(_DATETIME_FORMAT)
+        cursor = self.connection.execute(
+            'DELETE FROM shared_values WHERE lock_token IS NULL'
+            ' AND (creation_datetime < ? OR value IS NULL)',
+            (expire_datetime,)
+        )
+        logger.info('removed {0} expired shared values from {1}'.format(
+            cursor.rowcount, self._path))
+        return cursor.rowcount
+
+    def vacuum(self, timeout=None):
+        """Remove the expired values, then checkpoint the write ahead log and
+        rebuild the database to reclaim its free space
+
+        :return: the number of values removed
+        :rtype: int
+        """
+        removed = self.sweep_expired(timeout=timeout)
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.connection.execute('VACUUM')
+        return removed
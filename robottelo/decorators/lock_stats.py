@@ -0,0 +1,228 @@
+# -*- encoding: utf-8 -*-
+"""Lock contention telemetry of the function lockers and of the shared
+function storage locks.
+
+Every lock acquired through :func:`timed` is recorded, with its key, the
+process id of its holder and the seconds waited for and held, as a json line
+appended to the session stats file. The path of that file is kept in the
+``ROBOTTELO_LOCK_STATS`` environment variable, set by :func:`start_session`
+in the pytest master process and inherited by the pytest-xdist workers, so
+all of them write to the same file. Nothing is recorded when it is not set.
+
+Usage::
+
+    from robottelo.decorators import lock_stats
+
+    lock_stats.start_session()
+
+    with lock_stats.timed('func_locker', 'some.function', locker) as handler:
+        # the lock is held here
+
+    for line in lock_stats.get_report():
+        print(line)
+"""
+import collections
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+LOCK_STATS_ENV = 'ROBOTTELO_LOCK_STATS'
+TEMP_ROOT_DIR = 'robottelo'
+TEMP_LOCK_STATS_DIR = 'lock_stats'
+REPORT_DEFAULT_TOP = 10
+
+
+def get_temp_dir():
+    tmp_dir = settings.tmp_dir
+    if not tmp_dir:
+        tmp_dir = tempfile.gettempdir()
+    return tmp_dir
+
+
+def get_session_path():
+    """Return the path of the session stats file, None if no session was
+    started
+    """
+    return os.environ.get(LOCK_STATS_ENV) or None
+
+
+def start_session(path=None):
+    """Start recording the locks to a new session stats file, and return its
+    path
+
+    :param str path: the stats file path, by default a new file named after
+        the current process id and time in the robottelo temp dir
+    """
+    if path is None:
+        stats_dir = os.path.join(
+            get_temp_dir(), TEMP_ROOT_DIR, TEMP_LOCK_STATS_DIR)
+        if not os.path.exists(stats_dir):
+            try:
+                os.makedirs(stats_dir)
+            except OSError:
+                if not os.path.exists(stats_dir):
+                    raise
+        path = os.path.join(
+            stats_dir,
+            '{0}-{1}.jsonl'.format(os.getpid(), int(time.time())))
+    os.environ[LOCK_STATS_ENV] = path
+    logger.info('recording lock stats to: {0}'.format(path))
+    return path
+
+
+def stop_session():
+    """Stop recording the locks"""
+    os.environ.pop(LOCK_STATS_ENV, None)
+
+
+def record(kind, key, wait, hold=0, acquired=True, mode=None):
+    """Append a lock record to the session stats file, if any
+
+    :param str kind: the locker kind, for example ``func_locker`` or the
+        storage handler name
+    :param str key: the lock key
+    :param float wait: the seconds waited to acquire the lock
+    :param float hold: the seconds the lock was held
+    :param bool acquired: whether the lock was acquired
+    :param str mode: the lock mode, if any
+    """
+    path = get_session_path()
+    if path is None:
+        return
+    line = json.dumps(dict(
+        kind=kind,
+        key=key,
+        pid=os.getpid(),
+        mode=mode,
+        wait=round(wait, 3),
+        hold=round(hold, 3),
+        acquired=acquired,
+        time=time.time(),
+    ))
+    try:
+        # a single small write in append mode is not interleaved with the
+        # writes of the other processes
+        with open(path, 'a') as stats_file:
+            stats_file.write(line + '\n')
+    except (IOError, OSError) as err:
+        logger.warning('unable to record lock stats: {0}'.format(err))
+
+
+@contextmanager
+def timed(kind, key, locker, mode=None):
+    """Enter the locker context manager, yield its value and record the
+    seconds waited for and held the lock
+
+    A locker failing to acquire the lock is recorded as not acquired.
+    """
+    start = time.time()
+    try:
+        value = locker.__enter__()
+    except Exception:
+        record(kind, key, time.time() - start, acquired=False, mode=mode)
+        raise
+    acquired_time = time.time()
+    try:
+        yield value
+    except BaseException:
+        if not locker.__exit__(*sys.exc_info()):
+            raise
+    else:
+        locker.__exit__(None, None, None)
+    finally:
+        record(kind, key, acquired_time - start,
+               hold=time.time() - acquired_time, mode=mode)
+
+
+def read_records(path=None):
+    """Return the lock records of the stats file, the session one by default
+
+    :rtype: list of dict
+    """
+    if path is None:
+        path = get_session_path()
+    records = []
+    if path is None or not os.path.exists(path):
+        return records
+    with open(path, 'r') as stats_file:
+        for line in stats_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # a record partially written by a killed worker
+                logger.warning('skipping lock stats line: {0}'.format(line))
+    return records
+
+
+LockContention = collections.namedtuple(
+    'LockContention',
+    ['kind', 'key', 'count', 'failed', 'pids', 'wait', 'max_wait', 'hold']
+)
+
+
+def get_contentions(records):
+    """Return the contention of each lock of records, the most waited for
+    first
+
+    :rtype: list of LockContention
+    """
+    stats = collections.OrderedDict()
+    for lock_record in records:
+        lock_id = (lock_record['kind'], lock_record['key'])
+        stat = stats.setdefault(lock_id, dict(
+            count=0, failed=0, pids=set(), wait=0, max_wait=0, hold=0))
+        stat['count'] += 1
+        if not lock_record.get('acquired', True):
+            stat['failed'] += 1
+        stat['pids'].add(lock_record['pid'])
+        stat['wait'] += lock_record['wait']
+        stat['max_wait'] = max(stat['max_wait'], lock_record['wait'])
+        stat['hold'] += lock_record.get('hold', 0)
+    contentions = [
+        LockContention(kind, key, stat['count'], stat['failed'],
+                       len(stat['pids']), stat['wait'], stat['max_wait'],
+                       stat['hold'])
+        for (kind, key), stat in stats.items()
+    ]
+    contentions.sort(key=lambda contention: contention.wait, reverse=True)
+    return contentions
+
+
+def get_report(records=None, top=REPORT_DEFAULT_TOP):
+    """Return the lines of the lock contention report of records, the session
+    ones by default
+
+    :param list records: the lock records
+    :param int top: the number of most contended locks to list
+    :rtype: list of str
+    """
+    if records is None:
+        records = read_records()
+    if not records:
+        return []
+    contentions = get_contentions(records)
+    total_wait = sum(contention.wait for contention in contentions)
+    lines = [
+        'lock stats - {0} locks acquired {1} times - {2:.2f} worker-seconds '
+        'lost waiting'.format(
+            len(contentions), len(records), total_wait),
+    ]
+    for contention in contentions[:top]:
+        lines.append(
+            '{0.kind} {0.key}: {0.count} times by {0.pids} processes'
+            ' - waited {0.wait:.2f}s (max {0.max_wait:.2f}s)'
+            ' - held {0.hold:.2f}s - failed {0.failed}'.format(contention)
+        )
+    return lines
@@ -0,0 +1,218 @@
+# -*- encoding: utf-8 -*-
+"""Cache of the objects created by the factories decorated with
+:func:`robottelo.decorators.cacheable`.
+
+Objects are cached per factory, options and server hostname. The cache keeps
+at most ``object_cache_size`` objects, evicting the least recently used
+ones, each for ``object_cache_ttl`` seconds if it is not 0, as configured in
+the ``[robottelo]`` section.
+
+When ``object_cache_storage`` is set to ``file`` or ``redis`` the objects are
+also written to the matching shared function storage, so the processes
+sharing it, like pytest-xdist workers, reuse the objects created by each
+other. Objects stored that way must be json compatible.
+"""
+import collections
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import six
+
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_SIZE = 128
+
+
+class ObjectCache(object):
+    """Thread safe LRU cache of the objects created by cached factories.
+
+    :param int max_size: The maximum number of objects kept in the process,
+        ``object_cache_size`` by default.
+    :param int ttl: The number of seconds an object is kept, 0 keeping it
+        for the whole session, ``object_cache_ttl`` by default.
+    :param storage: The name of the shared function storage handler, ``file``
+        or ``redis``, also keeping the objects, or a storage handler
+        instance. ``object_cache_storage`` by default, objects are only kept
+        in the process if it is empty.
+    """
+
+    def __init__(self, max_size=None, ttl=None, storage=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._storage = storage
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.reset_stats()
+
+    @property
+    def max_size(self):
+        """The maximum number of objects kept in the process."""
+        if self._max_size is not None:
+            return self._max_size
+        return settings.object_cache_size or _DEFAULT_SIZE
+
+    @property
+    def ttl(self):
+        """The number of seconds an object is kept, 0 for no expiration."""
+        if self._ttl is not None:
+            return self._ttl
+        return settings.object_cache_ttl or 0
+
+    @property
+    def storage(self):
+        """The shared function storage handler keeping the objects, if any."""
+        storage = self._storage
+        if storage is None:
+            storage = settings.object_cache_storage
+        if not storage or not isinstance(storage, six.string_types):
+            return storage or None
+        # imported here as the shared function module imports this package
+        from robottelo.decorators.func_shared.shared import _storage_handlers
+        if storage not in _storage_handlers:
+            raise ValueError(
+                'object cache storage "{0}" is not one of {1}'.format(
+                    storage, sorted(_storage_handlers)))
+        self._storage = _storage_handlers[storage]()
+        return self._storage
+
+    @staticmethod
+    def make_key(name, options=None, hostname=None):
+        """Return the cache key of the object created by the ``name`` factory
+        with ``options`` on the ``hostname`` server.
+        """
+        normalized = json.dumps(options or {}, sort_keys=True, default=str)
+        digest = hashlib.md5(
+            u'{0}\n{1}'.format(hostname, normalized).encode('utf-8')
+        ).hexdigest()
+        return 'object_cache.{0}.{1}'.format(name, digest)
+
+    def _expired(self, created):
+        """Whether an object created at ``created`` has expired."""
+        return bool(self.ttl) and created + self.ttl < time.time()
+
+    def _store_local(self, key, entry):
+        """Keep an entry in the process, must be called with the lock held."""
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > max(self.max_size, 1):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_shared(self, key):
+        """Return the ``(created, value)`` entry of the storage, if any."""
+        storage = self.storage
+        if storage is None:
+            return None
+        with storage.lock(key) as lock_data:
+            storage.when_lock_acquired(lock_data)
+            value = storage.get(key)
+        if not value:
+            return None
+        return value['created'], value['value']
+
+    def _set_shared(self, key, value):
+        """Write the ``value`` entry to the storage, if any."""
+        storage = self.storage
+        if storage is None:
+            return
+        try:
+            with storage.lock(key) as lock_data:
+                storage.when_lock_acquired(lock_data)
+                storage.set(key, value)
+        except (TypeError, ValueError):
+            logger.warning(
+                'object %s is not json compatible, not sharing it', key)
+
+    def get(self, key, validate=None):
+        """Return a ``(found, object)`` tuple for ``key``.
+
+        :param validate: Called with the cached object, returns whether it is
+            still usable, for example whether it still exists on the server.
+            The object is dropped from the cache if it returns ``False``.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    self.expirations += 1
+                    entry = None
+                else:
+                    self._entries[key] = entry
+        if entry is None:
+            entry = self._get_shared(key)
+            if entry is not None and self._expired(entry[0]):
+                entry = None
+            if entry is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store_local(key, entry)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return False, None
+        if validate is not None and not validate(entry[1]):
+            logger.debug('cached object %s is not valid anymore', key)
+            self.invalidate(key)
+            with self._lock:
+                self.invalidations += 1
+                self.misses += 1
+            return False, None
+        with self._lock:
+            self.hits += 1
+        return True, entry[1]
+
+    def set(self, key, value):
+        """Cache ``value`` under ``key``."""
+        entry = (time.time(), value)
+        with self._lock:
+            self._store_local(key, entry)
+        self._set_shared(key, {'created': entry[0], 'value': value})
+
+    def invalidate(self, key):
+        """Drop the object cached under ``key``."""
+        with self._lock:
+            self._entries.pop(key, None)
+        self._set_shared(key, None)
+
+    def clear(self):
+        """Drop all the objects kept in the process."""
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        """Reset the cache statistics counters."""
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_stats(self):
+        """Return a dictionary with the cache statistics.
+
+        ``hits`` count the objects found, including the ``shared_hits``
+        found in the storage, and ``invalidations`` the objects found which
+        were not valid anymore.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hits': self.hits,
+                'invalidations': self.invalidations,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+            }
+
+    def log_stats(self):
+        """Log the cache statistics if the cache was used."""
+        stats = self.get_stats()
+        if stats['hits'] or stats['misses']:
+            logger.info('object cache statistics: %s', stats)
@@ -0,0 +1,380 @@
+# -*- encoding: utf-8 -*-
+"""Pools of pre-built entities for expensive fixtures.
+
+Setting up an organization with a manifest, a synchronized repository and a
+published content view takes minutes. An :class:`EntityPool` keeps a number
+of such environments built from a template function ready in the shared
+function storage, so a test class can lease one instead of building it::
+
+    from robottelo.entity_pool import CUSTOM_REPO_ORG
+
+    @pytest.mark.entity_pool('custom_repo_org')
+    class MyTestCase(CLITestCase):
+
+        @classmethod
+        def setUpClass(cls):
+            super(MyTestCase, cls).setUpClass()
+            cls.lease = CUSTOM_REPO_ORG.lease()
+            cls.org_id = cls.lease['data']['organization-id']
+
+        @classmethod
+        def tearDownClass(cls):
+            CUSTOM_REPO_ORG.release(cls.lease)
+            super(MyTestCase, cls).tearDownClass()
+
+The pools named by the ``entity_pool`` marker of the collected tests are
+filled by an :class:`EntityPoolFiller` process, started once per test
+session by the ``entity_pool_filler`` fixture of
+``tests/foreman/conftest.py`` which drains them at the end of the session,
+and leasing an item from an empty pool builds it in the caller. Leases are
+atomic across the processes sharing the storage, as they are done with the
+storage lock held, see :mod:`robottelo.decorators.func_shared.shared`.
+
+Pools are only used when the shared functions are enabled, otherwise each
+lease builds a new item and each release destroys it. The built data is
+stored as json and must be json compatible.
+"""
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from robottelo import manifests
+from robottelo.cli.factory import make_org, setup_org_for_a_custom_repo
+from robottelo.cli.org import Org
+from robottelo.config import settings
+from robottelo.constants import FAKE_1_YUM_REPO, INTERFACE_CLI
+from robottelo.decorators import setting_is_set
+from robottelo.decorators.func_shared.shared import (
+    SHARE_DEFAULT_TIMEOUT,
+    _get_default_scope,
+    _get_default_storage_handler,
+    is_shared_function_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+#: The pools created, keyed by name
+POOLS = {}
+
+_DEFAULT_POOL_SIZE = 2
+_DEFAULT_FILL_INTERVAL = 30
+_BUILD_TIMEOUT = 3600
+
+
+class EntityPoolError(Exception):
+    """Indicates an error occurred while using an entity pool."""
+
+
+def _get_pool_setting(name, default):
+    """Return a ``[shared_function]`` pool setting."""
+    if setting_is_set('shared_function'):
+        value = getattr(settings.shared_function, name)
+        if value is not None:
+            return value
+    return default
+
+
+class EntityPool(object):
+    """A pool of items built by a template function, kept in the shared
+    function storage.
+
+    :param str name: The pool name, unique in the process.
+    :param build: Function returning the json compatible data of a new item.
+    :param destroy: Function called with the data of an item which is not
+        used anymore, to delete its entities.
+    :param int size: The number of ready items kept in the pool,
+        ``pool_size`` from the ``[shared_function]`` section by default.
+    :param int max_age: Ready items older than that number of seconds are
+        destroyed instead of being leased, ``share_timeout`` from the
+        ``[shared_function]`` section by default.
+    :param storage_handler: The storage of the pool, the shared function
+        storage by default.
+    :param scope: The namespace of the pool in the storage, a string or a
+        callable returning it, the shared function default scope by default.
+    """
+
+    def __init__(self, name, build, destroy=None, size=None, max_age=None,
+                 storage_handler=None, scope=None):
+        if name in POOLS:
+            raise EntityPoolError(
+                'entity pool "{0}" already exists'.format(name))
+        self.name = name
+        self.build = build
+        self.destroy = destroy
+        self._size = size
+        self._max_age = max_age
+        self._storage = storage_handler
+        self._scope = scope
+        POOLS[name] = self
+
+    @property
+    def size(self):
+        """The number of ready items kept in the pool."""
+        if self._size is not None:
+            return self._size
+        return _get_pool_setting('pool_size', _DEFAULT_POOL_SIZE)
+
+    @property
+    def max_age(self):
+        """The age in seconds after which a ready item is not leased."""
+        if self._max_age is not None:
+            return self._max_age
+        return _get_pool_setting('share_timeout', SHARE_DEFAULT_TIMEOUT)
+
+    @property
+    def enabled(self):
+        """Whether the items are kept in the storage."""
+        return self._storage is not None or is_shared_function_enabled()
+
+    @property
+    def storage(self):
+        """The storage handler of the pool."""
+        if self._storage is None:
+            self._storage = _get_default_storage_handler()
+        return self._storage
+
+    @property
+    def scope(self):
+        """The namespace of the pool in the storage."""
+        scope = self._scope or _get_default_scope
+        if callable(scope):
+            scope = scope()
+        return scope
+
+    @property
+    def key(self):
+        """The storage key of the pool state."""
+        return '.'.join(part for part in (self.scope, 'entity_pool', self.name)
+                        if part)
+
+    def _update_state(self, update):
+        """Call ``update`` with the pool state, with the storage lock held,
+        and store the state it modified.
+
+        The state is a dict holding the ``ready`` items, the ``leased`` items
+        keyed by id and the ``building`` reservations, mapping an id to the
+        time the build started.
+        """
+        with self.storage.lock(self.key) as lock_data:
+            self.storage.when_lock_acquired(lock_data)
+            state = self.storage.get(self.key) or {
+                'ready': [], 'leased': {}, 'building': {}}
+            result = update(state)
+            self.storage.set(self.key, state)
+        return result
+
+    def _build_item(self):
+        """Build a new item."""
+        start = time.time()
+        data = self.build()
+        logger.info('entity pool %s built an item in %.1fs',
+                    self.name, time.time() - start)
+        return {'id': uuid.uuid4().hex, 'data': data, 'created': time.time()}
+
+    def _destroy_item(self, item):
+        """Destroy an item, logging the errors as destroying is a cleanup."""
+        if self.destroy is None:
+            return
+        try:
+            self.destroy(item['data'])
+        except Exception:
+            logger.exception(
+                'entity pool %s failed to destroy item %s',
+                self.name, item['id'])
+
+    def lease(self):
+        """Take a ready item from the pool, building one if it is empty.
+
+        :return: The item, a dict holding its ``id`` and its ``data``, to be
+            passed to :meth:`release` once the caller does not use it
+            anymore.
+        :rtype: dict
+        """
+        if not self.enabled:
+            return self._build_item()
+        expired = []
+
+        def take(state):
+            now = time.time()
+            while state['ready']:
+                item = state['ready'].pop(0)
+                if now - item['created'] >= self.max_age:
+                    expired.append(item)
+                    continue
+                item['leased'] = now
+                item['pid'] = os.getpid()
+                state['leased'][item['id']] = item
+                return item
+
+        item = self._update_state(take)
+        for expired_item in expired:
+            self._destroy_item(expired_item)
+        if item is None:
+            logger.info(
+                'entity pool %s is empty, building an item', self.name)
+            item = self._build_item()
+        return item
+
+    def release(self, item, reuse=False):
+        """Give back a leased item.
+
+        :param dict item: An item returned by :meth:`lease`.
+        :param bool reuse: Put the item back in the pool, for callers which
+            did not modify its entities. It is destroyed if the pool is
+            already full.
+        """
+        reused = False
+        if self.enabled:
+            def give_back(state):
+                state['leased'].pop(item['id'], None)
+                if reuse and len(state['ready']) < self.size:
+                    state['ready'].append({
+                        key: value for key, value in item.items()
+                        if key not in ('leased', 'pid')
+                    })
+                    return True
+                return False
+            reused = self._update_state(give_back)
+        if not reused:
+            self._destroy_item(item)
+
+    def fill(self):
+        """Build the items missing for the pool to hold :attr:`size` ready
+        items.
+
+        The builds are reserved in the storage, so fillers running at the
+        same time do not build more items than needed.
+
+        :return: The number of items built.
+        :rtype: int
+        """
+        if not self.enabled:
+            return 0
+
+        def reserve(state):
+            now = time.time()
+            for reservation, start in list(state['building'].items()):
+                if now - start > _BUILD_TIMEOUT:
+                    del state['building'][reservation]
+            missing = (
+                self.size - len(state['ready']) - len(state['building']))
+            reservations = [uuid.uuid4().hex for _ in range(missing)]
+            for reservation in reservations:
+                state['building'][reservation] = now
+            return reservations
+
+        built = 0
+        for reservation in self._update_state(reserve):
+            try:
+                item = self._build_item()
+            except Exception:
+                logger.exception(
+                    'entity pool %s failed to build an item', self.name)
+                item = None
+
+            def add(state):
+                state['building'].pop(reservation, None)
+                if item is not None:
+                    state['ready'].append(item)
+            self._update_state(add)
+            if item is not None:
+                built += 1
+        return built
+
+    def drain(self):
+        """Destroy all the ready items of the pool.
+
+        :return: The number of items destroyed.
+        :rtype: int
+        """
+        if not self.enabled:
+            return 0
+
+        def take_all(state):
+            ready, state['ready'] = state['ready'], []
+            return ready
+
+        ready = self._update_state(take_all)
+        for item in ready:
+            self._destroy_item(item)
+        return len(ready)
+
+
+class EntityPoolFiller(multiprocessing.Process):
+    """Process filling entity pools until it is stopped.
+
+    The scopes of the pools are resolved when the filler is created, as the
+    default scope depends on the parent process id, so that the filler
+    process fills the pools the starting process leases from.
+
+    :param pools: The names of the pools to fill, all the pools by default.
+    :param int interval: The number of seconds to wait between two fills,
+        ``pool_fill_interval`` from the ``[shared_function]`` section by
+        default.
+    """
+
+    def __init__(self, pools=None, interval=None):
+        super(EntityPoolFiller, self).__init__(name='entity-pool-filler')
+        self.daemon = True
+        self.pool_names = list(pools or POOLS)
+        self.pool_scopes = {
+            name: POOLS[name].scope for name in self.pool_names}
+        if interval is None:
+            interval = _get_pool_setting(
+                'pool_fill_interval', _DEFAULT_FILL_INTERVAL)
+        self.interval = interval
+        self._stop_event = multiprocessing.Event()
+
+    def run(self):
+        pools = [POOLS[name] for name in self.pool_names]
+        for pool in pools:
+            pool._scope = self.pool_scopes[pool.name]
+        while not self._stop_event.is_set():
+            for pool in pools:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    pool.fill()
+                except Exception:
+                    logger.exception('filling entity pool %s failed',
+                                     pool.name)
+            self._stop_event.wait(self.interval)
+
+    def stop(self, timeout=None):
+        """Ask the process to stop once its current build finished, and wait
+        for it.
+        """
+        self._stop_event.set()
+        self.join(timeout)
+
+
+def _build_org_with_manifest():
+    """Create an organization with a cloned manifest uploaded."""
+    org = make_org()
+    manifests.upload_manifest_locked(
+        org['id'], manifests.clone(), interface=INTERFACE_CLI)
+    return {'organization-id': org['id']}
+
+
+def _build_custom_repo_org():
+    """Create an organization with a synchronized custom repository, its
+    content view published and promoted and an activation key.
+    """
+    return setup_org_for_a_custom_repo({'url': FAKE_1_YUM_REPO})
+
+
+def _delete_org(data):
+    """Delete the organization of a pool item."""
+    Org.delete({'id': data['organization-id']})
+
+
+#: Organizations with a manifest uploaded
+ORG_WITH_MANIFEST = EntityPool(
+    'org_with_manifest', _build_org_with_manifest, _delete_org)
+
+#: Organizations set up by
+#: :func:`robottelo.cli.factory.setup_org_for_a_custom_repo`
+CUSTOM_REPO_ORG = EntityPool(
+    'custom_repo_org', _build_custom_repo_org, _delete_org)
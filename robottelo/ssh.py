@@ -1,14 +1,20 @@
 """Utility module to handle the shared ssh connection."""
+import atexit
 import base64
+import codecs
+import collections
 import logging
 import os
 import re
+import threading
 import time
+import uuid
 
 import paramiko
 import six
 
 from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 from robottelo.cli import hammer
 from robottelo.config import settings
 
@@ -84,9 +90,13 @@ def _call_paramiko_sshclient():  # pragma: no cover
     return SSHClient()
 
 
-def get_client(hostname=None, username=None, password=None,
-               key_filename=None, timeout=None):
-    """Returns a SSH client connected to given hostname"""
+def _get_connection_args(hostname=None, username=None, password=None,
+                         key_filename=None):
+    """Fill the connection arguments not provided with the server
+    configuration.
+
+    :return: A ``(hostname, username, password, key_filename)`` tuple.
+    """
     if hostname is None:
         hostname = settings.server.hostname
     if username is None:
@@ -95,6 +105,14 @@ def get_client(hostname=None, username=None, password=None,
         key_filename = settings.server.ssh_key
     if password is None:
         password = settings.server.ssh_password
+    return hostname, username, password, key_filename
+
+
+def get_client(hostname=None, username=None, password=None,
+               key_filename=None, timeout=None):
+    """Returns a SSH client connected to given hostname"""
+    hostname, username, password, key_filename = _get_connection_args(
+        hostname, username, password, key_filename)
     if timeout is None:
         timeout = settings.ssh_client.connection_timeout
     client = _call_paramiko_sshclient()
@@ -110,6 +128,167 @@ def get_client(hostname=None, username=None, password=None,
     return client
 
 
+def _is_client_alive(client):
+    """Check whether the transport of a connected client is still usable."""
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+class SSHConnectionPool(object):
+    """Thread safe pool of authenticated SSH clients.
+
+    Clients are keyed by ``(hostname, username, password, key_filename)`` and
+    are checked out exclusively, so two threads never share the same client
+    at the same time. Clients idle for more than ``max_idle`` seconds or whose
+    transport is no longer active are closed and replaced by a fresh
+    connection on the next checkout.
+
+    :param int max_idle: Seconds an idle client is kept open.
+    :param int keepalive: Interval in seconds between keepalive packets sent
+        on the pooled transports. ``0`` or ``None`` disables keepalive.
+    """
+
+    def __init__(self, max_idle=300, keepalive=30):
+        self.max_idle = max_idle
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+        self._stats = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the pool counters."""
+        with self._lock:
+            self._stats = {
+                'hits': 0,
+                'misses': 0,
+                'handshakes': 0,
+                'handshake_time': 0.0,
+                'evictions': 0,
+                'discarded': 0,
+            }
+
+    def get_stats(self):
+        """Return a copy of the pool counters.
+
+        :return: A dict with ``hits``, ``misses``, ``handshakes``,
+            ``handshake_time`` (seconds), ``evictions`` and ``discarded``.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _check_pid(self):
+        """Forget connections inherited from a parent process.
+
+        Must be called with the lock held. A forked worker must not write to
+        the sockets of its parent, so the inherited clients are dropped
+        without being closed.
+        """
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._pid = os.getpid()
+
+    def acquire(self, hostname, username, password, key_filename,
+                timeout=None):
+        """Check out a connected client, reusing an idle one if possible.
+
+        :return: A connected ``SSHClient``.
+        """
+        key = (hostname, username, password, key_filename)
+        client = None
+        stale = []
+        now = time.time()
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if (now - last_used > self.max_idle or
+                        not _is_client_alive(candidate)):
+                    self._stats['evictions'] += 1
+                    stale.append(candidate)
+                else:
+                    self._stats['hits'] += 1
+                    client = candidate
+                    break
+            else:
+                self._stats['misses'] += 1
+        for candidate in stale:
+            candidate.close()
+            logger.debug('Evicted Paramiko client {0}'.format(candidate._id))
+        if client is None:
+            start = time.time()
+            client = get_client(
+                hostname, username, password, key_filename, timeout)
+            elapsed = time.time() - start
+            if self.keepalive:
+                client.get_transport().set_keepalive(self.keepalive)
+            with self._lock:
+                self._stats['handshakes'] += 1
+                self._stats['handshake_time'] += elapsed
+            logger.debug('Instantiated pooled Paramiko client {0} in {1:.3f}s'
+                         .format(client._id, elapsed))
+        client._pool_key = key
+        return client
+
+    def release(self, client, discard=False):
+        """Return a checked out client to the pool.
+
+        :param client: A client returned by :meth:`acquire`.
+        :param bool discard: Close the client instead of keeping it, used
+            when the client failed in a way that may have left it unusable.
+        """
+        with self._lock:
+            if discard or self._pid != os.getpid():
+                self._stats['discarded'] += 1
+            else:
+                self._idle.setdefault(client._pool_key, []).append(
+                    (client, time.time()))
+                return
+        client.close()
+        logger.debug('Destroyed pooled Paramiko client {0}'.format(client._id))
+
+    def close_all(self):
+        """Close all the idle clients of the pool."""
+        with self._lock:
+            self._check_pid()
+            idle, self._idle = self._idle, {}
+        for clients in idle.values():
+            for client, _ in clients:
+                client.close()
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """Return the process wide :class:`SSHConnectionPool`, creating it from
+    the ``ssh_client`` settings on the first call.
+    """
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = SSHConnectionPool(
+                max_idle=settings.ssh_client.pool_max_idle,
+                keepalive=settings.ssh_client.pool_keepalive,
+            )
+        return _connection_pool
+
+
+def close_connection_pool():
+    """Close every idle pooled connection and drop the process wide pool."""
+    global _connection_pool
+    with _connection_pool_lock:
+        pool, _connection_pool = _connection_pool, None
+    if pool is not None:
+        pool.close_all()
+
+
+atexit.register(close_connection_pool)
+
+
 @contextmanager
 def get_connection(hostname=None, username=None, password=None,
                    key_filename=None, timeout=None):
@@ -156,6 +335,49 @@ def get_connection(hostname=None, username=None, password=None,
         logger.debug('Destroyed Paramiko client {0}'.format(client._id))
 
 
+@contextmanager
+def get_pooled_connection(hostname=None, username=None, password=None,
+                          key_filename=None, timeout=None):
+    """Yield an ssh connection checked out from the process connection pool.
+
+    Accepts the same arguments as :func:`get_connection`, but the connection
+    is returned to the pool instead of being closed when the caller is done.
+    A connection that raised any error while in use is closed instead, so
+    the next checkout reconnects::
+
+        with get_pooled_connection() as connection:
+            ...
+
+    :return: An SSH connection.
+    :rtype: ``paramiko.SSHClient``
+    """
+    if timeout is None:
+        timeout = settings.ssh_client.connection_timeout
+    pool = get_connection_pool()
+    client = pool.acquire(
+        *_get_connection_args(hostname, username, password, key_filename),
+        timeout=timeout
+    )
+    try:
+        yield client
+    except Exception:
+        pool.release(client, discard=True)
+        raise
+    else:
+        pool.release(client)
+
+
+def _get_command_connection(hostname=None, username=None, password=None,
+                            key_filename=None, timeout=None):
+    """Return a pooled connection context manager when the ``ssh_client``
+    ``connection_pool`` setting is enabled, otherwise a one-shot one.
+    """
+    if settings.ssh_client.connection_pool:
+        return get_pooled_connection(
+            hostname, username, password, key_filename, timeout)
+    return get_connection(hostname, username, password, key_filename, timeout)
+
+
 def add_authorized_key(key, hostname=None, username=None, password=None,
                        key_filename=None, timeout=None):
     """Appends a local public ssh key to remote authorized keys
@@ -197,24 +419,20 @@ def add_authorized_key(key, hostname=None, username=None, password=None,
     with get_connection(hostname=hostname, username=username,
                         password=password, key_filename=key_filename,
                         timeout=timeout) as con:
-
-        # ensure ssh directory exists
-        execute_command('mkdir -p %s' % ssh_path, con)
-
-        # append the key if doesn't exists
-        add_key = "grep -q '{key}' {dest} || echo '{key}' >> {dest}".format(
-            key=key_content, dest=auth_file)
-        execute_command(add_key, con)
-
-        # set proper permissions
-        execute_command('chmod 700 %s' % ssh_path, con)
-        execute_command('chmod 600 %s' % auth_file, con)
         ssh_user = username or settings.server.ssh_username
-        execute_command('chown -R %s %s' % (ssh_user, ssh_path), con)
-
-        # Restore SELinux context with restorecon, if it's available:
-        cmd = 'command -v restorecon && restorecon -RvF %s || true' % ssh_path
-        execute_command(cmd, con)
+        execute_batch([
+            # ensure ssh directory exists
+            'mkdir -p %s' % ssh_path,
+            # append the key if doesn't exists
+            "grep -q '{key}' {dest} || echo '{key}' >> {dest}".format(
+                key=key_content, dest=auth_file),
+            # set proper permissions
+            'chmod 700 %s' % ssh_path,
+            'chmod 600 %s' % auth_file,
+            'chown -R %s %s' % (ssh_user, ssh_path),
+            # Restore SELinux context with restorecon, if it's available:
+            'command -v restorecon && restorecon -RvF %s || true' % ssh_path,
+        ], con)
 
 
 def upload_file(local_file, remote_file, hostname=None):
@@ -226,7 +444,8 @@ def upload_file(local_file, remote_file, hostname=None):
     :param hostname: target machine hostname. If not provided will be used the
         ``server.hostname`` from the configuration.
     """
-    with get_connection(hostname=hostname) as connection:  # pragma: no cover
+    with _get_command_connection(
+            hostname=hostname) as connection:  # pragma: no cover
         try:
             sftp = connection.open_sftp()
             # Check if local_file is a file-like object and use the proper
@@ -246,7 +465,8 @@ def download_file(remote_file, local_file=None, hostname=None):
     """
     if local_file is None:  # pragma: no cover
         local_file = remote_file
-    with get_connection(hostname=hostname) as connection:  # pragma: no cover
+    with _get_command_connection(
+            hostname=hostname) as connection:  # pragma: no cover
         try:
             sftp = connection.open_sftp()
             sftp.get(remote_file, local_file)
@@ -256,7 +476,8 @@ def download_file(remote_file, local_file=None, hostname=None):
 
 def command(cmd, hostname=None, output_format=None, username=None,
             password=None, key_filename=None, timeout=None,
-            connection_timeout=None):
+            connection_timeout=None, stdout_callback=None,
+            stderr_callback=None, keep_output=True):
     """Executes SSH command(s) on remote hostname.
 
     :param str cmd: The command to run
@@ -274,28 +495,194 @@ def command(cmd, hostname=None, output_format=None, username=None,
         configuration's ``server`` section will be used.
     :param int timeout: Time to wait for the ssh command to finish.
     :param connection_timeout: Time to wait for establishing the connection.
+    :param stdout_callback: Callable receiving each ``stdout`` line as soon as
+        it is read, see :func:`execute_command`.
+    :param stderr_callback: Callable receiving each ``stderr`` line as soon as
+        it is read, see :func:`execute_command`.
+    :param bool keep_output: Whether the result holds the whole output or only
+        its last lines, see :func:`execute_command`.
     """
     hostname = hostname or settings.server.hostname
     if timeout is None:
         timeout = settings.ssh_client.command_timeout
     if connection_timeout is None:
         connection_timeout = settings.ssh_client.connection_timeout
-    with get_connection(hostname=hostname, username=username,
-                        password=password, key_filename=key_filename,
-                        timeout=connection_timeout) as connection:
+    with _get_command_connection(
+            hostname=hostname, username=username, password=password,
+            key_filename=key_filename,
+            timeout=connection_timeout) as connection:
         return execute_command(
-            cmd, connection, output_format, timeout, connection_timeout)
+            cmd, connection, output_format, timeout, connection_timeout,
+            stdout_callback=stdout_callback, stderr_callback=stderr_callback,
+            keep_output=keep_output)
+
+
+#: Escape codes for colors displayed in the output
+_COLOR_CODES_REGEX = re.compile(r'\x1b\[\d\d?m')
+#: Maximum number of bytes read from a channel at once
+_STREAM_CHUNK_SIZE = 32768
+#: Maximum time to wait for new data on an idle channel, in seconds
+_STREAM_WAIT_INTERVAL = 0.1
+#: Number of last lines kept of a stream not kept in whole, for error messages
+_STREAM_TAIL_LINES = 100
+
+
+class _LineReader(object):
+    """Incrementally decode a channel stream and split it in lines.
+
+    Every complete line is passed through ``process``, which returns the line
+    to keep or ``None`` to drop it, then stored and passed to ``callback``.
+    The last, possibly empty, line is emitted by :meth:`close`, so the stored
+    lines match the ``split`` by new lines of the whole decoded stream.
+
+    When ``max_lines`` is given only the last ``max_lines`` lines are stored,
+    the stream being consumed by ``callback``.
+    """
+
+    def __init__(self, process=None, callback=None, keep_raw=False,
+                 max_lines=None):
+        self.process = process
+        self.callback = callback
+        self.lines = collections.deque(maxlen=max_lines)
+        self.raw_lines = (
+            collections.deque(maxlen=max_lines) if keep_raw else None)
+        self.received = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._pending = u''
+
+    def feed(self, data):
+        """Consume a chunk of bytes read from the channel."""
+        if not data:
+            return
+        self.received = True
+        lines = (self._pending + self._decoder.decode(data)).split(u'\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self._emit(line)
+
+    def close(self):
+        """Flush the decoder and emit the last line."""
+        if self.received:
+            self._emit(self._pending + self._decoder.decode(b'', final=True))
+            self._pending = u''
+
+    def _emit(self, line):
+        if self.raw_lines is not None:
+            self.raw_lines.append(line)
+        if self.process is not None:
+            line = self.process(line)
+            if line is None:
+                return
+        self.lines.append(line)
+        if self.callback is not None:
+            self.callback(line)
+
+    @property
+    def text(self):
+        """The processed lines joined back in a single string."""
+        return u'\n'.join(self.lines)
+
+    @property
+    def raw_text(self):
+        """The unprocessed lines joined back in a single string."""
+        return u'\n'.join(
+            self.raw_lines if self.raw_lines is not None else self.lines)
+
+
+def _strip_color_codes(line):
+    """Remove the color codes from a line."""
+    return _COLOR_CODES_REGEX.sub('', line)
+
+
+def _filter_hammer_line(line):
+    """Prepare a line of a hammer command output.
+
+    For output we don't really want to see all of Rails traffic information,
+    so strip it out. Empty fields are returned as "" which gives us u'""'.
+    """
+    line = line.replace('""', '')
+    if line.startswith('['):
+        return None
+    return _COLOR_CODES_REGEX.sub('', line)
+
+
+def build_command_result(stdout, stderr, return_code, output_format=None):
+    """Build the ``SSHCommandResult`` of a command from its whole decoded
+    output, processing it like :func:`execute_command` does.
+
+    :param str stdout: The command ``stdout``.
+    :param str stderr: The command ``stderr``.
+    :param int return_code: The command return code.
+    :param output_format: plain|json|csv|list valid only for hammer commands
+    :return: SSHCommandResult
+    """
+    if stdout and output_format not in ('json', 'plain'):
+        stdout = [
+            line for line in (
+                _filter_hammer_line(line) for line in stdout.split(u'\n'))
+            if line is not None
+        ]
+    if stderr:
+        stderr = _strip_color_codes(stderr)
+    return SSHCommandResult(stdout, stderr, return_code, output_format)
+
+
+def _read_channel(channel, stdout_reader, stderr_reader, end_time=None):
+    """Drain ``stdout`` and ``stderr`` of a channel until both are closed.
+
+    Reading both streams while the command runs keeps the channel window
+    open, so commands with a large output never stall waiting for the
+    reader. The output is complete once the channel received its end of
+    file or the command exit status, or was closed without them.
+
+    :return: ``False`` if ``end_time`` was reached first, ``True`` otherwise.
+    """
+    while True:
+        while channel.recv_ready():
+            stdout_reader.feed(channel.recv(_STREAM_CHUNK_SIZE))
+        while channel.recv_stderr_ready():
+            stderr_reader.feed(channel.recv_stderr(_STREAM_CHUNK_SIZE))
+        if (channel.eof_received or channel.closed or
+                channel.status_event.is_set()) and not (
+                    channel.recv_ready() or channel.recv_stderr_ready()):
+            return True
+        wait = _STREAM_WAIT_INTERVAL
+        if end_time is not None:
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            wait = min(wait, remaining)
+        channel.status_event.wait(wait)
 
 
 def execute_command(cmd, connection, output_format=None, timeout=None,
-                    connection_timeout=None):
+                    connection_timeout=None, stdout_callback=None,
+                    stderr_callback=None, keep_output=True):
     """Execute a command via ssh in the given connection
 
+    ``stdout`` and ``stderr`` are read while the command runs. Each line can
+    be consumed as soon as it arrives by passing callbacks, which receive the
+    lines as they are stored in the returned ``SSHCommandResult``: color codes
+    removed, and for hammer output formats the Rails lines filtered out::
+
+        execute_command(
+            'tail -n 1000 /var/log/messages', connection,
+            stdout_callback=lambda line: logger.debug(line)
+        )
+
+    When the callbacks consume the whole output, ``keep_output=False`` keeps
+    only the last ``_STREAM_TAIL_LINES`` lines of each stream in memory, the
+    returned ``SSHCommandResult`` holding them for the error messages.
+
     :param cmd: a command to be executed via ssh
     :param connection: SSH Paramiko client connection
     :param output_format: plain|json|csv|list valid only for hammer commands
     :param timeout: Time to wait for the ssh command to finish.
     :param connection_timeout: Time to wait for establishing the connection.
+    :param stdout_callback: Callable called with each ``stdout`` line.
+    :param stderr_callback: Callable called with each ``stderr`` line.
+    :param bool keep_output: Whether the result holds the whole output or only
+        its last lines.
     :return: SSHCommandResult
     """
     if timeout is None:
@@ -303,54 +690,298 @@ def execute_command(cmd, connection, output_format=None, timeout=None,
     if connection_timeout is None:
         connection_timeout = settings.ssh_client.connection_timeout
     logger.info('>>> %s', cmd)
-    _, stdout, stderr = connection.exec_command(
+    end_time = time.time() + timeout if timeout else None
+    _, stdout, _ = connection.exec_command(
         cmd, timeout=connection_timeout)
-    if timeout:
-        # wait for the exit status ready
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            if stdout.channel.exit_status_ready():
-                break
-            time.sleep(1)
-        else:
-            logger.error('ssh command did not respond in the predefined time'
-                         ' (timeout=%s) and will be interrupted', timeout)
-            raise SSHCommandTimeoutError(
-                'ssh command: {0} \n did not respond in the predefined time '
-                '(timeout={1})'.format(cmd, timeout)
-            )
-
-    errorcode = stdout.channel.recv_exit_status()
-
-    stdout = stdout.read()
-    stderr = stderr.read()
-    # Remove escape code for colors displayed in the output
-    regex = re.compile(r'\x1b\[\d\d?m')
-    if stdout:
-        # Convert to unicode string
-        stdout = decode_to_utf8(stdout)
-        logger.info('<<< stdout\n%s', stdout)
-    if stderr:
-        # Convert to unicode string and remove all color codes characters
-        stderr = regex.sub('', decode_to_utf8(stderr))
-        logger.info('<<< stderr\n%s', stderr)
+    channel = stdout.channel
     # we don't want a list as output of 'plain' just pure text
-    if stdout and output_format not in ('json', 'plain'):
-        # Mostly only for hammer commands
-        # for output we don't really want to see all of Rails traffic
-        # information, so strip it out.
-        # Empty fields are returned as "" which gives us u'""'
-        stdout = stdout.replace('""', '')
-        stdout = u''.join(stdout).split('\n')
-        stdout = [
-            regex.sub('', line)
-            for line in stdout
-            if not line.startswith('[')
-        ]
+    hammer_output = output_format not in ('json', 'plain')
+    max_lines = None if keep_output else _STREAM_TAIL_LINES
+    stdout_reader = _LineReader(
+        process=_filter_hammer_line if hammer_output else None,
+        callback=stdout_callback,
+        keep_raw=hammer_output and logger.isEnabledFor(logging.INFO),
+        max_lines=max_lines,
+    )
+    stderr_reader = _LineReader(
+        process=_strip_color_codes, callback=stderr_callback,
+        max_lines=max_lines)
+    # the channel sets its status event as soon as the exit status is
+    # received or the channel is closed
+    if not (_read_channel(channel, stdout_reader, stderr_reader, end_time) and
+            channel.status_event.wait(
+                max(end_time - time.time(), 0) if end_time else None)):
+        logger.error('ssh command did not respond in the predefined time'
+                     ' (timeout=%s) and will be interrupted', timeout)
+        raise SSHCommandTimeoutError(
+            'ssh command: {0} \n did not respond in the predefined time '
+            '(timeout={1})'.format(cmd, timeout)
+        )
+    errorcode = channel.recv_exit_status()
+    stdout_reader.close()
+    stderr_reader.close()
+
+    stdout = stderr = u''
+    if stdout_reader.received:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('<<< stdout\n%s', stdout_reader.raw_text)
+        stdout = (
+            list(stdout_reader.lines) if hammer_output else stdout_reader.text)
+    if stderr_reader.received:
+        stderr = stderr_reader.text
+        logger.info('<<< stderr\n%s', stderr)
     return SSHCommandResult(
         stdout, stderr, errorcode, output_format)
 
 
+def _build_batch_script(commands, token, stop_on_error=False):
+    """Build a shell script running the commands one after the other.
+
+    Every command runs in its own subshell, like it would in its own ssh
+    session, and is followed by a marker line written to both ``stdout`` and
+    ``stderr``. The ``stdout`` marker also holds the command return code.
+    """
+    lines = []
+    for index, cmd in enumerate(commands):
+        if isinstance(cmd, bytes):
+            cmd = cmd.decode('utf-8')
+        lines.extend([
+            u'(\n{0}\n)'.format(cmd),
+            u'__rc=$?',
+            u"printf '\\n{0}:{1}:%d\\n' $__rc".format(token, index),
+            u"printf '\\n{0}:{1}:\\n' >&2".format(token, index),
+        ])
+        if stop_on_error:
+            lines.append(u'[ $__rc -eq 0 ] || exit $__rc')
+    return u'\n'.join(lines)
+
+
+def _split_batch_output(text, token, count):
+    """Split the output of a batch script by its marker lines.
+
+    :return: A list of ``(output, marker_suffix)`` tuples, one for each
+        command which reached its marker.
+    """
+    outputs = []
+    start = 0
+    for index in range(count):
+        marker = u'\n{0}:{1}:'.format(token, index)
+        position = text.find(marker, start)
+        if position == -1:
+            break
+        suffix_start = position + len(marker)
+        line_end = text.find(u'\n', suffix_start)
+        if line_end == -1:
+            line_end = len(text)
+        outputs.append((text[start:position], text[suffix_start:line_end]))
+        start = line_end + 1
+    return outputs
+
+
+def execute_batch(commands, connection, output_format=None, timeout=None,
+                  connection_timeout=None, stop_on_error=False):
+    """Execute several commands via ssh with a single round trip.
+
+    The commands are sent in one remote shell invocation and the output is
+    split back per command, so each one gets its own ``SSHCommandResult``
+    with its return code, ``stdout`` and ``stderr``, as if it was executed by
+    :func:`execute_command`::
+
+        mkdir, chmod = execute_batch(
+            ['mkdir -p ~/.ssh', 'chmod 700 ~/.ssh'], connection)
+
+    Each command runs in a subshell, so ``exit`` or ``cd`` on one command
+    does not affect the next ones.
+
+    :param commands: list of commands to be executed via ssh
+    :param connection: SSH Paramiko client connection
+    :param output_format: plain|json|csv|list valid only for hammer commands
+    :param timeout: Time to wait for all the commands to finish.
+    :param connection_timeout: Time to wait for establishing the connection.
+    :param bool stop_on_error: Do not run the remaining commands after one
+        finishes with a non zero return code.
+    :return: A list with an SSHCommandResult for each command which was run,
+        so it is shorter than ``commands`` when ``stop_on_error`` stopped the
+        batch.
+    """
+    commands = list(commands)
+    token = u'__robottelo_batch_{0}'.format(uuid.uuid4().hex)
+    result = execute_command(
+        _build_batch_script(commands, token, stop_on_error),
+        connection,
+        output_format='plain',
+        timeout=timeout,
+        connection_timeout=connection_timeout,
+    )
+    stdouts = _split_batch_output(result.stdout, token, len(commands))
+    stderrs = _split_batch_output(result.stderr, token, len(commands))
+    return [
+        build_command_result(stdout, stderr, int(return_code), output_format)
+        for (stdout, return_code), (stderr, _) in zip(stdouts, stderrs)
+    ]
+
+
+def command_batch(commands, hostname=None, output_format=None, username=None,
+                  password=None, key_filename=None, timeout=None,
+                  connection_timeout=None, stop_on_error=False):
+    """Executes several SSH commands on remote hostname with a single round
+    trip.
+
+    Accepts the same arguments as :func:`command`, see :func:`execute_batch`
+    for the meaning of ``stop_on_error`` and the returned value.
+    """
+    hostname = hostname or settings.server.hostname
+    if timeout is None:
+        timeout = settings.ssh_client.command_timeout
+    if connection_timeout is None:
+        connection_timeout = settings.ssh_client.connection_timeout
+    with _get_command_connection(
+            hostname=hostname, username=username, password=password,
+            key_filename=key_filename,
+            timeout=connection_timeout) as connection:
+        return execute_batch(
+            commands, connection, output_format, timeout, connection_timeout,
+            stop_on_error=stop_on_error)
+
+
+class SSHMultiHostResult(object):
+    """Results of the commands run on several hosts by :func:`run_on_hosts`.
+
+    All the mappings below are keyed by hostname, in the order the hosts were
+    given.
+
+    :ivar results: List of ``SSHCommandResult`` of every host, one for each
+        command run on it.
+    :ivar errors: Exception raised when connecting to or running the commands
+        on a host. Hosts without errors are not included.
+    :ivar durations: Time in seconds spent on each host.
+    :ivar elapsed: Wall clock time in seconds of the whole fan-out.
+    """
+
+    def __init__(self, hostnames):
+        self.results = collections.OrderedDict(
+            (hostname, []) for hostname in hostnames)
+        self.errors = collections.OrderedDict()
+        self.durations = collections.OrderedDict(
+            (hostname, 0.0) for hostname in hostnames)
+        self.elapsed = 0.0
+
+    @property
+    def failed(self):
+        """Hostnames which raised an error or where any command returned a
+        non zero return code.
+        """
+        return [
+            hostname for hostname, results in self.results.items()
+            if hostname in self.errors or
+            any(result.return_code != 0 for result in results)
+        ]
+
+    @property
+    def succeeded(self):
+        """Hostnames where every command finished with return code zero."""
+        failed = self.failed
+        return [
+            hostname for hostname in self.results if hostname not in failed]
+
+    @property
+    def total_time(self):
+        """Sum of the time spent on every host, in seconds."""
+        return sum(self.durations.values())
+
+    def __repr__(self):
+        return (
+            u'SSHMultiHostResult(succeeded={0!r}, failed={1!r}, '
+            u'elapsed={2:.3f})'.format(
+                self.succeeded, self.failed, self.elapsed)
+        )
+
+
+def run_on_hosts(cmd, hostnames, max_workers=10, output_format=None,
+                 username=None, password=None, key_filename=None,
+                 timeout=None, connection_timeout=None):
+    """Run SSH command(s) on several hosts concurrently.
+
+    Each host runs the commands in order over a single connection, taken from
+    the connection pool if it is enabled, while at most ``max_workers`` hosts
+    are handled at the same time. A failure on a host does not interrupt the
+    others, it is reported in the returned object::
+
+        result = run_on_hosts(
+            ['yum -y install katello-agent', 'systemctl start goferd'],
+            [vm.ip_addr for vm in vms]
+        )
+        if result.failed:
+            raise VirtualMachineError(result.errors)
+
+    :param cmd: The command to run, or a list of commands to run one after
+        the other on every host.
+    :param hostnames: The hostnames of the servers to run the command(s) on.
+    :param int max_workers: Maximum number of hosts handled concurrently.
+    :param str output_format: json, csv or None
+    :param str username: The username to use when connecting, see
+        :func:`command`.
+    :param str password: The password to use when connecting, see
+        :func:`command`.
+    :param str key_filename: The path of the ssh private key to use when
+        connecting, see :func:`command`.
+    :param int timeout: Time to wait for all the commands of a host to
+        finish. The host fails with ``SSHCommandTimeoutError`` when it is
+        exceeded.
+    :param connection_timeout: Time to wait for establishing the connection.
+    :return: SSHMultiHostResult
+    """
+    commands = [cmd] if isinstance(cmd, six.string_types + (bytes,)) else cmd
+    hostnames = list(hostnames)
+    if timeout is None:
+        timeout = settings.ssh_client.command_timeout
+    if connection_timeout is None:
+        connection_timeout = settings.ssh_client.connection_timeout
+    multi_result = SSHMultiHostResult(hostnames)
+    errors_lock = threading.Lock()
+
+    def run_on_host(hostname):
+        """Run the commands on a single host and record its results."""
+        start = time.time()
+        try:
+            with _get_command_connection(
+                    hostname=hostname, username=username, password=password,
+                    key_filename=key_filename,
+                    timeout=connection_timeout) as connection:
+                for host_cmd in commands:
+                    remaining = None
+                    if timeout:
+                        remaining = timeout - (time.time() - start)
+                        if remaining <= 0:
+                            raise SSHCommandTimeoutError(
+                                'ssh command: {0} \n was not started on {1} '
+                                'in the predefined time (timeout={2})'
+                                .format(host_cmd, hostname, timeout)
+                            )
+                    multi_result.results[hostname].append(execute_command(
+                        host_cmd, connection, output_format, remaining,
+                        connection_timeout
+                    ))
+        except Exception as err:
+            logger.error(
+                'Failed to run ssh command on [%s]: %s', hostname, err)
+            with errors_lock:
+                multi_result.errors[hostname] = err
+        finally:
+            multi_result.durations[hostname] = time.time() - start
+
+    start = time.time()
+    if hostnames:
+        pool = ThreadPool(max(1, min(max_workers, len(hostnames))))
+        try:
+            pool.map(run_on_host, hostnames)
+        finally:
+            pool.close()
+            pool.join()
+    multi_result.elapsed = time.time() - start
+    return multi_result
+
+
 def is_ssh_pub_key(key):
     """Validates if a string is in valid ssh pub key format
 
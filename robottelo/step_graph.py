@@ -0,0 +1,188 @@
+# -*- encoding: utf-8 -*-
+"""Run the steps of a setup procedure concurrently as their dependencies
+allow.
+
+A :class:`StepGraph` holds named steps, each one declaring the steps whose
+results it needs. Running the graph starts every step as soon as the steps
+it requires finished, so independent steps, like creating a lifecycle
+environment and a product in the same organization, run at the same time::
+
+    graph = StepGraph('setup')
+
+    @graph.step()
+    def org(results):
+        return make_org()['id']
+
+    @graph.step(requires=['org'])
+    def lce(results):
+        return make_lifecycle_environment(
+            {'organization-id': results['org']})['id']
+
+    @graph.step(requires=['org'])
+    def product(results):
+        return make_product({'organization-id': results['org']})
+
+    results = graph.run()
+
+The time spent in each step is logged once the graph finished and kept in
+:attr:`StepGraph.timings`.
+"""
+import collections
+import logging
+import sys
+import threading
+import time
+
+import six
+from six.moves import queue
+
+logger = logging.getLogger(__name__)
+
+
+class StepGraphError(Exception):
+    """Indicates that the steps of a graph can not be run, because of an
+    unknown or circular dependency.
+    """
+
+
+class StepGraph(object):
+    """Steps of a setup procedure and their dependencies.
+
+    :param str name: The name of the procedure, used in the logs.
+    :param int max_workers: The maximum number of steps run at once, all the
+        ready steps being run if it is ``None``. With 1 the steps are run one
+        after the other in the calling thread.
+    """
+
+    def __init__(self, name, max_workers=None):
+        self.name = name
+        self.max_workers = max_workers
+        self._steps = collections.OrderedDict()
+        #: Results of the finished steps, keyed by step name
+        self.results = {}
+        #: ``(start, duration)`` of the finished steps in seconds, ``start``
+        #: being relative to the start of :meth:`run`
+        self.timings = collections.OrderedDict()
+
+    def add(self, name, function, requires=()):
+        """Add a step to the graph.
+
+        :param str name: The name of the step, its result being stored under
+            that name.
+        :param function: Called with the results of the finished steps when
+            the step runs, its return value being the step result.
+        :param requires: The names of the steps which must finish before this
+            one starts.
+        """
+        if name in self._steps:
+            raise StepGraphError(
+                u'Step {0} is already defined in {1}'.format(name, self.name))
+        self._steps[name] = (function, tuple(requires))
+
+    def step(self, name=None, requires=()):
+        """Decorator adding the decorated function as a step, named after the
+        function by default. See :meth:`add`.
+        """
+        def decorator(function):
+            self.add(name or function.__name__, function, requires)
+            return function
+        return decorator
+
+    def _check(self):
+        """Raise :class:`StepGraphError` if a step requires an unknown step
+        or if the steps depend on each other circularly.
+        """
+        for name, (_, requires) in self._steps.items():
+            unknown = [req for req in requires if req not in self._steps]
+            if unknown:
+                raise StepGraphError(
+                    u'Step {0} of {1} requires unknown steps {2}'.format(
+                        name, self.name, ', '.join(unknown)))
+        done = set()
+        remaining = list(self._steps)
+        while remaining:
+            ready = [
+                name for name in remaining
+                if done.issuperset(self._steps[name][1])
+            ]
+            if not ready:
+                raise StepGraphError(
+                    u'Steps {0} of {1} depend on each other'.format(
+                        ', '.join(remaining), self.name))
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+
+    def run(self):
+        """Run all the steps, each one as soon as the steps it requires
+        finished.
+
+        When a step raises an exception no other step is started and, once
+        the running steps finished, the exception is raised again.
+
+        :return: The results of the steps, keyed by step name.
+        :rtype: dict
+        """
+        self._check()
+        self.results = {}
+        self.timings = collections.OrderedDict()
+        finished = queue.Queue()
+        pending = list(self._steps)
+        running = set()
+        errors = []
+        run_start = time.time()
+
+        def run_step(name, results):
+            """Run a step, reporting its outcome to the scheduler."""
+            function = self._steps[name][0]
+            start = time.time()
+            try:
+                result, exc_info = function(results), None
+            except Exception:
+                result, exc_info = None, sys.exc_info()
+            finished.put((name, result, exc_info, start, time.time()))
+
+        while pending or running:
+            if not errors:
+                for name in list(pending):
+                    if (self.max_workers is not None and
+                            len(running) >= self.max_workers):
+                        break
+                    if all(req in self.results
+                           for req in self._steps[name][1]):
+                        pending.remove(name)
+                        running.add(name)
+                        if self.max_workers == 1:
+                            run_step(name, dict(self.results))
+                        else:
+                            thread = threading.Thread(
+                                target=run_step,
+                                args=(name, dict(self.results)))
+                            thread.daemon = True
+                            thread.start()
+            if not running:
+                break
+            name, result, exc_info, start, end = finished.get()
+            running.remove(name)
+            self.timings[name] = (start - run_start, end - start)
+            if exc_info is None:
+                self.results[name] = result
+            else:
+                errors.append(exc_info)
+        logger.info(
+            u'%s finished in %.2fs\n%s', self.name, time.time() - run_start,
+            self.format_timings()
+        )
+        if errors:
+            six.reraise(*errors[0])
+        return dict(self.results)
+
+    def format_timings(self):
+        """Return the timings of the finished steps, one line per step in
+        the order they finished.
+        """
+        width = max([len(name) for name in self.timings] or [0])
+        return u'\n'.join(
+            u'  {0:<{1}} started at {2:6.2f}s, took {3:6.2f}s'.format(
+                name, width, start, duration)
+            for name, (start, duration) in self.timings.items()
+        )
@@ -441,6 +441,33 @@ class VirtualMachine(object):
 
         return ssh.command(cmd, hostname=self.ip_addr, timeout=timeout)
 
+    def run_batch(self, commands, timeout=None, stop_on_error=False):
+        """Runs several ssh commands on the virtual machine with a single
+        round trip, see :func:`robottelo.ssh.execute_batch`.
+
+        :param list commands: Commands to run on the virtual machine
+        :param int timeout: Time to wait for all the commands to finish
+        :param bool stop_on_error: Do not run the remaining commands after
+            one finishes with a non zero return code.
+        :return: A list of :class:`robottelo.ssh.SSHCommandResult` instances,
+            one for each command which was run.
+        :raises robottelo.vm.VirtualMachineError: If the virtual machine is not
+            created.
+
+        """
+        if not self._created:
+            raise VirtualMachineError(
+                'The virtual machine should be created before running any ssh '
+                'command'
+            )
+
+        return ssh.command_batch(
+            commands,
+            hostname=self.ip_addr,
+            timeout=timeout,
+            stop_on_error=stop_on_error,
+        )
+
     def get(self, remote_path, local_path=None):
         """Get a remote file from the virtual machine."""
         if not self._created:
@@ -494,14 +521,18 @@ class VirtualMachine(object):
         if result.return_code != 0:
             raise VirtualMachineError(
                 'Failed to install the puppet rpm')
-        self.run(
-            'echo "{0}" >> /etc/puppet/puppet.conf'
-            .format(puppet_conf)
+        commands = [
+            u'echo "{0}" >> /etc/puppet/puppet.conf'.format(puppet_conf),
+            # This particular puppet run on client would populate a cert on
+            # sat6 under the capsule --> certifcates or via cli "puppet cert
+            # list", so that we sign it. It fails until the cert is signed.
+            u'puppet agent -t',
+        ]
+        # each command is given the time it would have if run on its own
+        self.run_batch(
+            commands,
+            timeout=settings.ssh_client.command_timeout * len(commands),
         )
-        # This particular puppet run on client would populate a cert on sat6
-        # under the capsule --> certifcates or via cli "puppet cert list", so
-        # that we sign it.
-        self.run(u'puppet agent -t')
         ssh.command(u'puppet cert sign --all')
         # This particular puppet run would create the host entity under
         # 'All Hosts' and let's redirect stderr to /dev/null as errors at this
@@ -567,26 +598,34 @@ class VirtualMachine(object):
         self.run(
             'wget -O /etc/yum.repos.d/insights.repo {0}'.format(insights_repo))
 
-        # Install redhat-access-insights package
         package_name = 'redhat-access-insights'
-        result = self.run('yum install -y {0}'.format(package_name))
-        if result.return_code != 0:
+        commands = [
+            # Install redhat-access-insights package
+            'yum install -y {0}'.format(package_name),
+            # Verify if package is installed by query it
+            'rpm -qi {0}'.format(package_name),
+            # Register client with Red Hat Access Insights
+            'redhat-access-insights --register',
+        ]
+        # each command is given the time it would have if run on its own
+        results = self.run_batch(
+            commands,
+            timeout=settings.ssh_client.command_timeout * len(commands),
+            stop_on_error=True,
+        )
+        if not results or results[0].return_code != 0:
             raise VirtualMachineError(
                 'Unable to install redhat-access-insights package'
             )
 
-        # Verify if package is installed by query it
-        result = self.run('rpm -qi {0}'.format(package_name))
         logger.info('Insights client rpm version: {0}'.format(
-            result.stdout))
-        if result.return_code != 0:
+            results[1].stdout if len(results) > 1 else None))
+        if len(results) < 2 or results[1].return_code != 0:
             raise VirtualMachineError(
                 'Unable to install redhat-access-insights package'
             )
 
-        # Register client with Red Hat Access Insights
-        result = self.run('redhat-access-insights --register')
-        if result.return_code != 0:
+        if len(results) < 3 or results[2].return_code != 0:
             raise VirtualMachineError(
                 'Unable to register client to Access Insights through '
                 'Satellite')
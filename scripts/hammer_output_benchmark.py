@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""Compare the parsers of :mod:`robottelo.cli.hammer` on large outputs.
+
+A host list and a content view info are generated in the CSV, plain and JSON
+formats hammer produces, then each parser is timed on them. The JSON parser
+is also compared with the former recursive key normalization. Usage::
+
+    python scripts/hammer_output_benchmark.py [hosts] [versions] [repeat]
+
+"""
+from __future__ import print_function
+
+import json
+import sys
+import timeit
+
+from six import text_type
+
+from robottelo.cli import hammer
+
+
+def recursive_parse_json(stdout):
+    """Parse JSON output normalizing it with a recursive walk, as
+    ``hammer.parse_json`` used to do.
+    """
+    def normalize(obj):
+        if isinstance(obj, dict):
+            return {
+                key.replace(' ', '-').lower(): normalize(value)
+                for key, value in obj.items()
+            }
+        elif isinstance(obj, list):
+            return [normalize(value) for value in obj]
+        elif isinstance(obj, int) and not isinstance(obj, bool):
+            return text_type(obj)
+        return obj
+    return normalize(json.loads(stdout))
+
+
+def host_list(count):
+    """Return the CSV lines and the JSON output of a ``host list``."""
+    headers = [
+        u'Id', u'Name', u'Operating System', u'Host Group', u'IP', u'MAC']
+    rows = [
+        [
+            index,
+            u'host{0}.example.com'.format(index),
+            u'RedHat 7.3',
+            u'hostgroup{0}'.format(index % 20),
+            u'10.0.{0}.{1}'.format(index // 250, index % 250),
+            u'52:54:00:{0:02x}:{1:02x}:{2:02x}'.format(
+                index // 65536, index // 256 % 256, index % 256),
+        ]
+        for index in range(count)
+    ]
+    csv_lines = [u','.join(headers)] + [
+        u','.join(text_type(value) for value in row) for row in rows]
+    json_output = json.dumps(
+        [dict(zip(headers, row)) for row in rows], indent=2)
+    return csv_lines, json_output
+
+
+def content_view_info(count):
+    """Return the plain lines and the JSON output of a ``content-view info``
+    with ``count`` versions.
+    """
+    lines = [
+        u'ID:                     1',
+        u'Name:                   Big View',
+        u'Label:                  Big_View',
+        u'Composite:              false',
+        u'Organization:           Default Organization',
+        u'Lifecycle Environments:',
+        u' 1) ID:   1',
+        u'    Name: Library',
+        u'Versions:',
+    ]
+    versions = {}
+    for index in range(1, count + 1):
+        lines.extend([
+            u' {0}) ID:        {0}'.format(index),
+            u'    Version:   {0}.0'.format(index),
+            u'    Published: 2017-01-01 00:00:00 UTC',
+        ])
+        versions[text_type(index)] = {
+            u'ID': index,
+            u'Version': u'{0}.0'.format(index),
+            u'Published': u'2017-01-01 00:00:00 UTC',
+        }
+    json_output = json.dumps({
+        u'ID': 1,
+        u'Name': u'Big View',
+        u'Label': u'Big_View',
+        u'Composite': False,
+        u'Organization': u'Default Organization',
+        u'Lifecycle Environments': {u'1': {u'ID': 1, u'Name': u'Library'}},
+        u'Versions': versions,
+    }, indent=2)
+    return lines, json_output
+
+
+def report(name, function, output, repeat):
+    """Print the best time of ``repeat`` calls to ``function(output)``."""
+    best = min(timeit.repeat(lambda: function(output), number=1,
+                             repeat=repeat))
+    print('{0:<40} {1:10.2f}ms'.format(name, 1000 * best))
+
+
+hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+versions = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+csv_lines, hosts_json = host_list(hosts)
+print('host list, {0} hosts'.format(hosts))
+report('  parse_csv', hammer.parse_csv, csv_lines, repeat)
+report('  parse_json', hammer.parse_json, hosts_json, repeat)
+report('  recursive parse_json', recursive_parse_json, hosts_json, repeat)
+
+info_lines, info_json = content_view_info(versions)
+print('content-view info, {0} versions'.format(versions))
+report('  parse_info', hammer.parse_info, info_lines, repeat)
+report('  parse_json', hammer.parse_json, info_json, repeat)
+report('  recursive parse_json', recursive_parse_json, info_json, repeat)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Time :func:`robottelo.cli.hammer.parse_info` on the recorded info outputs.
+
+The outputs are read from ``tests/robottelo/data/hammer_info``, each one is
+parsed ``number`` times per run and the best of ``repeat`` runs is reported.
+Usage::
+
+    python scripts/parse_info_benchmark.py [number] [repeat]
+
+"""
+from __future__ import print_function
+
+import io
+import os
+import sys
+import timeit
+
+from glob import glob
+
+from robottelo.cli import hammer
+
+CORPUS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, 'tests', 'robottelo', 'data', 'hammer_info'
+)
+
+number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+total = 0
+for path in sorted(glob(os.path.join(CORPUS, '*.txt'))):
+    with io.open(path, encoding='utf-8') as handler:
+        lines = handler.read().split(u'\n')
+    best = min(timeit.repeat(
+        lambda: hammer.parse_info(lines), number=number, repeat=repeat))
+    total += best
+    print('{0:<24} {1:4} lines {2:10.2f}us'.format(
+        os.path.basename(path), len(lines), 1e6 * best / number))
+print('{0:<35} {1:10.2f}us'.format('total', 1e6 * total / number))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Measure the per-command overhead of :func:`robottelo.ssh.execute_command`.
+
+The same short command is run several times over one connection to the
+configured server, first waiting for the exit status by polling it every
+second (the former ``execute_command`` behaviour) and then with
+``execute_command`` itself, which waits on the channel status event. Usage::
+
+    python scripts/ssh_benchmark.py [command] [iterations]
+
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from robottelo import ssh
+from robottelo.config import settings
+
+
+def polling_execute_command(cmd, connection, timeout=300):
+    """Run ``cmd`` waiting for its exit status with one second sleeps."""
+    _, stdout, stderr = connection.exec_command(cmd)
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        if stdout.channel.exit_status_ready():
+            break
+        time.sleep(1)
+    stdout.channel.recv_exit_status()
+    return stdout.read(), stderr.read()
+
+
+def measure(function, cmd, connection, iterations):
+    """Return the sorted durations of ``iterations`` calls to ``function``."""
+    durations = []
+    for _ in range(iterations):
+        start = time.time()
+        function(cmd, connection)
+        durations.append(time.time() - start)
+    return sorted(durations)
+
+
+def report(name, durations):
+    """Print the mean and median of the durations in milliseconds."""
+    print('{0:<24} mean={1:8.1f}ms median={2:8.1f}ms max={3:8.1f}ms'.format(
+        name,
+        1000 * sum(durations) / len(durations),
+        1000 * durations[len(durations) // 2],
+        1000 * durations[-1],
+    ))
+
+
+settings.configure()
+command = sys.argv[1] if len(sys.argv) > 1 else 'true'
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+with ssh.get_connection() as ssh_connection:
+    report('sleep polling', measure(
+        polling_execute_command, command, ssh_connection, iterations))
+    report('status event', measure(
+        ssh.execute_command, command, ssh_connection, iterations))
@@ -6,9 +6,10 @@ import logging
 import pytest
 from nailgun import entities
 
-from robottelo.cleanup import EntitiesCleaner
+from robottelo.cleanup import CLEANUP_QUEUE, EntitiesCleaner
 from robottelo.config import settings
-from robottelo.decorators import setting_is_set
+from robottelo.decorators import lock_stats, setting_is_set
+from robottelo.entity_pool import POOLS, EntityPoolFiller
 from robottelo.bz_helpers import get_deselect_bug_ids, group_by_key
 from robottelo.helpers import get_func_name
 
@@ -50,6 +51,31 @@ def pytest_report_header(config):
     return messages
 
 
+def pytest_configure(config):
+    """Start recording the lock stats in the master process, the
+    pytest-xdist workers inheriting the session stats file
+    """
+    if hasattr(config, 'slaveinput'):
+        return
+    if not settings.configured:
+        settings.configure()
+    if settings.lock_stats:
+        lock_stats.start_session()
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Report the most contended locks and the time lost waiting for them"""
+    if hasattr(terminalreporter.config, 'slaveinput'):
+        return
+    lines = lock_stats.get_report()
+    if lines:
+        terminalreporter.write_sep('=', 'lock contention')
+        for line in lines:
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(
+            'lock stats file: {0}'.format(lock_stats.get_session_path()))
+
+
 @pytest.fixture(scope="session")
 def worker_id(request):
     """Gets the worker ID when running in multi-threading with xdist
@@ -68,6 +94,55 @@ def configured_settings():
     return settings
 
 
+@pytest.fixture(scope='session', autouse=True)
+def cleanup_queue(configured_settings):
+    """Drain the deferred cleanups in the background and flush them at the
+    end of the session when ``cleanup_deferred`` is set.
+    """
+    if configured_settings.cleanup_deferred:
+        CLEANUP_QUEUE.start()
+        yield CLEANUP_QUEUE
+        CLEANUP_QUEUE.flush()
+    else:
+        yield None
+
+
+def _get_marked_pool_names(items):
+    """Return the names of the entity pools the items are marked with, by
+    ``@pytest.mark.entity_pool('pool_name', ...)``
+    """
+    names = set()
+    for item in items:
+        marker = item.get_marker('entity_pool')
+        if marker is not None:
+            for mark in marker:
+                names.update(mark.args)
+    return names
+
+
+@pytest.fixture(scope='session', autouse=True)
+def entity_pool_filler(request, configured_settings, worker_id):
+    """Fill the entity pools used by the collected tests in a background
+    process during the session, and drain them at its end.
+
+    The filler is started by a single pytest-xdist worker, and only when the
+    pools are kept in the shared function storage.
+    """
+    pool_names = [
+        name for name in sorted(_get_marked_pool_names(request.session.items))
+        if name in POOLS and POOLS[name].enabled
+    ]
+    if pool_names and worker_id in ('master', 'gw0'):
+        filler = EntityPoolFiller(pool_names)
+        filler.start()
+        yield filler
+        filler.stop()
+        for name in pool_names:
+            POOLS[name].drain()
+    else:
+        yield None
+
+
 @pytest.fixture(autouse=True, scope='module')
 def robottelo_logger(worker_id):
     """Set up a separate logger for each pytest-xdist worker
@@ -102,8 +177,12 @@ def entities_cleaner(robottelo_logger, configured_settings):
             entities.HostGroup
         )
         yield cleaner
-        robottelo_logger.info('Cleaning entities')
-        cleaner.clean()
+        if configured_settings.cleanup_deferred:
+            robottelo_logger.info('Deferring entities cleanup')
+            CLEANUP_QUEUE.add_entities(cleaner)
+        else:
+            robottelo_logger.info('Cleaning entities')
+            cleaner.clean()
     else:
         robottelo_logger.info('Entities cleaner disabled')
         yield None
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Tests for module ``robottelo.api.http``."""
+from __future__ import unicode_literals
+
+import pytest
+import requests
+import six
+from requests.adapters import BaseAdapter
+from six.moves.http_client import HTTPMessage
+
+from robottelo.api import http
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+@pytest.fixture
+def http_settings():
+    """Enable the shared session with small pools"""
+    with mock.patch('robottelo.api.http.settings') as settings:
+        settings.http_client.enabled = True
+        settings.http_client.pool_connections = 2
+        settings.http_client.pool_maxsize = 4
+        settings.http_client.retries = 1
+        settings.http_client.backoff_factor = 0
+        yield settings
+    http.uninstall()
+
+
+def test_get_endpoint():
+    """Ids are replaced in the endpoints"""
+    assert http.get_endpoint(
+        'get', 'https://sat.example.com/katello/api/v2/repositories/42/sync'
+        '?page=2'
+    ) == 'GET /katello/api/v2/repositories/:id/sync'
+    assert http.get_endpoint(
+        'PUT', 'https://sat.example.com/foreman_tasks/api/tasks/'
+        '6e2b7c65-8f0c-4bde-9be8-5d8b1e7c2a00'
+    ) == 'PUT /foreman_tasks/api/tasks/:id'
+    assert http.get_endpoint('GET', 'https://sat.example.com') == 'GET /'
+
+
+def test_latency_histogram():
+    """Requests are counted in the bucket matching their duration"""
+    latencies = http.LatencyHistogram(buckets=(0.1, 1))
+    latencies.record('GET /a', 0.05)
+    latencies.record('GET /a', 0.5)
+    latencies.record('GET /a', 3)
+    latencies.record('POST /b', 0.1)
+    stats = latencies.get_stats()
+    assert stats['GET /a']['count'] == 3
+    assert stats['GET /a']['max'] == 3
+    assert stats['GET /a']['histogram'] == [1, 1, 1]
+    assert stats['POST /b']['histogram'] == [1, 0, 0]
+    lines = latencies.format_stats().splitlines()
+    assert lines[0].strip().startswith('GET /a: 3 requests')
+    assert '>1s:1' in lines[0]
+    latencies.reset()
+    assert latencies.get_stats() == {}
+
+
+def test_build_session():
+    """The session adapters pool the connections and retry"""
+    session = http.build_session(
+        pool_connections=3, pool_maxsize=5, retries=2, backoff_factor=0.1)
+    adapter = session.get_adapter('https://sat.example.com')
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 5
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.backoff_factor == 0.1
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+class SetCookieAdapter(BaseAdapter):
+    """Adapter recording the requests and answering them with a session
+    cookie"""
+
+    def __init__(self):
+        super(SetCookieAdapter, self).__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        message = HTTPMessage()
+        message['Set-Cookie'] = '_session_id=secret; path=/'
+        raw = mock.Mock()
+        raw._original_response.msg = message
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.raw = raw
+        response._content = b''
+        requests.cookies.extract_cookies_to_jar(
+            response.cookies, request, raw)
+        return response
+
+    def close(self):
+        pass
+
+
+def test_build_session_drops_cookies():
+    """A cookie set by a response is not sent with the next request"""
+    session = http.build_session()
+    adapter = SetCookieAdapter()
+    session.mount('https://', adapter)
+    session.get('https://sat.example.com/api/status', auth=('admin', 'a'))
+    session.get('https://sat.example.com/api/status', auth=('viewer', 'b'))
+    assert len(adapter.requests) == 2
+    assert 'Cookie' not in adapter.requests[1].headers
+    assert len(session.cookies) == 0
+
+
+def test_session_requests():
+    """Requests go through a single session and their latency is recorded"""
+    session = mock.Mock()
+    factory = mock.Mock(return_value=session)
+    latencies = http.LatencyHistogram()
+    proxy = http.SessionRequests(factory, latencies)
+    proxy.get('https://sat.example.com/api/hosts/1', {'a': 1}, verify=False)
+    proxy.post('https://sat.example.com/api/hosts', json={'name': 'b'})
+    factory.assert_called_once_with()
+    session.request.assert_has_calls([
+        mock.call('GET', 'https://sat.example.com/api/hosts/1',
+                  params={'a': 1}, allow_redirects=True, verify=False),
+        mock.call('POST', 'https://sat.example.com/api/hosts', data=None,
+                  json={'name': 'b'}),
+    ])
+    assert sorted(latencies.get_stats()) == [
+        'GET /api/hosts/:id', 'POST /api/hosts']
+    assert proxy.exceptions is requests.exceptions
+
+
+def test_session_requests_records_errors():
+    """Failed requests are recorded too"""
+    session = mock.Mock()
+    session.request.side_effect = requests.ConnectionError
+    latencies = http.LatencyHistogram()
+    proxy = http.SessionRequests(lambda: session, latencies)
+    with pytest.raises(requests.ConnectionError):
+        proxy.delete('https://sat.example.com/api/hosts/1')
+    assert latencies.get_stats()['DELETE /api/hosts/:id']['count'] == 1
+
+
+def test_session_requests_new_process():
+    """A new session is created in forked processes"""
+    factory = mock.Mock(side_effect=lambda: mock.Mock())
+    proxy = http.SessionRequests(factory)
+    with mock.patch('robottelo.api.http.os.getpid', return_value=1):
+        first = proxy.session
+        assert proxy.session is first
+    with mock.patch('robottelo.api.http.os.getpid', return_value=2):
+        assert proxy.session is not first
+    assert factory.call_count == 2
+
+
+def test_install(http_settings):
+    """install makes nailgun.client use the shared session"""
+    installed = http.install()
+    assert http.client.requests is installed
+    adapter = installed.session.get_adapter('https://sat.example.com')
+    assert adapter._pool_maxsize == 4
+    http.uninstall()
+    assert http.client.requests is requests
+
+
+def test_install_disabled(http_settings):
+    """Nothing is installed if the shared session is disabled"""
+    http_settings.http_client.enabled = False
+    assert http.install() is None
+    assert http.client.requests is requests
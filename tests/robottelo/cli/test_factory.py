@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Tests for the bulk factories of ``robottelo.cli.factory``"""
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import pytest
+import six
+
+from robottelo.cli import factory
+from robottelo.cli.base import Base
+from robottelo.cli.factory import (
+    CLIFactoryError,
+    create_objects_bulk,
+    make_many,
+)
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+@pytest.fixture(autouse=True)
+def bulk_settings():
+    """Allow two creates at once on a test server"""
+    with mock.patch('robottelo.cli.factory.settings') as settings, \
+            mock.patch.object(factory, '_bulk_semaphores', {}):
+        settings.hammer_bulk_workers = 2
+        settings.server.hostname = 'example.com'
+        yield settings
+
+
+def make_item(options=None):
+    """Fake factory failing for the odd indexes"""
+    time.sleep(0.01)
+    if options['index'] % 2:
+        raise CLIFactoryError('Failed to create {0}'.format(options['index']))
+    return {'id': options['index']}
+
+
+def test_create_objects_bulk_order_and_errors():
+    """Results keep the input order and hold the errors"""
+    results = create_objects_bulk(
+        make_item, [{'index': index} for index in range(6)], workers=4)
+    assert [result['id'] for result in results[::2]] == [0, 2, 4]
+    for result in results[1::2]:
+        assert isinstance(result, CLIFactoryError)
+
+
+def test_create_objects_bulk_wraps_errors():
+    """Errors other than CLIFactoryError are wrapped into one"""
+    def broken(options=None):
+        raise ValueError('broken')
+    results = create_objects_bulk(broken, [None])
+    assert isinstance(results[0], CLIFactoryError)
+    assert 'broken' in '{0}'.format(results[0])
+
+
+def test_create_objects_bulk_bounded_per_server():
+    """No more than hammer_bulk_workers creates run at once"""
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def tracked(options=None):
+        with lock:
+            running.append(options)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(options)
+        return options
+
+    results = create_objects_bulk(tracked, range(8), workers=8)
+    assert results == list(range(8))
+    assert max(peak) <= 2
+
+
+def test_create_objects_bulk_skip_create_info():
+    """info_fields are passed to Base.skip_create_info in each thread"""
+    def make_fields(options=None):
+        return getattr(Base._create_state, 'fields', None)
+    assert create_objects_bulk(
+        make_fields, [None, None], info_fields=('id', 'name')
+    ) == [frozenset(('id', 'name'))] * 2
+    assert create_objects_bulk(make_fields, [None]) == [None]
+
+
+def test_make_many():
+    """make_many returns the entities created from the options function"""
+    results = make_many(make_item, 3, lambda index: {'index': index * 2})
+    assert results == [{'id': 0}, {'id': 2}, {'id': 4}]
+
+
+def test_make_many_raises_errors():
+    """make_many raises a CLIFactoryError listing the failures"""
+    with pytest.raises(CLIFactoryError) as context:
+        make_many(make_item, 4, lambda index: {'index': index})
+    message = '{0}'.format(context.value)
+    assert 'Failed to create 2 of 4 entities with make_item' in message
+    assert 'Failed to create 3' in message
+
+
+def test_setup_org_for_a_custom_repo():
+    """The custom repo setup steps are wired with the entities created"""
+    patches = {
+        name: mock.patch.object(factory, name) for name in (
+            'make_org', 'make_lifecycle_environment', 'make_product',
+            'make_repository', 'make_content_view', 'make_activation_key',
+            'activationkey_add_subscription_to_repo', 'Repository',
+            'ContentView', 'ActivationKey',
+        )
+    }
+    mocks = {name: patcher.start() for name, patcher in patches.items()}
+    try:
+        mocks['make_org'].return_value = {'id': '1'}
+        mocks['make_lifecycle_environment'].return_value = {'id': '2'}
+        mocks['make_product'].return_value = {'id': '3', 'name': 'product'}
+        mocks['make_repository'].return_value = {'id': '4'}
+        mocks['make_content_view'].return_value = {'id': '5'}
+        mocks['make_activation_key'].return_value = {'id': '6'}
+        mocks['ContentView'].info.return_value = {'versions': [{'id': '7'}]}
+        result = factory.setup_org_for_a_custom_repo({'url': 'http://repo'})
+    finally:
+        for patcher in patches.values():
+            patcher.stop()
+    assert result == {
+        'activationkey-id': '6',
+        'content-view-id': '5',
+        'lifecycle-environment-id': '2',
+        'organization-id': '1',
+        'product-id': '3',
+        'repository-id': '4',
+    }
+    mocks['Repository'].synchronize.assert_called_once_with({'id': '4'})
+    mocks['ContentView'].version_promote.assert_called_once_with({
+        'id': '7',
+        'organization-id': '1',
+        'to-lifecycle-environment-id': '2',
+    })
+    mocks['ActivationKey'].update.assert_called_once_with({
+        'content-view-id': '5',
+        'id': '6',
+        'lifecycle-environment-id': '2',
+        'organization-id': '1',
+    })
+    mocks['activationkey_add_subscription_to_repo'].assert_called_once_with({
+        'activationkey-id': '6',
+        'organization-id': '1',
+        'subscription': 'product',
+    })
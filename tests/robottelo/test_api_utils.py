@@ -1,6 +1,13 @@
 """Unit tests for :mod:`robottelo.api.utils`."""
+import six
+from nailgun.entity_mixins import TaskFailedError, TaskTimedOutError
 from robottelo.api import utils
-from unittest2 import TestCase
+from unittest2 import TestCase, skipIf
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
 
 
 class UtilsTestCase(TestCase):
@@ -19,3 +26,102 @@ class UtilsTestCase(TestCase):
             utils.one_to_many_names('person'),
             {'person', 'person_ids', 'people'},
         )
+
+
+def fake_task(task_id, state='running', result='pending'):
+    """Return a fake ``ForemanTask`` entity"""
+    return mock.Mock(id=task_id, state=state, result=result)
+
+
+class WaitForTasksTestCase(TestCase):
+    """Tests for polling tasks in :mod:`robottelo.api.utils`."""
+
+    def setUp(self):
+        task_patcher = mock.patch('robottelo.api.utils.entities.ForemanTask')
+        self.search = task_patcher.start().return_value.search
+        self.addCleanup(task_patcher.stop)
+        sleep_patcher = mock.patch('robottelo.api.utils.time.sleep')
+        self.sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def test_iter_finished_tasks(self):
+        """Tasks are yielded as they finish, with one search per check-up"""
+        self.search.side_effect = [
+            [fake_task('1'), fake_task('2', 'stopped', 'success')],
+            [fake_task('1')],
+            [fake_task('1', 'stopped', 'success')],
+        ]
+        tasks = utils.iter_finished_tasks(
+            ['1', '2'], poll_rate=2, timeout=100)
+        self.assertEqual([task.id for task in tasks], ['2', '1'])
+        self.assertEqual(self.search.call_count, 3)
+        self.assertEqual(
+            self.search.call_args_list[0][1]['query'],
+            {'search': 'id = 1 or id = 2', 'per_page': 2}
+        )
+        self.assertEqual(
+            self.search.call_args_list[1][1]['query'],
+            {'search': 'id = 1', 'per_page': 1}
+        )
+        # the delay grows when no task finished
+        self.assertEqual(
+            [call[0][0] for call in self.sleep.call_args_list], [2, 3])
+
+    def test_task_failed(self):
+        """A task finishing without success raises an error"""
+        self.search.return_value = [fake_task('1', 'stopped', 'error')]
+        with self.assertRaises(TaskFailedError):
+            list(utils.iter_finished_tasks(['1'], poll_rate=1, timeout=10))
+
+    def test_task_failed_allowed(self):
+        """Failed tasks are returned if they do not need to succeed"""
+        self.search.return_value = [fake_task('1', 'paused', 'error')]
+        tasks = utils.iter_finished_tasks(
+            ['1'], poll_rate=1, timeout=10, must_succeed=False)
+        self.assertEqual([task.result for task in tasks], ['error'])
+
+    def test_timeout(self):
+        """Tasks not finished before the timeout raise an error"""
+        self.search.return_value = [fake_task('1')]
+        with mock.patch('robottelo.api.utils.time.time',
+                        side_effect=[0, 5, 11]):
+            with self.assertRaises(TaskTimedOutError):
+                list(utils.iter_finished_tasks(
+                    ['1'], poll_rate=1, timeout=10))
+
+    def test_wait_for_tasks(self):
+        """The tasks found are returned in order once finished"""
+        self.search.side_effect = [
+            [],
+            [fake_task('1'), fake_task('2')],
+            [fake_task('2', 'stopped', 'success'),
+             fake_task('1', 'stopped', 'success')],
+        ]
+        tasks = utils.wait_for_tasks(
+            'label = Actions::Katello::Repository::Sync', poll_rate=1,
+            poll_timeout=10)
+        self.assertEqual([task.id for task in tasks], ['1', '2'])
+        self.assertEqual([task.state for task in tasks], ['stopped'] * 2)
+
+    def test_wait_for_tasks_not_found(self):
+        """An error is raised if no task is found"""
+        self.search.return_value = []
+        with self.assertRaises(AssertionError):
+            utils.wait_for_tasks('label = foo', max_tries=2)
+
+    @skipIf(six.PY2, 'asyncio is not available on Python 2')
+    def test_wait_for_tasks_async(self):
+        """Waits can be gathered in an asyncio event loop"""
+        import asyncio
+        self.search.side_effect = lambda query: [
+            fake_task(query['search'][-1], 'stopped', 'success')]
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        tasks = loop.run_until_complete(asyncio.gather(
+            utils.wait_for_tasks_async('label = 1', loop=loop, poll_rate=1,
+                                       poll_timeout=10),
+            utils.wait_for_tasks_async('label = 2', loop=loop, poll_rate=1,
+                                       poll_timeout=10),
+        ))
+        self.assertEqual([[task.id for task in result] for result in tasks],
+                         [['1'], ['2']])
@@ -0,0 +1,328 @@
+"""Tests for module ``robottelo.cleanup``."""
+import shutil
+import tempfile
+import threading
+import time
+
+import six
+from nailgun.entity_mixins import TaskTimedOutError
+from unittest2 import TestCase
+
+from robottelo import cleanup
+from robottelo.cli.org import Org
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from robottelo.vm import VirtualMachine
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+class Entity(object):
+    """Fake nailgun entity recording its updates and deletes"""
+
+    def __init__(self, id=None, **kwargs):
+        self.id = id
+        self.deleted = []
+        self.updated = []
+        self.delete_response = kwargs.pop('delete_response', None)
+        self.error = kwargs.pop('error', None)
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def delete(self, **kwargs):
+        if self.error:
+            raise self.error
+        self.deleted.append(kwargs)
+        return self.delete_response
+
+    def update(self, fields=None):
+        if self.error:
+            raise self.error
+        self.updated.append(sorted(fields))
+
+
+class Organization(Entity):
+    """Fake organization"""
+
+
+class Host(Entity):
+    """Fake host"""
+
+    hosts = []
+
+    def search(self, query=None):
+        Host.queries.append(query)
+        return Host.hosts
+
+
+class HostGroup(Entity):
+    """Fake host group"""
+
+
+class EntitiesCleanerTestCase(TestCase):
+    """Tests for :class:`robottelo.cleanup.EntitiesCleaner`."""
+
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            'robottelo.cleanup.entities',
+            Organization=Organization,
+            Host=Host,
+            HostGroup=HostGroup,
+            create=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Host.hosts = []
+        Host.queries = []
+        self.cleaner = cleanup.EntitiesCleaner(workers=4)
+
+    def test_clean_order(self):
+        """Hosts and host groups are updated before the orgs are deleted"""
+        events = []
+        host = Host(1)
+        host.update = lambda fields=None: events.append('host')
+        hostgroup = HostGroup(2)
+        hostgroup.update = lambda fields=None: events.append('hostgroup')
+        org = Organization(3)
+        org.delete = lambda **kwargs: events.append('org')
+        self.cleaner.cleanup_queue['Host'].append(host)
+        self.cleaner.cleanup_queue['HostGroup'].append(hostgroup)
+        self.cleaner.cleanup_queue['Organization'].append(org)
+        self.cleaner.clean()
+        self.assertEqual(events, ['host', 'hostgroup', 'org'])
+        self.assertEqual(host.organization.id, cleanup.DEFAULT_ORG_ID)
+        self.assertEqual(
+            self.cleaner.get_summary(),
+            {
+                'Host': {'updated': 1},
+                'HostGroup': {'updated': 1},
+                'Organization': {'deleted': 1},
+            }
+        )
+
+    def test_delete_concurrently(self):
+        """Entities of a level are deleted at the same time"""
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def delete(**kwargs):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        orgs = [Organization(index) for index in range(8)]
+        for org in orgs:
+            org.delete = delete
+        self.cleaner.delete_entities(orgs)
+        self.assertLessEqual(max(peak), 4)
+        self.assertGreater(max(peak), 1)
+        self.assertEqual(
+            self.cleaner.deleted_entities['Organization'], set(range(8)))
+
+    def test_orgs_with_hosts_skipped(self):
+        """Only the organizations with hosts are skipped, with one search"""
+        Host.hosts = [Host(10, organization=Organization(1))]
+        orgs = [Organization(index) for index in range(3)]
+        self.cleaner.delete_entities(orgs)
+        self.assertEqual(len(Host.queries), 1)
+        self.assertEqual(
+            Host.queries[0]['search'],
+            'organization_id=0 or organization_id=1 or organization_id=2'
+        )
+        self.assertEqual([len(org.deleted) for org in orgs], [1, 0, 1])
+        skipped = [
+            result for result in self.cleaner.results
+            if result.status == 'skipped'
+        ]
+        self.assertEqual([result.entity_id for result in skipped], [1])
+
+    def test_already_deleted_skipped(self):
+        """Entities deleted by a previous cleanup are not deleted again"""
+        org = Organization(1)
+        self.cleaner.delete_entities([org])
+        self.cleaner.delete_entities([org, org])
+        self.assertEqual(len(org.deleted), 1)
+        self.assertEqual(
+            [result.status for result in self.cleaner.results],
+            ['deleted', 'skipped', 'skipped']
+        )
+
+    def test_errors_reported(self):
+        """Failed updates and deletes are reported, not raised"""
+        host = Host(1, error=ValueError('update failed'))
+        org = Organization(2, error=ValueError('delete failed'))
+        self.cleaner.update_entities([host], managed=False)
+        self.cleaner.delete_entities([org])
+        self.assertEqual(
+            [(result.status, result.message)
+             for result in self.cleaner.results],
+            [('failed', 'update failed'), ('failed', 'delete failed')]
+        )
+        self.assertEqual(self.cleaner.deleted_entities['Organization'], set())
+        self.assertIn('Organization 2 failed', self.cleaner.format_results())
+
+    def test_async_delete_tasks_polled_together(self):
+        """Tasks of asynchronous deletes are waited for together"""
+        orgs = [
+            Organization(index, delete_response={
+                'id': 'task{0}'.format(index), 'state': 'planned'})
+            for index in range(3)
+        ]
+        tasks = [
+            mock.Mock(id='task0', result='success'),
+            mock.Mock(id='task1', result='error'),
+            mock.Mock(id='task2', result='success'),
+        ]
+        with mock.patch.object(
+                cleanup, 'iter_finished_tasks',
+                return_value=iter(tasks)) as iter_tasks:
+            self.cleaner.delete_entities(orgs, synchronous=False)
+        iter_tasks.assert_called_once_with(
+            ['task0', 'task1', 'task2'], must_succeed=False)
+        self.assertEqual(orgs[0].deleted, [{'synchronous': False}])
+        self.assertEqual(
+            self.cleaner.deleted_entities['Organization'], {0, 2})
+        self.assertEqual(
+            self.cleaner.get_summary(),
+            {'Organization': {'deleted': 2, 'failed': 1}}
+        )
+
+    def test_async_delete_timeout(self):
+        """Entities whose tasks did not finish are reported as failed"""
+        org = Organization(1, delete_response={'id': 'task', 'state': 'x'})
+
+        def timed_out(task_ids, must_succeed):
+            raise TaskTimedOutError('timed out', 'task')
+            yield
+
+        with mock.patch.object(cleanup, 'iter_finished_tasks', timed_out):
+            self.cleaner.delete_entities([org], synchronous=False)
+        self.assertEqual(self.cleaner.results[0].status, 'failed')
+
+
+class CleanupQueueTestCase(TestCase):
+    """Tests for :class:`robottelo.cleanup.CleanupQueue`."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.queue = cleanup.CleanupQueue(
+            storage=FileStorageHandler(root_dir=self.tmp_dir),
+            scope='test', interval=0.01, batch_size=2)
+        patcher = mock.patch('robottelo.cleanup.settings')
+        self.settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings.cleanup_deferred = True
+
+    def test_deferred_helper(self):
+        """Cleanup helpers are queued and run with their arguments"""
+        with mock.patch('robottelo.cleanup.CLEANUP_QUEUE', self.queue), \
+                mock.patch('robottelo.cleanup.entities') as entities:
+            cleanup.org_cleanup(5)
+            entities.Organization.assert_not_called()
+            self.assertEqual(len(self.queue), 1)
+            self.assertEqual(self.queue.drain(), 1)
+        entities.Organization.assert_called_once_with(id=5)
+        entities.Organization.return_value.delete.assert_called_once_with()
+        self.assertEqual(len(self.queue), 0)
+
+    def test_not_deferred(self):
+        """Cleanup helpers run at once when the cleanups are not deferred"""
+        self.settings.cleanup_deferred = False
+        with mock.patch('robottelo.cleanup.CLEANUP_QUEUE', self.queue), \
+                mock.patch('robottelo.cleanup.entities') as entities:
+            cleanup.org_cleanup(5)
+        entities.Organization.assert_called_once_with(id=5)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_vm(self):
+        """Virtual machines are destroyed from their queued attributes"""
+        vm = VirtualMachine.__new__(VirtualMachine)
+        vm.distro = 'rhel7'
+        vm.provisioning_server = 'prov'
+        vm.image_dir = '/img'
+        vm.ip_addr = '10.0.0.1'
+        vm._hostname = 'vm.example.com'
+        vm._domain = None
+        vm._target_image = 'vm'
+        vm._created = True
+        vm._subscribed = True
+        self.assertTrue(self.queue.add_vm(vm))
+        with mock.patch('robottelo.cleanup.VirtualMachine') as vm_class:
+            self.assertEqual(self.queue.drain(), 1)
+        vm_class.assert_called_once_with(
+            distro='rhel7', provisioning_server='prov', image_dir='/img',
+            hostname='vm.example.com', domain=None, target_image='vm')
+        destroyed = vm_class.return_value
+        destroyed.destroy.assert_called_once_with()
+        self.assertTrue(destroyed._created)
+        self.assertTrue(destroyed._subscribed)
+        self.assertEqual(destroyed.ip_addr, '10.0.0.1')
+
+    def test_vm_subclass_not_queued(self):
+        """Other kinds of virtual machines are destroyed at once"""
+        vm = mock.Mock()
+        with mock.patch('robottelo.cleanup.CLEANUP_QUEUE', self.queue):
+            cleanup.vm_cleanup(vm)
+        vm.destroy.assert_called_once_with()
+        self.assertEqual(len(self.queue), 0)
+
+    def test_cli_entity(self):
+        """CLI entities are deleted with their CLI class"""
+        self.queue.add_cli_entity(Org, {'id': 3})
+        with mock.patch.object(Org, 'delete') as delete:
+            self.assertEqual(self.queue.drain(), 1)
+        delete.assert_called_once_with({'id': 3})
+
+    def test_entities(self):
+        """Entities registered by a cleaner are cleaned by a new cleaner"""
+        cleaner = cleanup.EntitiesCleaner()
+        self.assertFalse(self.queue.add_entities(cleaner))
+        cleaner.cleanup_queue['Organization'].extend(
+            [Organization(1), Organization(2)])
+        self.assertTrue(self.queue.add_entities(cleaner))
+        with mock.patch('robottelo.cleanup.entities') as entities, \
+                mock.patch.object(cleanup.EntitiesCleaner, 'clean',
+                                  autospec=True) as clean:
+            self.assertEqual(self.queue.drain(), 1)
+        entities.Organization.assert_has_calls(
+            [mock.call(id=1), mock.call(id=2)])
+        self.assertEqual(
+            len(clean.call_args[0][0].cleanup_queue['Organization']), 2)
+
+    def test_failed_cleanup_retried(self):
+        """Failing cleanups are run again until max_attempts"""
+        self.queue.add_cli_entity(Org, {'id': 3})
+        self.queue.add_cli_entity(Org, {'id': 4})
+        with mock.patch.object(Org, 'delete') as delete:
+            delete.side_effect = lambda options: (
+                options['id'] == 3 and 1 / 0)
+            self.assertEqual(self.queue.drain(), 1)
+        self.assertEqual(delete.call_count, 4)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_not_json_compatible(self):
+        """Calls which can not be stored are not queued"""
+        self.assertFalse(
+            self.queue.add_function(cleanup.org_cleanup, object()))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_background_drain_and_flush(self):
+        """The background thread drains the queue until flushed"""
+        drained = threading.Event()
+        with mock.patch.object(Org, 'delete') as delete:
+            delete.side_effect = lambda options: drained.set()
+            self.queue.start()
+            self.queue.add_cli_entity(Org, {'id': 1})
+            self.assertTrue(drained.wait(5))
+            self.queue.add_cli_entity(Org, {'id': 2})
+            self.queue.flush()
+        self.assertIsNone(self.queue._thread)
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(delete.call_count, 2)
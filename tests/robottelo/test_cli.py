@@ -1,14 +1,22 @@
+import re
 import six
+import time
 import unittest2
 
 from functools import partial
+from robottelo import ssh
+from multiprocessing.pool import ThreadPool
 from robottelo.cli.base import (
     Base,
     CLIBaseError,
     CLIDataBaseError,
     CLIError,
+    CLIResultCache,
     CLIReturnCodeError
 )
+from robottelo.cli.hammer_shell import HammerShellError
+from robottelo.cli.org import Org
+from robottelo.cli.repository import Repository
 
 if six.PY2:
     import mock
@@ -28,8 +36,7 @@ class BaseCliTestCase(unittest2.TestCase):
     def test_construct_command(self):
         """_construct_command builds a command using flags and arguments"""
         Base.command_base = 'basecommand'
-        Base.command_sub = 'subcommand'
-        command_parts = Base._construct_command({
+        command_parts = Base._construct_command('subcommand', {
             u'flag-one': True,
             u'flag-two': False,
             u'argument': u'value',
@@ -156,14 +163,14 @@ class BaseCliTestCase(unittest2.TestCase):
     @mock.patch('robottelo.cli.base.Base.execute')
     @mock.patch('robottelo.cli.base.Base._construct_command')
     def test_add_operating_system(self, construct, execute):
-        """Check command_sub edited when executing add_operating_system"""
+        """Check add_operating_system builds the add-operatingsystem command
+        """
         options = {u'foo': u'bar'}
-        self.assertNotEqual('add-operatingsystem', Base.command_sub)
         self.assertEqual(
             execute.return_value,
             Base.add_operating_system(options)
         )
-        self.assertEqual('add-operatingsystem', Base.command_sub)
+        self.assertEqual('add-operatingsystem', construct.call_args[0][0])
         construct.called_once_with(options)
         execute.called_once_with(construct.return_value)
 
@@ -176,7 +183,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
 
@@ -191,7 +198,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         self.assertFalse(info.called)
@@ -210,7 +217,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         info.called_once_with({'id': 'foo'})
@@ -229,7 +236,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create({'organization-id': 'org-id'})
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         info.called_once_with({'id': 'foo', 'organization-id': 'org-id'})
@@ -246,7 +253,7 @@ class BaseCliTestCase(unittest2.TestCase):
         ]
         Base.command_requires_org = True
         self.assertRaises(CLIError, Base.create)
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
 
@@ -258,7 +265,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             base_method(**base_method_kwargs)
         )
-        self.assertEqual(cmd_sub, Base.command_sub)
+        self.assertEqual(cmd_sub, construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(
             construct.return_value, ignore_stderr=ignore_stderr
@@ -290,8 +297,55 @@ class BaseCliTestCase(unittest2.TestCase):
         """Check excuted build ssh method and returns raw response"""
         settings.locale = 'en_US'
         settings.performance = False
+        settings.hammer_shell = False
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        response = Base.execute('some_cmd', return_raw_response=True)
+        ssh_cmd = u'LANG=en_US  hammer -v -u admin -p password  some_cmd'
+        command.assert_called_once_with(
+            ssh_cmd.encode('utf-8'),
+            output_format=None,
+            timeout=None,
+            connection_timeout=None
+        )
+        self.assertIs(response, command.return_value)
+
+    @mock.patch('robottelo.cli.base.hammer_shell.get_hammer_shell_pool')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_with_hammer_shell(self, settings, command, get_pool):
+        """Check execute runs the command in a hammer session when enabled"""
+        settings.locale = 'en_US'
+        settings.performance = False
+        settings.hammer_shell = True
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        response = Base.execute(
+            'some_cmd', output_format='csv', return_raw_response=True)
+        get_pool.return_value.run.assert_called_once_with(
+            u'-v -u admin -p password --output=csv some_cmd',
+            output_format='csv',
+            timeout=None,
+            connection_timeout=None,
+            user='admin',
+            password='password'
+        )
+        self.assertFalse(command.called)
+        self.assertIs(response, get_pool.return_value.run.return_value)
+
+    @mock.patch('robottelo.cli.base.hammer_shell.get_hammer_shell_pool')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_hammer_shell_fallback(self, settings, command, get_pool):
+        """Check execute runs a one-shot hammer command when the hammer
+        session fails
+        """
+        settings.locale = 'en_US'
+        settings.performance = False
+        settings.hammer_shell = True
         settings.server.admin_username = 'admin'
         settings.server.admin_password = 'password'
+        get_pool.return_value.run.side_effect = HammerShellError('broken')
         response = Base.execute('some_cmd', return_raw_response=True)
         ssh_cmd = u'LANG=en_US  hammer -v -u admin -p password  some_cmd'
         command.assert_called_once_with(
@@ -302,6 +356,25 @@ class BaseCliTestCase(unittest2.TestCase):
         )
         self.assertIs(response, command.return_value)
 
+    @mock.patch('robottelo.cli.base.hammer_shell.get_hammer_shell_pool')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_hammer_shell_no_fallback_once_sent(
+            self, settings, command, get_pool):
+        """Check execute does not run again a command sent to a hammer
+        session which then failed
+        """
+        settings.locale = 'en_US'
+        settings.performance = False
+        settings.hammer_shell = True
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        get_pool.return_value.run.side_effect = HammerShellError(
+            'broken', command_sent=True)
+        with self.assertRaises(HammerShellError):
+            Base.execute('some_cmd', return_raw_response=True)
+        self.assertFalse(command.called)
+
     @mock.patch('robottelo.cli.base.Base._handle_response')
     @mock.patch('robottelo.cli.base.ssh.command')
     @mock.patch('robottelo.cli.base.settings')
@@ -324,7 +397,8 @@ class BaseCliTestCase(unittest2.TestCase):
         )
         handle_resp.assert_called_once_with(
             command.return_value,
-            ignore_stderr=None
+            ignore_stderr=None,
+            command_sub=None
         )
         self.assertIs(response, handle_resp.return_value)
 
@@ -333,7 +407,8 @@ class BaseCliTestCase(unittest2.TestCase):
         """Check exists method without options and empty return"""
         lst_method.return_value = []
         response = Base.exists(search=['id', 1])
-        lst_method.assert_called_once_with({u'search': u'id=\\"1\\"'})
+        lst_method.assert_called_once_with(
+            {u'search': u'id=\\"1\\"'}, lazy=True)
         self.assertEqual([], response)
 
     @mock.patch('robottelo.cli.base.Base.list')
@@ -342,7 +417,7 @@ class BaseCliTestCase(unittest2.TestCase):
         lst_method.return_value = [1, 2]
         my_options = {u'search': u'foo=bar'}
         response = Base.exists(my_options, search=['id', 1])
-        lst_method.assert_called_once_with(my_options)
+        lst_method.assert_called_once_with(my_options, lazy=True)
         self.assertEqual(1, response)
 
     @mock.patch('robottelo.cli.base.Base.command_requires_org')
@@ -397,10 +472,53 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.list(options={'organization-id': 1})
         )
-        self.assertEqual('list', Base.command_sub)
+        self.assertEqual('list', construct.call_args[0][0])
         construct.called_once_with({'per-page': 1000})
         execute.called_once_with(construct.return_value, output_format='csv')
 
+    @mock.patch('robottelo.cli.base.settings')
+    @mock.patch('robottelo.cli.base.Base.execute')
+    @mock.patch('robottelo.cli.base.Base._construct_command')
+    def test_list_json_output(self, construct, execute, settings):
+        """Check list requests JSON output when enabled"""
+        settings.hammer_cache_ttl = 0
+        settings.hammer_json_output = True
+        Base.list(options={'organization-id': 1})
+        execute.assert_called_once_with(
+            construct.return_value, output_format='json')
+
+    @mock.patch('robottelo.cli.base.hammer.parse_info')
+    @mock.patch('robottelo.cli.base.settings')
+    @mock.patch('robottelo.cli.base.Base.execute')
+    @mock.patch('robottelo.cli.base.Base._construct_command')
+    def test_info_json_output(self, construct, execute, settings, parse):
+        """Check info requests JSON output without parsing it when enabled"""
+        settings.hammer_cache_ttl = 0
+        settings.hammer_json_output = True
+        result = Base.info(options={'organization-id': 1})
+        execute.assert_called_once_with(
+            command=construct.return_value,
+            output_format='json',
+            return_raw_response=None,
+        )
+        parse.assert_not_called()
+        self.assertIs(result, execute.return_value)
+
+    @mock.patch('robottelo.cli.base.Base.info')
+    @mock.patch('robottelo.cli.base.settings')
+    @mock.patch('robottelo.cli.base.Base.execute')
+    @mock.patch('robottelo.cli.base.Base._construct_command')
+    def test_create_json_output(self, construct, execute, settings, info):
+        """Check create reads the ID from the JSON message when enabled"""
+        settings.hammer_json_output = True
+        execute.return_value = {u'message': u'Created', u'id': u'7'}
+        info.return_value = {u'id': u'7', u'name': u'foo'}
+        with mock.patch.object(Base, 'command_requires_org', False):
+            self.assertIs(Base.create({u'name': u'foo'}), info.return_value)
+        execute.assert_called_once_with(
+            construct.return_value, output_format='json')
+        info.assert_called_once_with({u'id': u'7'})
+
     @mock.patch('robottelo.cli.base.Base.execute')
     @mock.patch('robottelo.cli.base.Base._construct_command')
     def test_list_without_per_page(self, construct, execute):
@@ -473,6 +591,367 @@ class BaseCliTestCase(unittest2.TestCase):
         )
 
 
+class CLIResultCacheTestCase(unittest2.TestCase):
+    """Tests for the cache of the read only CLI commands results"""
+
+    def setUp(self):
+        settings_patcher = mock.patch('robottelo.cli.base.settings')
+        self.settings = settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+        self.settings.performance = False
+        self.settings.hammer_shell = False
+        self.settings.hammer_json_output = False
+        self.settings.hammer_cache_ttl = 60
+        self.settings.hammer_cache_size = 10
+        command_patcher = mock.patch('robottelo.cli.base.ssh.command')
+        self.command = command_patcher.start()
+        self.addCleanup(command_patcher.stop)
+        self.command.side_effect = lambda *args, **kwargs: mock.Mock(
+            return_code=0, stderr=u'', stdout=[{u'id': u'1'}])
+
+        class Org(Base):
+            command_base = 'organization'
+            command_requires_org = False
+            cache = CLIResultCache()
+
+        class Product(Base):
+            command_base = 'product'
+            command_requires_org = False
+            cache = Org.cache
+
+        self.org = Org
+        self.product = Product
+
+    def test_list_is_cached(self):
+        """Check equivalent list calls run a single command and return
+        independent copies
+        """
+        first = self.org.list({u'search': u'name=foo', u'page': 1})
+        first[0][u'id'] = u'changed'
+        second = self.org.list({u'page': u'1', u'search': u'name=foo'})
+        self.assertEqual(second, [{u'id': u'1'}])
+        self.assertEqual(self.command.call_count, 1)
+        stats = self.org.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_cache_key_includes_user_and_options(self):
+        """Check different options and users do not share results"""
+        self.org.list({u'search': u'name=foo'})
+        self.org.list({u'search': u'name=bar'})
+        self.org.with_user('alice', 'secret').list({u'search': u'name=foo'})
+        self.assertEqual(self.command.call_count, 3)
+
+    def test_write_invalidates_resource(self):
+        """Check a mutating command invalidates the results of its resource
+        only
+        """
+        self.org.list()
+        self.product.list()
+        self.org.update({u'id': 1, u'name': u'new'})
+        self.org.list()
+        self.product.list()
+        self.assertEqual(self.command.call_count, 4)
+        self.assertEqual(self.org.cache.get_stats()['invalidations'], 1)
+
+    def test_disabled(self):
+        """Check results are not cached inside the disabled context manager
+        or without a TTL
+        """
+        with self.org.cache.disabled():
+            self.org.list()
+            self.org.list()
+        self.settings.hammer_cache_ttl = 0
+        self.org.list()
+        self.assertEqual(self.command.call_count, 3)
+
+    @mock.patch('robottelo.cli.base.time')
+    def test_expiration(self, time):
+        """Check results are not reused after the TTL"""
+        time.time.return_value = 1000
+        self.org.list()
+        time.time.return_value = 1059
+        self.org.list()
+        time.time.return_value = 1061
+        self.org.list()
+        self.assertEqual(self.command.call_count, 2)
+        self.assertEqual(self.org.cache.get_stats()['expirations'], 1)
+
+    def test_eviction(self):
+        """Check the least recently used result is evicted"""
+        self.settings.hammer_cache_size = 2
+        self.org.list({u'page': 1})
+        self.org.list({u'page': 2})
+        self.org.list({u'page': 1})
+        self.org.list({u'page': 3})
+        self.org.list({u'page': 1})
+        self.assertEqual(self.command.call_count, 3)
+        self.org.list({u'page': 2})
+        self.assertEqual(self.command.call_count, 4)
+        self.assertEqual(self.org.cache.get_stats()['evictions'], 2)
+
+    def test_stale_result_not_cached(self):
+        """Check a result read while the resource was invalidated is not
+        cached
+        """
+        def command(*args, **kwargs):
+            self.org.cache.invalidate(self.org.command_base)
+            return mock.Mock(return_code=0, stderr=u'', stdout=[])
+        self.command.side_effect = command
+        self.org.list()
+        self.org.list()
+        self.assertEqual(self.command.call_count, 2)
+
+
+class CLIThreadSafetyTestCase(unittest2.TestCase):
+    """Tests for running the CLI classes from several threads at once"""
+
+    def setUp(self):
+        settings_patcher = mock.patch('robottelo.cli.base.settings')
+        settings = settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+        settings.locale = 'en_US'
+        settings.performance = False
+        settings.hammer_shell = False
+        settings.hammer_json_output = False
+        settings.hammer_cache_ttl = 0
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        command_patcher = mock.patch(
+            'robottelo.cli.base.ssh.command', self.fake_command)
+        command_patcher.start()
+        self.addCleanup(command_patcher.stop)
+        org_patcher = mock.patch.object(Base, 'command_requires_org', False)
+        org_patcher.start()
+        self.addCleanup(org_patcher.stop)
+
+    @staticmethod
+    def fake_command(cmd, output_format=None, timeout=None,
+                     connection_timeout=None):
+        """Answer the hammer command itself, failing if asked to"""
+        cmd = re.sub(
+            r'^.* -p password +(--output=\w+ )?', u'', cmd.decode('utf-8'))
+        # Give the other threads a chance to run in the middle of a call
+        time.sleep(0)
+        if u'--fail' in cmd:
+            return mock.Mock(return_code=1, stderr=u'failed', stdout=[])
+        return mock.Mock(return_code=0, stderr=u'', stdout=[cmd])
+
+    def test_concurrent_calls(self):
+        """Check concurrent calls of several methods on the same classes
+        build and report their own commands
+        """
+        calls = [
+            (Repository.synchronize, {u'id': 1}, u'repository synchronize'),
+            (Repository.upload_content, {u'id': 2},
+             u'repository upload-content'),
+            (Org.list, {u'search': u'foo'}, u'organization list'),
+            (Org.add_domain, {u'id': 3}, u'organization add-domain'),
+            (Org.update, {u'id': 4}, u'organization update'),
+        ]
+
+        def run(index):
+            method, options, expected = calls[index % len(calls)]
+            options = dict(options, index=index)
+            if index % 7 == 0:
+                options[u'fail'] = True
+                try:
+                    method(options)
+                except CLIReturnCodeError as err:
+                    return expected, err.msg
+                return expected, None
+            return expected, method(options)[0]
+
+        pool = ThreadPool(16)
+        try:
+            results = pool.map(run, range(3000))
+        finally:
+            pool.close()
+            pool.join()
+        for index, (expected, output) in enumerate(results):
+            if index % 7 == 0:
+                self.assertIn(u'Command "{0}"'.format(expected), output)
+            else:
+                self.assertTrue(output.startswith(expected + u' '), output)
+                self.assertIn(u'--index="{0}"'.format(index), output)
+
+
+class ExecuteIterCSVTestCase(unittest2.TestCase):
+    """Tests for streaming the CSV output of CLI commands"""
+
+    def setUp(self):
+        settings_patcher = mock.patch('robottelo.cli.base.settings')
+        self.settings = settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+        self.settings.locale = 'en_US'
+        self.settings.hammer_json_output = False
+        self.settings.hammer_cache_ttl = 0
+        self.settings.server.admin_username = 'admin'
+        self.settings.server.admin_password = 'password'
+        command_patcher = mock.patch('robottelo.cli.base.ssh.command')
+        self.command = command_patcher.start()
+        self.addCleanup(command_patcher.stop)
+        self.output = [u'Id,Name', u'1,first', u'2,second', u'']
+        self.return_code = 0
+        self.command.side_effect = self.fake_command
+
+        class Org(Base):
+            command_base = 'organization'
+            command_requires_org = False
+        self.org = Org
+
+    def fake_command(self, cmd, stdout_callback=None, **kwargs):
+        """Stream the output lines before returning the response"""
+        for line in self.output:
+            stdout_callback(line)
+        return mock.Mock(
+            return_code=self.return_code, stderr=u'', stdout=self.output)
+
+    def test_lazy_list(self):
+        """Check the lazy list yields the rows of the CSV output"""
+        rows = self.org.list({u'search': u'foo'}, lazy=True)
+        self.assertEqual(
+            list(rows),
+            [{u'id': u'1', u'name': u'first'},
+             {u'id': u'2', u'name': u'second'}]
+        )
+        cmd = self.command.call_args[0][0].decode('utf-8')
+        self.assertEqual(
+            cmd,
+            u'LANG=en_US hammer -v -u admin -p password --output=csv '
+            u'organization list --search="foo" --per-page="10000"'
+        )
+
+    def test_stop_early(self):
+        """Check the caller can stop after the first row"""
+        rows = self.org.execute_iter_csv(u'organization list')
+        self.assertEqual(next(rows), {u'id': u'1', u'name': u'first'})
+        rows.close()
+
+    def test_error_raised_after_rows(self):
+        """Check a failed command raises once its output is consumed"""
+        self.output = [u'']
+        self.return_code = 1
+        rows = self.org.execute_iter_csv(u'organization list')
+        with self.assertRaises(CLIReturnCodeError):
+            list(rows)
+
+    def test_ssh_error_raised(self):
+        """Check ssh errors are raised to the caller"""
+        self.command.side_effect = ssh.SSHCommandTimeoutError('timeout')
+        with self.assertRaises(ssh.SSHCommandTimeoutError):
+            list(self.org.execute_iter_csv(u'organization list'))
+
+
+class SkipCreateInfoTestCase(unittest2.TestCase):
+    """Tests for returning the create output instead of running info"""
+
+    def setUp(self):
+        class Organization(Base):
+            command_base = 'organization'
+            command_requires_org = False
+        self.org = Organization
+        for name in ('execute', 'info'):
+            patcher = mock.patch.object(Organization, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.execute.return_value = [
+            {u'message': u'Organization created', u'id': u'1',
+             u'name': u'org'}]
+        self.info.return_value = {u'id': u'1', u'name': u'org'}
+
+    def test_create_output_used(self):
+        """Check info is skipped when the create output holds the fields"""
+        with Base.skip_create_info((u'id', u'name')):
+            result = self.org.create({u'name': u'org'})
+        self.assertEqual(result[u'message'], u'Organization created')
+        self.info.assert_not_called()
+
+    def test_missing_field(self):
+        """Check info is run when a field is missing from the create output"""
+        with Base.skip_create_info((u'id', u'label')):
+            result = self.org.create({u'name': u'org'})
+        self.assertEqual(result, self.info.return_value)
+        self.info.assert_called_once_with({u'id': u'1'})
+
+    def test_info_run_outside_context(self):
+        """Check info is run again once the context is left"""
+        with Base.skip_create_info((u'id',)):
+            pass
+        self.org.create({u'name': u'org'})
+        self.info.assert_called_once_with({u'id': u'1'})
+
+
+class IterListTestCase(unittest2.TestCase):
+    """Tests for listing entities one page at a time"""
+
+    def setUp(self):
+        class Organization(Base):
+            command_base = 'organization'
+            command_requires_org = False
+        self.org = Organization
+        self.entities = [{u'id': six.text_type(i)} for i in range(1, 6)]
+        list_patcher = mock.patch.object(
+            Organization, 'list', side_effect=self.fake_list)
+        self.list = list_patcher.start()
+        self.addCleanup(list_patcher.stop)
+
+    def fake_list(self, options, per_page=True):
+        """Return the page of entities requested"""
+        start = (options[u'page'] - 1) * options[u'per-page']
+        return self.entities[start:start + options[u'per-page']]
+
+    def requested_pages(self):
+        return [call[0][0][u'page'] for call in self.list.call_args_list]
+
+    def test_iter_list(self):
+        """Check all pages are requested until a short one"""
+        options = {u'search': u'foo'}
+        self.assertEqual(
+            list(self.org.iter_list(options, page_size=2)), self.entities)
+        self.assertEqual(self.requested_pages(), [1, 2, 3])
+        self.list.assert_called_with(
+            {u'search': u'foo', u'page': 3, u'per-page': 2}, per_page=False)
+        self.assertEqual(options, {u'search': u'foo'})
+
+    def test_iter_list_empty_last_page(self):
+        """Check the iteration stops on an empty page"""
+        self.entities = self.entities[:4]
+        self.assertEqual(
+            list(self.org.iter_list(page_size=2)), self.entities)
+        self.assertEqual(self.requested_pages(), [1, 2, 3])
+
+    def test_iter_list_prefetch(self):
+        """Check pages are prefetched and all entities returned in order"""
+        self.assertEqual(
+            list(self.org.iter_list(page_size=2, prefetch=True)),
+            self.entities
+        )
+        self.assertEqual(sorted(self.requested_pages()), [1, 2, 3])
+
+    def test_iter_list_stop_early(self):
+        """Check no more pages are requested once the caller stopped"""
+        for entity in self.org.iter_list(page_size=2):
+            if entity[u'id'] == u'2':
+                break
+        self.assertEqual(self.requested_pages(), [1])
+
+    def test_iter_list_prefetch_error(self):
+        """Check errors of prefetched pages are raised to the caller"""
+        self.list.side_effect = [
+            self.entities[:2], CLIReturnCodeError(1, u'error', u'msg')]
+        entities = self.org.iter_list(page_size=2, prefetch=True)
+        self.assertEqual(next(entities), self.entities[0])
+        self.assertEqual(next(entities), self.entities[1])
+        with self.assertRaises(CLIReturnCodeError):
+            next(entities)
+
+    def test_iter_list_invalid_page_size(self):
+        """Check the page size must be positive"""
+        with self.assertRaises(CLIError):
+            list(self.org.iter_list(page_size=0))
+
+
 class CLIErrorTests(unittest2.TestCase):
     """Tests for the CLIError cli class"""
 
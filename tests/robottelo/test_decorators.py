@@ -6,6 +6,7 @@ from fauxfactory import gen_integer
 from unittest2 import SkipTest, TestCase
 
 from robottelo import decorators
+from robottelo.decorators.object_cache import ObjectCache
 from robozilla import decorators as robozilla_decorators
 from robottelo.config.base import BugzillaSettings
 from robottelo.constants import BZ_CLOSED_STATUSES, BZ_OPEN_STATUSES
@@ -707,36 +708,79 @@ class CacheableTestCase(TestCase):
     """Tests for :func:`robottelo.decorators.cacheable`."""
 
     def setUp(self):
-        self.object_cache_patcher = mock.patch.dict(
-            'robottelo.decorators.OBJECT_CACHE')
+        self.object_cache_patcher = mock.patch(
+            'robottelo.decorators.OBJECT_CACHE', ObjectCache(max_size=10))
         self.object_cache = self.object_cache_patcher.start()
+        self.settings_patcher = mock.patch('robottelo.decorators.settings')
+        self.settings = self.settings_patcher.start()
+        self.settings.server.hostname = 'example.com'
+        self.settings.object_cache_validate = True
 
         def make_foo(options):
-            return {'id': 42}
+            return {'id': 42, 'options': options}
 
         self.make_foo = decorators.cacheable(make_foo)
 
     def tearDown(self):
         self.object_cache_patcher.stop()
+        self.settings_patcher.stop()
+
+    def cache_key(self, options=None):
+        return ObjectCache.make_key('foo', options, 'example.com')
 
     def test_build_cache(self):
         """Create a new object and add it to the cache."""
         obj = self.make_foo(cached=True)
-        self.assertEqual(decorators.OBJECT_CACHE, {'foo': {'id': 42}})
-        self.assertEqual(id(decorators.OBJECT_CACHE['foo']), id(obj))
+        self.assertEqual(
+            self.object_cache.get(self.cache_key()), (True, obj))
 
     def test_return_from_cache(self):
         """Return an already cached object."""
         cache_obj = {'id': 42}
-        decorators.OBJECT_CACHE['foo'] = cache_obj
+        self.object_cache.set(self.cache_key(), cache_obj)
         obj = self.make_foo(cached=True)
         self.assertEqual(id(cache_obj), id(obj))
 
     def test_create_and_not_add_to_cache(self):
         """Create a new object and not add it to the cache."""
         self.make_foo(cached=False)
-        self.assertNotIn('foo', decorators.OBJECT_CACHE)
-        self.assertEqual(decorators.OBJECT_CACHE, {})
+        self.assertEqual(self.object_cache.get_stats()['entries'], 0)
+
+    def test_options_in_key(self):
+        """Objects created with different options are cached apart."""
+        first = self.make_foo({'name': 'first'}, cached=True)
+        second = self.make_foo({'name': 'second'}, cached=True)
+        self.assertNotEqual(id(first), id(second))
+        self.assertEqual(
+            id(self.make_foo({'name': 'first'}, cached=True)), id(first))
+
+    def test_hostname_in_key(self):
+        """Objects created on another server are not reused."""
+        first = self.make_foo(cached=True)
+        self.settings.server.hostname = 'other.example.com'
+        self.assertNotEqual(id(self.make_foo(cached=True)), id(first))
+
+    def test_validate(self):
+        """Objects which are not valid anymore are created again."""
+        validate = mock.Mock(return_value=True)
+        make_foo = decorators.cacheable(validate=validate)(
+            lambda options: {'id': 42})
+        first = make_foo(cached=True)
+        self.assertEqual(id(make_foo(cached=True)), id(first))
+        validate.assert_called_once_with(first)
+        validate.return_value = False
+        self.assertNotEqual(id(make_foo(cached=True)), id(first))
+        self.assertEqual(self.object_cache.get_stats()['invalidations'], 1)
+
+    def test_validate_disabled(self):
+        """Objects are not validated if the setting is disabled."""
+        self.settings.object_cache_validate = False
+        validate = mock.Mock(return_value=False)
+        make_foo = decorators.cacheable(validate=validate)(
+            lambda options: {'id': 42})
+        first = make_foo(cached=True)
+        self.assertEqual(id(make_foo(cached=True)), id(first))
+        validate.assert_not_called()
 
 
 class RmBugIsOpenTestCase(TestCase):
@@ -0,0 +1,165 @@
+"""Tests for module ``robottelo.entity_pool``."""
+import os
+import shutil
+import tempfile
+import time
+
+import six
+from unittest2 import TestCase
+
+from robottelo import entity_pool
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from robottelo.entity_pool import (
+    EntityPool,
+    EntityPoolError,
+    EntityPoolFiller,
+)
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+class EntityPoolTestCase(TestCase):
+    """Tests for :class:`robottelo.entity_pool.EntityPool`."""
+
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_dir)
+        pools_patcher = mock.patch.object(entity_pool, 'POOLS', {})
+        pools_patcher.start()
+        self.addCleanup(pools_patcher.stop)
+        self.built = 0
+        self.destroyed = []
+
+    def build(self):
+        self.built += 1
+        return {'number': self.built}
+
+    def destroy(self, data):
+        self.destroyed.append(data['number'])
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('size', 2)
+        kwargs.setdefault('max_age', 3600)
+        kwargs.setdefault('scope', 'test_entity_pool')
+        return EntityPool(
+            'test', self.build, self.destroy,
+            storage_handler=FileStorageHandler(root_dir=self.root_dir),
+            **kwargs
+        )
+
+    def ready_items(self, pool):
+        return (pool.storage.get(pool.key) or {'ready': []})['ready']
+
+    def test_fill_and_lease(self):
+        """Leased items are the ones built by fill, in order"""
+        pool = self.make_pool()
+        self.assertEqual(pool.fill(), 2)
+        self.assertEqual(pool.fill(), 0)
+        first = pool.lease()
+        second = pool.lease()
+        self.assertEqual(
+            [first['data'], second['data']], [{'number': 1}, {'number': 2}])
+        self.assertEqual(self.ready_items(pool), [])
+        self.assertEqual(
+            sorted(pool.storage.get(pool.key)['leased']),
+            sorted([first['id'], second['id']])
+        )
+
+    def test_lease_empty_pool(self):
+        """Leasing from an empty pool builds an item"""
+        pool = self.make_pool()
+        self.assertEqual(pool.lease()['data'], {'number': 1})
+
+    def test_release(self):
+        """Released items are destroyed unless reused"""
+        pool = self.make_pool()
+        pool.fill()
+        first, second = pool.lease(), pool.lease()
+        pool.release(first)
+        self.assertEqual(self.destroyed, [1])
+        pool.release(second, reuse=True)
+        self.assertEqual(self.destroyed, [1])
+        self.assertEqual(pool.lease()['data'], {'number': 2})
+        self.assertEqual(pool.storage.get(pool.key)['leased'].keys(),
+                         {second['id']: None}.keys())
+
+    def test_expired_items_destroyed(self):
+        """Items older than max_age are destroyed instead of being leased"""
+        pool = self.make_pool(max_age=1)
+        pool.fill()
+        with mock.patch('robottelo.entity_pool.time.time',
+                        return_value=time.time() + 2):
+            item = pool.lease()
+        self.assertEqual(item['data'], {'number': 3})
+        self.assertEqual(self.destroyed, [1, 2])
+
+    def test_fill_reservations(self):
+        """Builds in progress count as pool items"""
+        pool = self.make_pool()
+        pool._update_state(
+            lambda state: state['building'].update({'other': time.time()}))
+        self.assertEqual(pool.fill(), 1)
+
+    def test_fill_build_error(self):
+        """A failed build releases its reservation"""
+        pool = self.make_pool(size=1)
+        pool.build = mock.Mock(side_effect=ValueError('failed'))
+        self.assertEqual(pool.fill(), 0)
+        self.assertEqual(pool.storage.get(pool.key)['building'], {})
+
+    def test_drain(self):
+        """Drain destroys all the ready items"""
+        pool = self.make_pool()
+        pool.fill()
+        self.assertEqual(pool.drain(), 2)
+        self.assertEqual(self.destroyed, [1, 2])
+        self.assertEqual(self.ready_items(pool), [])
+
+    def test_disabled(self):
+        """Without storage each lease builds and each release destroys"""
+        pool = EntityPool('test', self.build, self.destroy)
+        with mock.patch.object(
+                entity_pool, 'is_shared_function_enabled', return_value=False):
+            self.assertEqual(pool.fill(), 0)
+            item = pool.lease()
+            pool.release(item, reuse=True)
+        self.assertEqual(self.destroyed, [1])
+
+    def test_duplicate_name(self):
+        """Pool names are unique"""
+        self.make_pool()
+        with self.assertRaises(EntityPoolError):
+            self.make_pool()
+
+    def test_filler(self):
+        """The filler process fills the pools until stopped"""
+        pool = self.make_pool()
+        filler = EntityPoolFiller(['test'], interval=0.1)
+        filler.start()
+        try:
+            for _ in range(100):
+                if len(self.ready_items(pool)) == 2:
+                    break
+                time.sleep(0.1)
+        finally:
+            filler.stop(10)
+        self.assertFalse(filler.is_alive())
+        self.assertEqual(len(self.ready_items(pool)), 2)
+
+    def test_filler_scope_resolved_in_parent(self):
+        """The filler fills the pool key of the process which started it,
+        even when the scope depends on the process"""
+        pool = self.make_pool(scope=lambda: str(os.getpid()))
+        filler = EntityPoolFiller(['test'], interval=0.1)
+        filler.start()
+        try:
+            for _ in range(100):
+                if len(self.ready_items(pool)) == 2:
+                    break
+                time.sleep(0.1)
+        finally:
+            filler.stop(10)
+        self.assertEqual(len(self.ready_items(pool)), 2)
@@ -12,6 +12,8 @@ from robottelo.decorators.func_locker import (
     locking_function,
     set_default_scope,
     LOCK_FILE_NAME_EXT,
+    LOCK_SEMAPHORE,
+    LOCK_SHARED,
     TEMP_FUNC_LOCK_DIR,
     TEMP_ROOT_DIR,
     FunctionLockerError,
@@ -202,6 +204,50 @@ def simple_scoped_locking_function():
     return None
 
 
+@lock_function(mode=LOCK_SHARED)
+def simple_shared_locked_function(index=None):
+    """Hold the shared lock for a while and return the time it was held"""
+    start = time.time()
+    time.sleep(0.3)
+    return start, time.time()
+
+
+def simple_exclusive_locking_function(index=None):
+    """Hold the lock of simple_shared_locked_function exclusively"""
+    with locking_function(simple_shared_locked_function):
+        start = time.time()
+        time.sleep(0.1)
+        end = time.time()
+    return start, end
+
+
+@lock_function
+def simple_semaphore_function():
+    """Only used as a semaphore name"""
+
+
+def simple_semaphore_locking_function(index=None):
+    """Hold a slot of a semaphore of size 2 and return it with the time it
+    was held
+    """
+    with locking_function(simple_semaphore_function, mode=LOCK_SEMAPHORE,
+                          size=2) as slot:
+        start = time.time()
+        time.sleep(0.2)
+        end = time.time()
+    return slot, start, end
+
+
+def simple_recursive_shared_function():
+    """Try to lock exclusively a function locked in shared mode by the same
+    process, an exception should be expected
+    """
+    with locking_function(simple_shared_locked_function, mode=LOCK_SHARED):
+        with locking_function(simple_shared_locked_function):
+            pass
+    return 'I should not be reached'
+
+
 def simple_function_not_locked():
     """This function do nothing, when called with locking, exception must be
     raised that this function is not locked
@@ -456,3 +502,71 @@ class FuncLockerTestCase(TestCase):
                 pass
 
         self.assertIn('Cannot ensure locking', str(context.exception))
+
+    def test_shared_lock_in_multiprocess(self):
+        """Ensure that shared locks are held at the same time by different
+        processes"""
+        results = self.pool.map(simple_shared_locked_function, range(4))
+        latest_start = max(start for start, _ in results)
+        earliest_end = min(end for _, end in results)
+        self.assertLess(latest_start, earliest_end)
+
+    def test_exclusive_waits_for_shared(self):
+        """Ensure that an exclusive lock is never held with a shared one"""
+        shared = self.pool.map_async(simple_shared_locked_function, range(3))
+        time.sleep(0.05)
+        exclusive = self.pool.map_async(
+            simple_exclusive_locking_function, range(2))
+        periods = [(start, end, 'shared') for start, end in shared.get(10)]
+        periods.extend(
+            (start, end, 'exclusive') for start, end in exclusive.get(10))
+        for start, end, mode in periods:
+            if mode != 'exclusive':
+                continue
+            for other_start, other_end, _ in periods:
+                if (other_start, other_end) == (start, end):
+                    continue
+                self.assertTrue(other_end <= start or other_start >= end)
+
+    def test_semaphore_in_multiprocess(self):
+        """Ensure that at most size processes hold a semaphore, each one in
+        its own slot"""
+        results = self.pool.map(simple_semaphore_locking_function, range(6))
+        self.assertEqual({slot for slot, _, _ in results}, {0, 1})
+        # sweep the start and end events, the ends first at the same time
+        events = sorted(
+            [(start, 1, slot) for slot, start, _ in results] +
+            [(end, 0, slot) for slot, _, end in results]
+        )
+        held_slots = set()
+        max_holders = 0
+        for _, is_start, slot in events:
+            if is_start:
+                self.assertNotIn(slot, held_slots)
+                held_slots.add(slot)
+                max_holders = max(max_holders, len(held_slots))
+            else:
+                held_slots.discard(slot)
+        self.assertLessEqual(max_holders, 2)
+
+    def test_recursive_shared_function(self):
+        """Ensure that locking exclusively a function locked in shared mode by
+        the same process is detected"""
+        res = self.pool.apply_async(simple_recursive_shared_function, ())
+        with self.assertRaises(FunctionLockerError) as context:
+            try:
+                res.get(timeout=5)
+            except multiprocessing.TimeoutError:
+                self.fail('function lock recursion not detected')
+
+        self.assertIn('recursion detected', str(context.exception))
+
+    def test_negative_lock_mode(self):
+        """Ensure that unknown modes and semaphores without size are
+        rejected"""
+        with self.assertRaises(FunctionLockerError):
+            lock_function(simple_function_not_locked, mode='unknown')
+        with self.assertRaises(FunctionLockerError):
+            with locking_function(simple_semaphore_function,
+                                  mode=LOCK_SEMAPHORE):
+                pass
@@ -1,15 +1,24 @@
 # coding: utf-8
 
+import json
 import multiprocessing
 import os
+import shutil
+import socket
+import tempfile
+import threading
 import time
 
 
+import six
 from fauxfactory import gen_integer, gen_string
-from unittest2 import TestCase
+from unittest2 import TestCase, skipIf
 
+from robottelo.decorators.func_shared import base
+from robottelo.decorators.func_shared.base import BaseStorageHandler
 from robottelo.decorators.func_shared.shared import (
     _set_configured,
+    _SharedFunction,
     set_default_scope,
     enable_shared_function,
     shared,
@@ -17,10 +26,28 @@ from robottelo.decorators.func_shared.shared import (
     _NAMESPACE_SCOPE_KEY_TYPE,
 )
 from robottelo.decorators.func_shared.file_storage import (
+    FileStorageHandler,
     get_temp_dir,
     TEMP_ROOT_DIR,
     TEMP_FUNC_SHARED_DIR,
 )
+from robottelo.decorators.func_shared.memory_storage import (
+    MemoryStorageHandler)
+from robottelo.decorators.func_shared.redis_storage import (
+    get_owner_id,
+    LeaseLockError,
+    RedisLeaseLock,
+    RedisStorageHandler,
+)
+from robottelo.decorators.func_shared.sqlite_storage import (
+    SQLiteStorageError,
+    SQLiteStorageHandler,
+)
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
 
 DEFAULT_POOL_SIZE = 8
 SIMPLE_TIMEOUT_VALUE = 3
@@ -527,3 +554,322 @@ class FunctionSharedTestCase(TestCase):
             inc_string_2 = basic_shared_counter_string(
                 suffix=suffix, prefix=prefix, counter=counter_value)
             self.assertEqual(inc_string, inc_string_2)
+
+
+class StorageEncodingTestCase(TestCase):
+    """Tests for the stored values encodings"""
+
+    def setUp(self):
+        self.addCleanup(setattr, base, 'ENCODING', base.ENCODING)
+        self.large_value = {'entities': [
+            {'id': index, 'name': 'entity_{0}'.format(index)}
+            for index in range(200)
+        ]}
+
+    def test_json_encoding(self):
+        """Values are stored as plain json by default"""
+        base.ENCODING = 'json'
+        encoded = BaseStorageHandler.encode(self.large_value)
+        self.assertTrue(encoded.startswith('{'))
+        self.assertEqual(BaseStorageHandler.decode(encoded), self.large_value)
+
+    def test_zlib_encoding(self):
+        """Large values are compressed, small ones are kept as json"""
+        base.ENCODING = 'zlib'
+        encoded = BaseStorageHandler.encode(self.large_value)
+        self.assertTrue(encoded.startswith('zlib:'))
+        self.assertLess(len(encoded), len(json.dumps(self.large_value)))
+        self.assertEqual(BaseStorageHandler.decode(encoded), self.large_value)
+        self.assertEqual(
+            BaseStorageHandler.decode(encoded.encode('ascii')),
+            self.large_value
+        )
+        self.assertEqual(BaseStorageHandler.encode({'a': 1}), '{"a": 1}')
+
+    @skipIf(base.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_encoding(self):
+        """Values are packed with msgpack and compressed if large"""
+        base.ENCODING = 'msgpack'
+        encoded = BaseStorageHandler.encode(self.large_value)
+        self.assertTrue(encoded.startswith('msgpack+zlib:'))
+        self.assertEqual(BaseStorageHandler.decode(encoded), self.large_value)
+        encoded = BaseStorageHandler.encode({'a': 1})
+        self.assertTrue(encoded.startswith('msgpack:'))
+        self.assertEqual(BaseStorageHandler.decode(encoded), {'a': 1})
+
+    def test_decode_any_encoding(self):
+        """Values stored with an other encoding are still decoded"""
+        base.ENCODING = 'zlib'
+        encoded = BaseStorageHandler.encode(self.large_value)
+        base.ENCODING = 'json'
+        self.assertEqual(BaseStorageHandler.decode(encoded), self.large_value)
+
+
+class MemoryStorageTestCase(TestCase):
+    """Tests for the process memory tier of the shared functions"""
+
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_dir)
+        self.storage = FileStorageHandler(root_dir=self.root_dir)
+        self.memory = MemoryStorageHandler()
+        self.calls = []
+
+    def _function(self, index=0):
+        self.calls.append(index)
+        return {'index': index}
+
+    def _shared_function(self, index=0):
+        return _SharedFunction(
+            'some_key', self._function, kwargs={'index': index},
+            storage_handler=self.storage, memory_storage=self.memory)
+
+    def test_memory_expiry(self):
+        """Values are dropped after their timeout"""
+        self.memory.set('key', {'a': 1}, timeout=1)
+        value = self.memory.get('key')
+        self.assertEqual(value, {'a': 1})
+        # the caller can not modify the kept value
+        value['a'] = 2
+        self.assertEqual(self.memory.get('key'), {'a': 1})
+        time.sleep(1.1)
+        self.assertIsNone(self.memory.get('key'))
+
+    def test_ready_value_read_without_lock(self):
+        """Once ready, the value is read without taking the storage lock"""
+        self.assertEqual(self._shared_function(1)(), {'index': 1})
+        with mock.patch.object(self.storage, 'lock') as lock:
+            self.assertEqual(self._shared_function(2)(), {'index': 1})
+            self.memory.clear()
+            self.assertEqual(self._shared_function(3)(), {'index': 1})
+        lock.assert_not_called()
+        self.assertEqual(self.calls, [1])
+
+    def test_memory_value_used_first(self):
+        """The value kept in memory is read before the storage one"""
+        self._shared_function(1)()
+        with mock.patch.object(self.storage, 'get') as get:
+            self.assertEqual(self._shared_function(2)(), {'index': 1})
+        get.assert_not_called()
+
+
+def sqlite_locked_counter(path):
+    """Increment the counter stored in the sqlite database at path, with the
+    key locked"""
+    storage = SQLiteStorageHandler(path=path)
+    with storage.lock('counter'):
+        value = storage.get('counter') or 0
+        time.sleep(0.01)
+        storage.set('counter', value + 1)
+    return value
+
+
+class SQLiteStorageTestCase(TestCase):
+    """Tests for the sqlite storage handler"""
+
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_dir)
+        self.path = os.path.join(self.root_dir, 'shared.sqlite')
+        self.storage = SQLiteStorageHandler(path=self.path, lock_timeout=2)
+
+    def test_get_set(self):
+        """Values are written and read back"""
+        self.assertIsNone(self.storage.get('key'))
+        self.storage.set('key', {'state': 'READY', 'result': [1, 2]})
+        self.assertEqual(
+            self.storage.get('key'), {'state': 'READY', 'result': [1, 2]})
+        self.storage.delete('key')
+        self.assertIsNone(self.storage.get('key'))
+
+    def test_lock_multiprocess(self):
+        """The lock is held by one process at a time"""
+        pool = multiprocessing.Pool(DEFAULT_POOL_SIZE)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.terminate)
+        results = pool.map(sqlite_locked_counter, [self.path] * 20)
+        self.assertEqual(sorted(results), list(range(20)))
+        self.assertEqual(self.storage.get('counter'), 20)
+
+    def test_lock_timeout(self):
+        """A key locked by a running process can not be locked"""
+        self.storage.set('key', 1)
+        self.storage.connection.execute(
+            'UPDATE shared_values SET lock_token = ?, lock_pid = ?'
+            ' WHERE key = ?', ('other', os.getppid(), 'key'))
+        with self.assertRaises(SQLiteStorageError):
+            with self.storage.lock('key', timeout=0.3):
+                pass
+
+    def test_dead_process_lock_taken_over(self):
+        """The lock of a dead process is taken over, and the dead process
+        can not write the value anymore"""
+        process = multiprocessing.Process(target=time.sleep, args=(0,))
+        process.start()
+        process.join()
+        self.storage.set('key', 1)
+        self.storage.connection.execute(
+            'UPDATE shared_values SET lock_token = ?, lock_pid = ?'
+            ' WHERE key = ?', ('stale', process.pid, 'key'))
+        stale_storage = SQLiteStorageHandler(path=self.path)
+        stale_storage._tokens['key'] = 'stale'
+        with self.storage.lock('key'):
+            self.storage.set('key', 2)
+            with self.assertRaises(SQLiteStorageError):
+                stale_storage.set('key', 3)
+        self.assertEqual(self.storage.get('key'), 2)
+
+    def test_compare_and_set(self):
+        """Values are only written when the current value is the expected
+        one"""
+        self.assertTrue(self.storage.compare_and_set('key', None, [1]))
+        self.assertFalse(self.storage.compare_and_set('key', None, [2]))
+        self.assertFalse(self.storage.compare_and_set('key', [3], [2]))
+        self.assertTrue(self.storage.compare_and_set('key', [1], [1, 2]))
+        self.assertEqual(self.storage.get('key'), [1, 2])
+
+    def test_sweep_expired(self):
+        """The expired values are removed, not the locked or recent ones"""
+        self.storage.set('old', {'creation_datetime': '2000-01-01T00:00:00'})
+        self.storage.set('recent', {'a': 1})
+        self.storage.set(
+            'old_locked', {'creation_datetime': '2000-01-01T00:00:00'})
+        with self.storage.lock('old_locked'):
+            self.assertEqual(self.storage.vacuum(timeout=3600), 1)
+        self.assertIsNone(self.storage.get('old'))
+        self.assertEqual(self.storage.get('recent'), {'a': 1})
+        self.assertIsNotNone(self.storage.get('old_locked'))
+
+    def test_shared_function(self):
+        """The shared functions results are stored in the database"""
+        calls = []
+
+        def function(index=0):
+            calls.append(index)
+            return {'index': index}
+
+        for index in range(3):
+            shared_function = _SharedFunction(
+                'some_key', function, kwargs={'index': index},
+                storage_handler=self.storage,
+                memory_storage=MemoryStorageHandler()
+            )
+            self.assertEqual(shared_function(), {'index': 0})
+        self.assertEqual(calls, [0])
+        self.assertEqual(
+            self.storage.get('some_key')['state'], 'READY')
+
+    def test_shared_function_race(self):
+        """A worker whose lock was taken over does not overwrite the value
+        stored by the other worker, and returns it"""
+        calls = []
+
+        def function(index=0):
+            calls.append(index)
+            if index == 0:
+                # the lock of this worker is taken over while it runs
+                thread = threading.Thread(target=other_worker)
+                thread.start()
+                thread.join()
+            return {'index': index}
+
+        def new_shared_function(index):
+            return _SharedFunction(
+                'some_key', function, kwargs={'index': index},
+                storage_handler=self.storage,
+                memory_storage=MemoryStorageHandler()
+            )
+
+        def other_worker():
+            results.append(new_shared_function(1)())
+
+        results = []
+        with mock.patch(
+                'robottelo.decorators.func_shared.sqlite_storage'
+                '._is_process_alive', return_value=False):
+            self.assertEqual(new_shared_function(0)(), {'index': 1})
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(results, [{'index': 1}])
+        self.assertEqual(self.storage.get('some_key')['result'], {'index': 1})
+
+
+class RedisLeaseLockTestCase(TestCase):
+    """Tests for the redis lease locks, with a mocked redis client"""
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.scripts = {}
+
+        def register_script(script):
+            return self.scripts.setdefault(script, mock.MagicMock())
+
+        self.client.register_script.side_effect = register_script
+        self.client.incr.return_value = 7
+
+    def test_acquire_with_lease_and_token(self):
+        """The lock is set with its lease and given a fencing token"""
+        lock = RedisLeaseLock(self.client, 'key.lock', lease=2)
+        self.client.set.return_value = True
+        with lock:
+            self.assertEqual(lock.token, 7)
+            self.client.set.assert_called_once_with(
+                'key.lock', lock.value, nx=True, px=2000)
+        self.client.get.return_value = lock.value.encode('utf-8')
+        self.assertEqual(
+            RedisLeaseLock.get_owner(self.client, 'key.lock'), get_owner_id())
+
+    def test_owner_id(self):
+        """The owner id holds the host name and process id, and a random
+        token so that it does not collide with the processes of other hosts
+        using the same process id"""
+        owner_id = get_owner_id()
+        hostname, pid, token = owner_id.rsplit(':', 2)
+        self.assertEqual(hostname, socket.gethostname())
+        self.assertEqual(pid, str(os.getpid()))
+        self.assertTrue(token)
+        self.assertEqual(get_owner_id(), owner_id)
+        with mock.patch.dict(
+                'robottelo.decorators.func_shared.redis_storage._owner_ids',
+                clear=True):
+            self.assertNotEqual(get_owner_id(), owner_id)
+
+    def test_acquire_timeout(self):
+        """Waiting for a lock held by an other process times out"""
+        self.client.set.return_value = None
+        lock = RedisLeaseLock(self.client, 'key.lock', blocking_timeout=0.3)
+        self.assertFalse(lock.acquire(blocking=False))
+        with self.assertRaises(LeaseLockError):
+            lock.acquire()
+
+    def test_heartbeat_renews_lease(self):
+        """The lease is renewed while held, and lost if not renewed"""
+        self.client.set.return_value = True
+        lock = RedisLeaseLock(self.client, 'key.lock', lease=0.3)
+        renew = lock._renew_script
+        renew.return_value = 1
+        lock.acquire()
+        time.sleep(0.35)
+        self.assertGreaterEqual(renew.call_count, 2)
+        self.assertFalse(lock.lost)
+        renew.return_value = 0
+        time.sleep(0.2)
+        self.assertTrue(lock.lost)
+        lock.release()
+
+    def test_stale_holder_can_not_write(self):
+        """A value is not written once the lock lease was lost"""
+        with mock.patch(
+                'robottelo.decorators.func_shared.redis_storage.redis'
+        ) as redis_module:
+            redis_module.StrictRedis.return_value = self.client
+            storage = RedisStorageHandler()
+        self.client.set.return_value = True
+        with storage.lock('key'):
+            fenced_set = storage._leases['key']._fenced_set_script
+            fenced_set.return_value = 1
+            storage.set('key', {'a': 1})
+            fenced_set.return_value = 0
+            with self.assertRaises(LeaseLockError):
+                storage.set('key', {'a': 2})
+        storage.set('key', {'a': 3})
+        self.client.set.assert_called_with('key', '{"a": 3}')
@@ -1,7 +1,12 @@
 # -*- encoding: utf-8 -*-
 """Tests for Robottelo's hammer helpers"""
+import io
+import json
+import os
 import unittest2
 
+from glob import glob
+
 from robottelo.cli import hammer
 
 
@@ -39,6 +44,34 @@ class ParseCSVTestCase(unittest2.TestCase):
         )
 
 
+class IterCSVTestCase(unittest2.TestCase):
+    """Tests for parsing CSV hammer output incrementally"""
+
+    def test_rows_yielded_as_lines_are_read(self):
+        """Each row is yielded as soon as its line is read"""
+        read = []
+
+        def lines():
+            for line in (u'ID,Name', u'1,first', u'2,second'):
+                read.append(line)
+                yield line
+
+        rows = hammer.iter_csv(lines())
+        self.assertEqual(next(rows), {u'id': u'1', u'name': u'first'})
+        self.assertEqual(read, [u'ID,Name', u'1,first'])
+
+    def test_quoted_value_with_new_line(self):
+        """Quoted values can span several lines"""
+        self.assertEqual(
+            list(hammer.iter_csv([u'ID,Note', u'1,"first', u'line"', u''])),
+            [{u'id': u'1', u'note': u'first\nline'}]
+        )
+
+    def test_empty_output(self):
+        """An empty output has no rows"""
+        self.assertEqual(list(hammer.iter_csv([])), [])
+
+
 class ParseJSONTestCase(unittest2.TestCase):
     """Tests for parsing JSON hammer output"""
 
@@ -395,6 +428,52 @@ class ParseInfoTestCase(unittest2.TestCase):
             }
         )
 
+    def test_parse_recorded_outputs(self):
+        """Can parse the recorded info outputs of several entities"""
+        corpus = os.path.join(os.path.dirname(__file__), 'data', 'hammer_info')
+        paths = sorted(glob(os.path.join(corpus, '*.txt')))
+        self.assertTrue(paths)
+        for path in paths:
+            with io.open(path, encoding='utf-8') as handler:
+                lines = handler.read().split(u'\n')
+            expected_path = os.path.splitext(path)[0] + '.json'
+            with io.open(expected_path, encoding='utf-8') as handler:
+                expected = json.load(handler)
+            self.assertEqual(hammer.parse_info(lines), expected, path)
+
+    def test_parse_third_level(self):
+        """Can parse a third level of properties"""
+        output = [
+            'Content Information:',
+            '    Content View:',
+            '        ID:   10',
+            '        Name: Default Organization View',
+            '    Applicable Packages: 0',
+            '    Lifecycle Environment:',
+            '        ID:   1',
+        ]
+        self.assertEqual(
+            hammer.parse_info(output),
+            {
+                'content-information': {
+                    'content-view': {
+                        'id': '10',
+                        'name': 'Default Organization View',
+                    },
+                    'applicable-packages': '0',
+                    'lifecycle-environment': {'id': '1'},
+                },
+            }
+        )
+
+    def test_parse_json_nested_list(self):
+        """Keys are normalized and integers converted inside lists"""
+        self.assertEqual(
+            hammer.parse_json(
+                '[{"ID": 1, "Sub Items": [{"Item ID": 2, "Valid": true}]}]'),
+            [{u'id': u'1', u'sub-items': [{u'item-id': u'2', u'valid': True}]}]
+        )
+
     def test_parse_json_list(self):
         """Can parse a list in json"""
         self.assertEqual(
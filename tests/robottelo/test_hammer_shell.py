@@ -0,0 +1,204 @@
+# -*- encoding: utf-8 -*-
+"""Tests for Robottelo's hammer sessions"""
+import six
+import unittest2
+
+from robottelo.cli import hammer_shell
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+class MockSessionChannel(object):
+    """Channel answering each command sent with the configured outputs"""
+
+    def __init__(self, token, outputs):
+        self.token = token
+        self.outputs = list(outputs)
+        self.sent = []
+        self.closed = False
+        self.stdout = b''
+        self.stderr = b''
+
+    def sendall(self, data):
+        self.sent.append(data)
+        stdout, stderr, status = self.outputs.pop(0)
+        self.stdout += stdout + u'\n{0}:{1}\n'.format(
+            self.token, status).encode('utf-8')
+        self.stderr += stderr + u'\n{0}:\n'.format(self.token).encode('utf-8')
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        data, self.stdout = self.stdout[:size], self.stdout[size:]
+        return data
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        data, self.stderr = self.stderr[:size], self.stderr[size:]
+        return data
+
+    def exit_status_ready(self):
+        return self.closed
+
+    def recv_exit_status(self):
+        return 1
+
+    def close(self):
+        self.closed = True
+
+
+class MarkedStreamTestCase(unittest2.TestCase):
+    """Tests for splitting the hammer session streams"""
+
+    def test_marker_in_one_chunk(self):
+        stream = hammer_shell._MarkedStream(b'\ntoken:')
+        stream.feed(b'output\ntoken:0\n')
+        self.assertTrue(stream.complete)
+        self.assertEqual(stream.output, u'output')
+        self.assertEqual(stream.suffix, u'0')
+
+    def test_marker_split_across_chunks(self):
+        stream = hammer_shell._MarkedStream(b'\ntoken:')
+        for chunk in (b'out', b'put\nto', b'ken', b':12', b'\n'):
+            self.assertFalse(stream.complete)
+            stream.feed(chunk)
+        self.assertTrue(stream.complete)
+        self.assertEqual(stream.output, u'output')
+        self.assertEqual(stream.suffix, u'12')
+
+    def test_output_after_marker(self):
+        stream = hammer_shell._MarkedStream(b'\ntoken:')
+        with self.assertRaises(hammer_shell.HammerShellError):
+            stream.feed(b'output\ntoken:0\nmore')
+
+
+class HammerShellTestCase(unittest2.TestCase):
+    """Tests for running commands in a hammer session"""
+
+    def make_shell(self, outputs):
+        shell = hammer_shell.HammerShell(hostname='example.com')
+        shell._channel = MockSessionChannel(shell.token, outputs)
+        return shell
+
+    def test_run(self):
+        shell = self.make_shell([
+            (b'first', b'', 0),
+            (b'Error: second', b'', 65),
+        ])
+        result = shell.run(u'-v org list', timeout=10)
+        self.assertEqual(result.stdout, [u'first'])
+        self.assertEqual(result.return_code, 0)
+        result = shell.run(u'-v org info --id 1', timeout=10)
+        self.assertEqual(result.stdout, [u'Error: second'])
+        self.assertEqual(result.return_code, 65)
+        self.assertEqual(shell.commands_count, 2)
+        self.assertEqual(
+            shell._channel.sent[0], b'["-v org list"]\n')
+
+    def test_run_json_output(self):
+        shell = self.make_shell([(b'{"Id": 1}', b'', 0)])
+        result = shell.run(u'--output=json org info', 'json', timeout=10)
+        self.assertEqual(result.stdout, {u'id': u'1'})
+
+    def test_run_stopped_session(self):
+        shell = self.make_shell([])
+        shell.close()
+        with self.assertRaises(hammer_shell.HammerShellError) as context:
+            shell.run(u'org list', timeout=10)
+        self.assertFalse(context.exception.command_sent)
+
+    def test_protocol_error_after_command_sent(self):
+        shell = self.make_shell([(b'output', b'', 'not a status')])
+        with self.assertRaises(hammer_shell.HammerShellError) as context:
+            shell.run(u'org create --name test', timeout=10)
+        self.assertTrue(context.exception.command_sent)
+
+    def test_hammer_not_loaded(self):
+        """A session which can not run hammer fails on its first command"""
+        shell = self.make_shell([(b'', b'syntax error', 'error')])
+        with self.assertRaises(hammer_shell.HammerShellError) as context:
+            shell.run(u'org list', timeout=10)
+        self.assertFalse(context.exception.command_sent)
+
+    def test_hammer_error_after_first_command(self):
+        """A hammer run raising an exception in a working session returns
+        the error status"""
+        shell = self.make_shell([
+            (b'first', b'', 0),
+            (b'', b'undefined method', 'error'),
+        ])
+        shell.run(u'org list', timeout=10)
+        result = shell.run(u'org info --id 1', timeout=10)
+        self.assertEqual(result.return_code, 70)
+        self.assertEqual(result.stderr, u'undefined method')
+
+
+class HammerShellPoolTestCase(unittest2.TestCase):
+    """Tests for the pool of hammer sessions"""
+
+    @mock.patch('robottelo.cli.hammer_shell.HammerShell')
+    def test_reuse_session(self, shell_class):
+        pool = hammer_shell.HammerShellPool()
+        shell = shell_class.return_value
+        shell.key = ('example.com', None, None)
+        shell.alive = True
+        pool.run(u'org list', hostname='example.com')
+        pool.run(u'org list', hostname='example.com')
+        shell_class.assert_called_once_with(
+            'example.com', None, user=None, password=None)
+        self.assertEqual(shell.run.call_count, 2)
+
+    @mock.patch('robottelo.cli.hammer_shell.HammerShell')
+    def test_session_per_user(self, shell_class):
+        """The commands of different users do not share a session"""
+        pool = hammer_shell.HammerShellPool()
+
+        def make_shell(hostname, connection_timeout, user, password):
+            shell = mock.Mock(alive=True, key=(hostname, user, password))
+            return shell
+        shell_class.side_effect = make_shell
+        pool.run(u'-u admin -p secret org list', hostname='example.com',
+                 user='admin', password='secret')
+        pool.run(u'-u viewer -p secret org list', hostname='example.com',
+                 user='viewer', password='secret')
+        pool.run(u'-u admin -p secret org list', hostname='example.com',
+                 user='admin', password='secret')
+        self.assertEqual(
+            shell_class.call_args_list,
+            [mock.call('example.com', None, user='admin', password='secret'),
+             mock.call('example.com', None, user='viewer', password='secret')]
+        )
+
+    @mock.patch('robottelo.cli.hammer_shell.HammerShell')
+    def test_disable_on_first_command_failure(self, shell_class):
+        pool = hammer_shell.HammerShellPool()
+        shell = shell_class.return_value
+        shell.commands_count = 1
+        shell.run.side_effect = hammer_shell.HammerShellError('broken')
+        with self.assertRaises(hammer_shell.HammerShellError):
+            pool.run(u'org list', hostname='example.com')
+        self.assertTrue(pool.disabled)
+        shell.close.assert_called_once_with()
+        with self.assertRaises(hammer_shell.HammerShellError):
+            pool.run(u'org list', hostname='example.com')
+        shell_class.assert_called_once_with(
+            'example.com', None, user=None, password=None)
+
+    def test_disable_when_hammer_not_loaded(self):
+        """The pool is disabled when its sessions can not run hammer"""
+        pool = hammer_shell.HammerShellPool()
+
+        def start(shell):
+            shell._channel = MockSessionChannel(
+                shell.token, [(b'', b'syntax error', 'error')])
+        with mock.patch.object(hammer_shell.HammerShell, 'start', start):
+            with self.assertRaises(hammer_shell.HammerShellError) as context:
+                pool.run(u'org list', hostname='example.com')
+        self.assertFalse(context.exception.command_sent)
+        self.assertTrue(pool.disabled)
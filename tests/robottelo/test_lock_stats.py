@@ -0,0 +1,104 @@
+"""Tests for module ``robottelo.decorators.lock_stats``."""
+import os
+import shutil
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+from unittest2 import TestCase
+
+from robottelo.decorators import lock_stats
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+
+
+@contextmanager
+def slow_locker(wait=0, fail=False):
+    """A locker waiting wait seconds to acquire the lock"""
+    time.sleep(wait)
+    if fail:
+        raise IOError('lock timeout')
+    yield 'handler'
+
+
+class LockStatsTestCase(TestCase):
+    """Tests for the lock stats recording and report."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = lock_stats.start_session(
+            os.path.join(self.tmp_dir, 'stats.jsonl'))
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.addCleanup(lock_stats.stop_session)
+
+    def test_nothing_recorded_without_session(self):
+        """Locks are not recorded when no session was started"""
+        lock_stats.stop_session()
+        with lock_stats.timed('test', 'key', slow_locker()):
+            pass
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(lock_stats.get_report(), [])
+
+    def test_timed_records_wait_and_hold(self):
+        """The seconds waited for and held a lock are recorded"""
+        with lock_stats.timed('test', 'key', slow_locker(0.2),
+                              mode='shared') as handler:
+            self.assertEqual(handler, 'handler')
+            time.sleep(0.1)
+        records = lock_stats.read_records()
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record['kind'], 'test')
+        self.assertEqual(record['key'], 'key')
+        self.assertEqual(record['mode'], 'shared')
+        self.assertEqual(record['pid'], os.getpid())
+        self.assertTrue(record['acquired'])
+        self.assertGreaterEqual(record['wait'], 0.2)
+        self.assertGreaterEqual(record['hold'], 0.1)
+
+    def test_timed_records_failed_acquire(self):
+        """A lock that could not be acquired is recorded as not acquired"""
+        with self.assertRaises(IOError):
+            with lock_stats.timed('test', 'key', slow_locker(fail=True)):
+                pass
+        records = lock_stats.read_records()
+        self.assertEqual(len(records), 1)
+        self.assertFalse(records[0]['acquired'])
+
+    def test_timed_records_on_error(self):
+        """A lock released by an exception is recorded and the exception
+        raised"""
+        with self.assertRaises(ValueError):
+            with lock_stats.timed('test', 'key', slow_locker()):
+                raise ValueError
+        self.assertEqual(len(lock_stats.read_records()), 1)
+
+    def test_storage_lock_recorded(self):
+        """The shared function file storage locks are recorded"""
+        storage = FileStorageHandler(root_dir=self.tmp_dir)
+        with storage.lock('some_key') as handler:
+            storage.when_lock_acquired(handler)
+        records = lock_stats.read_records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['kind'], 'file_storage')
+        self.assertEqual(records[0]['key'], 'some_key')
+
+    def test_report(self):
+        """The most waited for locks come first with the total wait"""
+        records = [
+            dict(kind='test', key='a', pid=1, wait=1, hold=2, acquired=True),
+            dict(kind='test', key='b', pid=1, wait=3, hold=1, acquired=True),
+            dict(kind='test', key='b', pid=2, wait=2, hold=0,
+                 acquired=False),
+        ]
+        contentions = lock_stats.get_contentions(records)
+        self.assertEqual([c.key for c in contentions], ['b', 'a'])
+        self.assertEqual(contentions[0].count, 2)
+        self.assertEqual(contentions[0].failed, 1)
+        self.assertEqual(contentions[0].pids, 2)
+        self.assertEqual(contentions[0].wait, 5)
+        self.assertEqual(contentions[0].max_wait, 3)
+        lines = lock_stats.get_report(records, top=1)
+        self.assertEqual(len(lines), 2)
+        self.assertIn('6.00 worker-seconds lost waiting', lines[0])
+        self.assertIn('test b', lines[1])
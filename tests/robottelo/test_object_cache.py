@@ -0,0 +1,90 @@
+"""Tests for module ``robottelo.decorators.object_cache``."""
+import shutil
+import tempfile
+import time
+
+import six
+from unittest2 import TestCase
+
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from robottelo.decorators.object_cache import ObjectCache
+
+if six.PY2:
+    import mock
+else:
+    from unittest import mock
+
+
+class ObjectCacheTestCase(TestCase):
+    """Tests for :class:`robottelo.decorators.object_cache.ObjectCache`."""
+
+    def test_make_key(self):
+        """Keys depend on the factory, the options and the hostname"""
+        key = ObjectCache.make_key('org', {'name': 'a', 'label': 'b'}, 'host')
+        self.assertEqual(
+            key,
+            ObjectCache.make_key('org', {'label': 'b', 'name': 'a'}, 'host')
+        )
+        self.assertTrue(key.startswith('object_cache.org.'))
+        self.assertNotEqual(
+            key, ObjectCache.make_key('org', {'name': 'a'}, 'host'))
+        self.assertNotEqual(
+            key, ObjectCache.make_key('org', {'name': 'a', 'label': 'b'}))
+        self.assertNotEqual(
+            key,
+            ObjectCache.make_key('user', {'name': 'a', 'label': 'b'}, 'host')
+        )
+
+    def test_lru_eviction(self):
+        """The least recently used objects are evicted"""
+        cache = ObjectCache(max_size=2, ttl=0, storage='')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.get('c'), (True, 3))
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_ttl_expiration(self):
+        """Objects older than the ttl are not returned"""
+        cache = ObjectCache(max_size=2, ttl=10, storage='')
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), (True, 1))
+        with mock.patch('robottelo.decorators.object_cache.time.time',
+                        return_value=time.time() + 11):
+            self.assertEqual(cache.get('a'), (False, None))
+        stats = cache.get_stats()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_validate(self):
+        """Objects which are not valid anymore are dropped"""
+        cache = ObjectCache(max_size=2, ttl=0, storage='')
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a', validate=lambda obj: False),
+                         (False, None))
+        self.assertEqual(cache.get('a'), (False, None))
+
+    def test_shared_storage(self):
+        """Objects are shared through the storage"""
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir)
+        first = ObjectCache(
+            max_size=2, ttl=0, storage=FileStorageHandler(root_dir=root_dir))
+        second = ObjectCache(
+            max_size=2, ttl=0, storage=FileStorageHandler(root_dir=root_dir))
+        first.set('a', {'id': 1})
+        self.assertEqual(second.get('a'), (True, {'id': 1}))
+        self.assertEqual(second.get_stats()['shared_hits'], 1)
+        second.invalidate('a')
+        first.clear()
+        self.assertEqual(first.get('a'), (False, None))
+
+    def test_unknown_storage(self):
+        """Unknown storage handlers raise an error"""
+        cache = ObjectCache(storage='unknown')
+        with self.assertRaises(ValueError):
+            cache.set('a', 1)
@@ -3,6 +3,8 @@
 import os
 import paramiko
 import six
+import subprocess
+import threading
 
 from robottelo import ssh
 from unittest2 import TestCase
@@ -14,9 +16,19 @@ else:
 
 
 class MockChannel(object):
-    def __init__(self, ret, status_ready=True):
+    """A mock ``paramiko.Channel`` serving its output in small chunks."""
+    def __init__(self, ret, stdout=b'', stderr=b'', status_ready=True,
+                 chunk_size=5):
         self.ret = ret
+        self.stdout = stdout
+        self.stderr = stderr
+        self.chunk_size = chunk_size
+        self.eof_received = True
+        self.closed = False
         self.status_ready = status_ready
+        self.status_event = threading.Event()
+        if status_ready:
+            self.status_event.set()
 
     def recv_exit_status(self):
         return self.ret
@@ -24,16 +36,44 @@ class MockChannel(object):
     def exit_status_ready(self):
         return self.status_ready
 
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv(self, nbytes):
+        size = min(nbytes, self.chunk_size)
+        data, self.stdout = self.stdout[:size], self.stdout[size:]
+        return data
+
+    def recv_stderr(self, nbytes):
+        size = min(nbytes, self.chunk_size)
+        data, self.stderr = self.stderr[:size], self.stderr[size:]
+        return data
+
 
 class MockStdout(object):
-    def __init__(self, cmd, ret):
+    def __init__(self, cmd, channel):
         self.cmd = cmd
-        self.channel = MockChannel(ret=ret)
+        self.channel = channel
 
     def read(self):
         return self.cmd
 
 
+class MockTransport(object):
+    def __init__(self):
+        self.active = True
+        self.keepalive = None
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        self.keepalive = interval
+
+
 class MockSSHClient(object):
     """A mock ``paramiko.SSHClient`` object."""
     def __init__(self):
@@ -53,6 +93,9 @@ class MockSSHClient(object):
         self.key_filename = None
         self.password = None
         self.ret_code = 0
+        self.status_ready = True
+        self.stderr = ''
+        self.transport = MockTransport()
 
     def set_missing_host_key_policy(self, policy):  # pylint:disable=W0613
         """A no-op stub method."""
@@ -82,16 +125,31 @@ class MockSSHClient(object):
         """A no-op stub method."""
         self.close_ += 1
 
+    def get_transport(self):
+        return self.transport
+
     def exec_command(self, cmd, *args, **kwargs):
+        channel = MockChannel(
+            self.ret_code,
+            stdout=cmd.encode('utf-8'),
+            stderr=self.stderr.encode('utf-8'),
+            status_ready=self.status_ready,
+        )
         return (
             self.ret_code,
-            MockStdout(cmd, self.ret_code),
-            MockStdout('', self.ret_code)
+            MockStdout(cmd, channel),
+            MockStdout(self.stderr, channel)
         )
 
 
 class SSHTestCase(TestCase):
     """Tests for module ``robottelo.ssh``."""
+    def setUp(self):
+        ssh.close_connection_pool()
+
+    def tearDown(self):
+        ssh.close_connection_pool()
+
     @mock.patch('robottelo.ssh.settings')
     def test_get_connection_key(self, settings):
         """Test method ``get_connection`` using key file to connect to the
@@ -249,6 +307,105 @@ class SSHTestCase(TestCase):
             self.assertEquals(ret.stdout, u'ls -la')
             self.assertIsInstance(ret, ssh.SSHCommandResult)
 
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_command_timeout(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+
+        with ssh.get_connection() as connection:  # pylint:disable=W0212
+            connection.status_ready = False
+            with self.assertRaises(ssh.SSHCommandTimeoutError):
+                ssh.execute_command('sleep 10', connection, timeout=0.01)
+
+    def test_read_channel_closed_without_eof(self):
+        """A channel closed without end of file is read at once, even
+        without end time"""
+        channel = MockChannel(0, stdout=b'output', status_ready=False)
+        channel.eof_received = False
+        channel.closed = True
+        stdout_reader = ssh._LineReader()  # pylint:disable=W0212
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            ssh._read_channel(  # pylint:disable=W0212
+                channel, stdout_reader, ssh._LineReader())))
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [True])
+        stdout_reader.close()
+        self.assertEqual(stdout_reader.text, u'output')
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_command_filter_output(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+
+        with ssh.get_connection() as connection:  # pylint:disable=W0212
+            connection.stderr = u'\x1b[31mWarning\x1b[0m: caf\xe9\n'
+            ret = ssh.execute_command(
+                u'[INFO] rails\nname,value\n\x1b[32mcaf\xe9\x1b[0m,""\n',
+                connection
+            )
+            self.assertEqual(ret.stdout, [u'name,value', u'caf\xe9,', u''])
+            self.assertEqual(ret.stderr, u'Warning: caf\xe9\n')
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_command_callbacks(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        stdout_lines = []
+        stderr_lines = []
+
+        with ssh.get_connection() as connection:  # pylint:disable=W0212
+            connection.stderr = u'error line'
+            ret = ssh.execute_command(
+                u'first line\n[rails line]\nsecond line',
+                connection,
+                stdout_callback=stdout_lines.append,
+                stderr_callback=stderr_lines.append,
+            )
+        self.assertEqual(stdout_lines, [u'first line', u'second line'])
+        self.assertEqual(stdout_lines, ret.stdout)
+        self.assertEqual(stderr_lines, [u'error line'])
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_command_callbacks_keep_tail(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        stdout_lines = []
+        output = [u'line {0}'.format(index) for index in range(150)]
+
+        with ssh.get_connection() as connection:  # pylint:disable=W0212
+            ret = ssh.execute_command(
+                u'\n'.join(output),
+                connection,
+                stdout_callback=stdout_lines.append,
+                keep_output=False,
+            )
+        self.assertEqual(stdout_lines, output)
+        self.assertEqual(ret.stdout, output[-ssh._STREAM_TAIL_LINES:])
+
     @mock.patch('robottelo.ssh.settings')
     def test_command(self, settings):
         ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
@@ -310,3 +467,265 @@ class SSHTestCase(TestCase):
             ssh._call_paramiko_sshclient(),
             (paramiko.SSHClient, MockSSHClient)
         )
+
+
+class SSHConnectionPoolTestCase(TestCase):
+    """Tests for ``robottelo.ssh.SSHConnectionPool``."""
+    def setUp(self):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        ssh.close_connection_pool()
+        self.pool = ssh.SSHConnectionPool(max_idle=300, keepalive=30)
+
+    def tearDown(self):
+        ssh.close_connection_pool()
+
+    def test_reuse_connection(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.assertEqual(client.transport.keepalive, 30)
+        self.pool.release(client)
+        self.assertIs(
+            self.pool.acquire('example.com', 'nobody', 'pass', None), client)
+        self.assertEqual(client.connect_, 1)
+        self.assertEqual(client.close_, 0)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['handshakes'], 1)
+
+    def test_connections_keyed_by_credentials(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.pool.release(client)
+        other = self.pool.acquire('example.com', 'root', 'pass', None)
+        self.assertIsNot(other, client)
+        self.assertEqual(self.pool.get_stats()['misses'], 2)
+
+    def test_checked_out_connection_not_shared(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        other = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.assertIsNot(other, client)
+
+    def test_evict_dead_connection(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.pool.release(client)
+        client.transport.active = False
+        other = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.assertIsNot(other, client)
+        self.assertEqual(client.close_, 1)
+        self.assertEqual(self.pool.get_stats()['evictions'], 1)
+
+    def test_evict_idle_connection(self):
+        self.pool.max_idle = 0
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.pool.release(client)
+        with mock.patch('robottelo.ssh.time.time') as time_mock:
+            time_mock.return_value = 2 ** 40
+            other = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.assertIsNot(other, client)
+        self.assertEqual(client.close_, 1)
+
+    def test_discard_connection(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.pool.release(client, discard=True)
+        self.assertEqual(client.close_, 1)
+        self.assertEqual(self.pool.get_stats()['discarded'], 1)
+        self.assertIsNot(
+            self.pool.acquire('example.com', 'nobody', 'pass', None), client)
+
+    def test_close_all(self):
+        client = self.pool.acquire('example.com', 'nobody', 'pass', None)
+        self.pool.release(client)
+        self.pool.close_all()
+        self.assertEqual(client.close_, 1)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_command_reuses_connection(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool = True
+        settings.ssh_client.pool_max_idle = 300
+        settings.ssh_client.pool_keepalive = 30
+        ssh.command('ls -la')
+        ssh.command('ls -la')
+        stats = ssh.get_connection_pool().get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_command_without_pool(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool = False
+        ssh.command('ls -la')
+        self.assertIsNone(ssh._connection_pool)  # pylint:disable=W0212
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_pooled_connection_discarded_on_error(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.pool_max_idle = 300
+        settings.ssh_client.pool_keepalive = 30
+        with self.assertRaises(paramiko.SSHException):
+            with ssh.get_pooled_connection() as connection:
+                raise paramiko.SSHException('broken')
+        self.assertEqual(connection.close_, 1)
+        self.assertEqual(ssh.get_connection_pool().get_stats()['discarded'], 1)
+
+
+class FailingMockSSHClient(MockSSHClient):
+    """A mock ``paramiko.SSHClient`` failing to connect to ``bad.host``."""
+    def connect(self, hostname, *args, **kwargs):
+        if hostname == 'bad.host':
+            raise paramiko.SSHException('unable to connect')
+        super(FailingMockSSHClient, self).connect(hostname, *args, **kwargs)
+
+
+class HangingMockSSHClient(MockSSHClient):
+    """A mock ``paramiko.SSHClient`` whose commands never exit."""
+    def __init__(self):
+        super(HangingMockSSHClient, self).__init__()
+        self.status_ready = False
+
+
+class RunOnHostsTestCase(TestCase):
+    """Tests for ``robottelo.ssh.run_on_hosts``."""
+    def setUp(self):
+        ssh._call_paramiko_sshclient = FailingMockSSHClient  # noqa pylint:disable=W0212
+        ssh.close_connection_pool()
+
+    def tearDown(self):
+        ssh.close_connection_pool()
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_run_on_hosts(self, settings):
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool = False
+        hosts = ['host{0}'.format(i) for i in range(5)]
+        result = ssh.run_on_hosts(['ls', 'pwd'], hosts, max_workers=2)
+        self.assertEqual(list(result.results), hosts)
+        for host in hosts:
+            self.assertEqual(
+                [ret.stdout for ret in result.results[host]],
+                [[u'ls'], [u'pwd']]
+            )
+        self.assertEqual(result.succeeded, hosts)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.errors, {})
+        self.assertGreaterEqual(result.total_time, 0)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_run_on_hosts_partial_failure(self, settings):
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool = False
+        result = ssh.run_on_hosts('ls', ['good.host', 'bad.host'])
+        self.assertEqual(result.succeeded, ['good.host'])
+        self.assertEqual(result.failed, ['bad.host'])
+        self.assertEqual(result.results['bad.host'], [])
+        self.assertIsInstance(
+            result.errors['bad.host'], paramiko.SSHException)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_run_on_hosts_timeout(self, settings):
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool = False
+        ssh._call_paramiko_sshclient = HangingMockSSHClient  # noqa pylint:disable=W0212
+        result = ssh.run_on_hosts(['sleep 10'], ['host'], timeout=0.01)
+        self.assertIsInstance(
+            result.errors['host'], ssh.SSHCommandTimeoutError)
+
+
+class LocalShellMockSSHClient(MockSSHClient):
+    """A mock ``paramiko.SSHClient`` running the commands on a local shell."""
+    def exec_command(self, cmd, *args, **kwargs):
+        process = subprocess.Popen(
+            ['/bin/sh', '-c', cmd],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        stdout, stderr = process.communicate()
+        channel = MockChannel(
+            process.returncode, stdout=stdout, stderr=stderr, chunk_size=64)
+        return None, MockStdout(cmd, channel), MockStdout(cmd, channel)
+
+
+class ExecuteBatchTestCase(TestCase):
+    """Tests for ``robottelo.ssh.execute_batch``."""
+    def setUp(self):
+        self.connection = LocalShellMockSSHClient()
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_batch(self, settings):
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        results = ssh.execute_batch([
+            'echo first',
+            'printf "no new line"; echo error >&2; exit 3',
+            'printf "[rails line]\\nname,value\\n"',
+            'true',
+        ], self.connection)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(
+            [result.return_code for result in results], [0, 3, 0, 0])
+        self.assertEqual(results[0].stdout, [u'first', u''])
+        self.assertEqual(results[0].stderr, u'')
+        self.assertEqual(results[1].stdout, [u'no new line'])
+        self.assertEqual(results[1].stderr, u'error\n')
+        self.assertEqual(results[2].stdout, [u'name,value', u''])
+        self.assertEqual(results[3].stdout, u'')
+        for result in results:
+            self.assertIsInstance(result, ssh.SSHCommandResult)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_batch_output_format(self, settings):
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        plain, csv = ssh.execute_batch(
+            ['echo plain', 'printf "a,b\\n1,2"'], self.connection,
+            output_format='plain'
+        )
+        self.assertEqual(plain.stdout, u'plain\n')
+        self.assertEqual(csv.stdout, u'a,b\n1,2')
+        csv, = ssh.execute_batch(
+            ['printf "a,b\\n1,2"'], self.connection, output_format='csv')
+        self.assertEqual(csv.stdout, [{u'a': u'1', u'b': u'2'}])
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_batch_stop_on_error(self, settings):
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        results = ssh.execute_batch(
+            ['true', 'false', 'echo not run'], self.connection,
+            stop_on_error=True
+        )
+        self.assertEqual(
+            [result.return_code for result in results], [0, 1])
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_batch_isolates_commands(self, settings):
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        results = ssh.execute_batch(
+            ['FOO=bar; exit 1', 'echo "x${FOO}x"'], self.connection)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[1].stdout, [u'xx', u''])
@@ -0,0 +1,105 @@
+"""Tests for module ``robottelo.step_graph``."""
+import threading
+import unittest2
+
+from robottelo.step_graph import StepGraph, StepGraphError
+
+
+class StepGraphTestCase(unittest2.TestCase):
+    """Tests for :class:`robottelo.step_graph.StepGraph`."""
+
+    def test_results(self):
+        """Each step gets the results of the steps it requires"""
+        graph = StepGraph('test')
+        graph.add('a', lambda results: 1)
+        graph.add('b', lambda results: results['a'] + 1, requires=['a'])
+        graph.add('c', lambda results: results['a'] + results['b'],
+                  requires=['a', 'b'])
+        self.assertEqual(graph.run(), {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(graph.timings), ['a', 'b', 'c'])
+
+    def test_independent_steps_run_concurrently(self):
+        """Steps which do not depend on each other run at the same time"""
+        graph = StepGraph('test')
+        barrier = threading.Event()
+        started = []
+
+        @graph.step()
+        def first(results):
+            started.append('first')
+            if not barrier.wait(5):
+                raise AssertionError('second step did not start')
+
+        @graph.step()
+        def second(results):
+            started.append('second')
+            barrier.set()
+
+        graph.run()
+        self.assertEqual(sorted(started), ['first', 'second'])
+
+    def test_sequential(self):
+        """With a single worker the steps run in the calling thread"""
+        graph = StepGraph('test', max_workers=1)
+        threads = []
+        for name in ('a', 'b', 'c'):
+            graph.add(
+                name,
+                lambda results: threads.append(threading.current_thread())
+            )
+        graph.run()
+        self.assertEqual(threads, [threading.current_thread()] * 3)
+
+    def test_error(self):
+        """A failing step stops the graph and its error is raised"""
+        graph = StepGraph('test')
+        ran = []
+
+        @graph.step()
+        def fail(results):
+            raise ValueError('failed')
+
+        @graph.step(requires=['fail'])
+        def after(results):
+            ran.append('after')
+
+        with self.assertRaises(ValueError):
+            graph.run()
+        self.assertEqual(ran, [])
+        self.assertIn('fail', graph.timings)
+
+    def test_unknown_requirement(self):
+        """Requiring an unknown step raises an error"""
+        graph = StepGraph('test')
+        graph.add('a', lambda results: 1, requires=['missing'])
+        with self.assertRaises(StepGraphError):
+            graph.run()
+
+    def test_cycle(self):
+        """Circular dependencies raise an error before any step runs"""
+        graph = StepGraph('test')
+        ran = []
+        graph.add('a', ran.append)
+        graph.add('b', ran.append, requires=['a', 'c'])
+        graph.add('c', ran.append, requires=['b'])
+        with self.assertRaises(StepGraphError):
+            graph.run()
+        self.assertEqual(ran, [])
+
+    def test_duplicate_step(self):
+        """Adding two steps with the same name raises an error"""
+        graph = StepGraph('test')
+        graph.add('a', lambda results: 1)
+        with self.assertRaises(StepGraphError):
+            graph.add('a', lambda results: 2)
+
+    def test_format_timings(self):
+        """The timings report holds a line per finished step"""
+        graph = StepGraph('test')
+        graph.add('first', lambda results: 1)
+        graph.add('second', lambda results: 2, requires=['first'])
+        graph.run()
+        lines = graph.format_timings().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].strip().startswith('first '))
+        self.assertTrue(lines[1].strip().startswith('second'))
@@ -81,6 +81,68 @@ class VirtualMachineTestCase(unittest2.TestCase):
         ssh_command.assert_called_once_with(
             'ls', hostname='192.168.0.1', timeout=None)
 
+    @patch('robottelo.ssh.command_batch')
+    def test_run_batch(self, ssh_command_batch):
+        """Check if run_batch calls ssh.command_batch"""
+        self.configure_provisoning_server()
+        vm = VirtualMachine()
+
+        def create_mock():
+            """A mock for create method to set instance vars to run work"""
+            vm._created = True
+            vm.ip_addr = '192.168.0.1'
+
+        with patch.object(vm, 'create', side_effect=create_mock):
+            vm.create()
+
+        vm.run_batch(['ls', 'pwd'])
+        ssh_command_batch.assert_called_once_with(
+            ['ls', 'pwd'], hostname='192.168.0.1', timeout=None,
+            stop_on_error=False)
+
+    @patch('robottelo.ssh.command')
+    @patch('robottelo.ssh.command_batch')
+    def test_configure_puppet_batch(self, ssh_command_batch, ssh_command):
+        """Check the puppet setup batch is given the time of all its
+        commands, and runs them all like separate commands would"""
+        self.configure_provisoning_server()
+        self.settings.ssh_client.command_timeout = 300
+        vm = VirtualMachine()
+        vm._created = True
+        vm.ip_addr = '192.168.0.1'
+        ssh_command.return_value = ssh.SSHCommandResult()
+        ssh_command_batch.return_value = [
+            ssh.SSHCommandResult(return_code=1),
+            ssh.SSHCommandResult(return_code=1),
+        ]
+
+        vm.configure_puppet(rhel_repo='http://example.com/rhel.repo')
+        _, kwargs = ssh_command_batch.call_args
+        self.assertEqual(kwargs['timeout'], 600)
+        self.assertFalse(kwargs['stop_on_error'])
+        self.assertIn(
+            call(u'puppet cert sign --all'), ssh_command.call_args_list)
+
+    @patch('robottelo.ssh.command')
+    def test_configure_puppet_install_failure(self, ssh_command):
+        """Check the puppet setup stops when the rpm is not installed"""
+        self.configure_provisoning_server()
+        vm = VirtualMachine()
+        vm._created = True
+        vm.ip_addr = '192.168.0.1'
+        ssh_command.return_value = ssh.SSHCommandResult(return_code=1)
+
+        with self.assertRaises(VirtualMachineError):
+            vm.configure_puppet(rhel_repo='http://example.com/rhel.repo')
+        self.assertEqual(ssh_command.call_count, 2)
+
+    def test_run_batch_raises_exception(self):
+        """Check if run_batch raises an exception if the vm is not created"""
+        self.configure_provisoning_server()
+        vm = VirtualMachine()
+        with self.assertRaises(VirtualMachineError):
+            vm.run_batch(['ls'])
+
     def test_name_limit(self):
         """Check whether exception is risen in case of too long host name (more
         than 59 chars)"""